@@ -1,9 +1,13 @@
 import os
+import json
+import time
 import uuid
 import logging
 from datetime import datetime
-from flask import Blueprint, request, jsonify, session, current_app
+from typing import Any, Dict, Optional
+from flask import Blueprint, Response, request, jsonify, session, current_app
 from app.utils.constants import JOB_STATUS
+from app.utils.http_cache import json_response, is_not_modified, not_modified_response, streaming_response
 
 # 建立藍圖
 api_bp = Blueprint('api', __name__)
@@ -15,14 +19,9 @@ from main import processor
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """健康檢查端點"""
-    # Create a consistent snapshot of jobs while holding the lock
-    with processor.jobs_lock:
-        # Create a full copy of the jobs dictionary to ensure a consistent snapshot
-        all_jobs = {job_id: job.copy() for job_id, job in processor.jobs.items()}
-    
-    # Count active jobs from the snapshot (outside the lock)
-    active_job_count = len([j for j in all_jobs.values() 
-                          if j['status'] in [JOB_STATUS['PENDING'], JOB_STATUS['PROCESSING']]])
+    # Count active jobs from the status index (shared across workers)
+    status_counts = processor.job_store.count_by_status()
+    active_job_count = status_counts.get(JOB_STATUS['PENDING'], 0) + status_counts.get(JOB_STATUS['PROCESSING'], 0)
     
     # Log the count for debugging
     logging.debug(f"Health check: Found {active_job_count} active jobs at {datetime.now().isoformat()}")
@@ -33,6 +32,33 @@ def health_check():
         "active_jobs": active_job_count
     })
 
+@api_bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """運行指標端點 (媒體快取命中率、節省的下載量等)"""
+    try:
+        return jsonify({
+            "success": True,
+            "timestamp": datetime.now().isoformat(),
+            "metrics": processor.get_metrics()
+        })
+    except Exception as e:
+        logging.error(f"指標端點錯誤: {e}", exc_info=True)
+        return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
+
+def _admission_rejected_response():
+    """超過准入上限時回傳 429 與 Retry-After；接受新任務時回傳 None"""
+    decision = processor.check_admission()
+    if decision['admitted']:
+        return None
+    response = jsonify({
+        "success": False,
+        "error": f"伺服器忙碌中：{decision['reason']}",
+        "retry_after": decision['retry_after'],
+        "backlog": decision['backlog']
+    })
+    response.headers['Retry-After'] = str(decision['retry_after'])
+    return response, 429
+
 @api_bp.route('/process', methods=['POST'])
 def process_audio_endpoint():
     """非同步處理音檔的 API 端點，立即返回工作 ID"""
@@ -56,25 +82,107 @@ def process_audio_endpoint():
             if not attachment_file_ids:  # Treat empty list as no attachments
                 attachment_file_ids = None
 
-        # 生成工作ID並創建工作
-        job_id = str(uuid.uuid4())
-        job_data = processor.create_job(job_id, file_id, attachment_file_ids)
+        # 等待中的任務過多時拒絕 (客戶端依 Retry-After 稍後重試)
+        rejected = _admission_rejected_response()
+        if rejected:
+            return rejected
+
+        # 生成工作ID並創建工作 (重複的請求會回傳既有任務)
+        user_id = (session.get('user_info') or {}).get('id')
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        job_data = processor.create_job(str(uuid.uuid4()), file_id, attachment_file_ids,
+                                        user_id=user_id, idempotency_key=idempotency_key)
+        job_id = job_data['id']
+        deduplicated = bool(job_data.get('deduplicated'))
         
-        # 提交工作到線程池進行非同步處理
-        processor.process_file_async(job_id, file_id, attachment_file_ids)
+        # 提交工作到排程器 (或任務佇列) 進行非同步處理
+        if not deduplicated:
+            processor.process_file_async(job_id, file_id, attachment_file_ids)
         
         # 立即返回工作ID
         return jsonify({
             "success": True,
-            "message": "工作已提交，正在後台處理",
+            "message": "相同的工作已存在，沿用既有工作" if deduplicated else "工作已提交，正在後台處理",
             "job_id": job_id,
-            "job_status": job_data['status']
+            "deduplicated": deduplicated,
+            "job_status": job_data['status'],
+            "media_info": job_data.get('media_info'),
+            "estimated_cost": job_data.get('estimated_cost'),
+            "eta": processor.get_job_eta(job_id)
         })
 
     except Exception as e:
         logging.error(f"API 錯誤: {e}", exc_info=True)
         return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
 
+@api_bp.route('/process/batch', methods=['POST'])
+def process_batch_endpoint():
+    """批次送出一組音檔 (file_ids 或 Drive 資料夾路徑 folder_path) 作為任務群組"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "error": "無效的請求內容"}), 400
+
+        file_ids = data.get('file_ids')
+        folder_path = data.get('folder_path')
+        if bool(file_ids) == bool(folder_path):
+            return jsonify({"success": False, "error": "請提供 file_ids 或 folder_path 其中之一"}), 400
+        if file_ids is not None and (not isinstance(file_ids, list) or not all(isinstance(item, str) for item in file_ids)):
+            return jsonify({"success": False, "error": "file_ids 必須是字串陣列"}), 400
+        if folder_path and processor.oauth_drive_service is None:
+            return jsonify({'success': False, 'error': '未完成OAuth認證，請先登入'}), 401
+
+        attachment_file_ids = data.get('attachment_file_ids') or None
+        if attachment_file_ids is not None:
+            if not isinstance(attachment_file_ids, list) or not all(isinstance(item, str) for item in attachment_file_ids):
+                return jsonify({'success': False, 'error': 'attachment_file_ids must be a list of strings'}), 400
+
+        rejected = _admission_rejected_response()
+        if rejected:
+            return rejected
+
+        user_id = (session.get('user_info') or {}).get('id')
+        try:
+            group = processor.create_job_group(
+                file_ids=file_ids,
+                folder_path=folder_path,
+                attachment_file_ids=attachment_file_ids,
+                user_id=user_id,
+                skip_processed=bool(data.get('skip_processed', True))
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        etas = processor.get_jobs_eta([job['job_id'] for job in group['jobs']])
+        for job in group['jobs']:
+            job['eta'] = etas.get(job['job_id'])
+
+        return jsonify({
+            "success": True,
+            "message": f"已提交 {len(group['jobs'])} 個任務，略過 {len(group['skipped'])} 個檔案",
+            **group
+        })
+
+    except Exception as e:
+        logging.error(f"批次提交 API 錯誤: {e}", exc_info=True)
+        return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
+
+@api_bp.route('/groups/<group_id>', methods=['GET'])
+def get_group_status_endpoint(group_id):
+    """獲取任務群組整體進度的 API 端點"""
+    try:
+        group_status = processor.get_group_status(group_id)
+        if group_status is None:
+            return jsonify({"success": False, "error": f"Group {group_id} not found"}), 404
+        return jsonify({
+            "success": True,
+            "group": group_status
+        })
+
+    except Exception as e:
+        logging.error(f"API 錯誤 for group {group_id}: {e}", exc_info=True)
+        return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
+
 @api_bp.route('/job/<job_id>', methods=['GET'])
 def get_job_status_endpoint(job_id):
     """獲取工作狀態的 API 端點"""
@@ -99,79 +207,57 @@ def get_job_status_endpoint(job_id):
         logging.error(f"API 錯誤 for job {job_id}: {e}", exc_info=True)
         return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
 
+# /api/jobs 的 filter 參數對應的任務狀態 (None 表示全部)
+JOB_LIST_FILTERS = {
+    'all': None,
+    'active': [JOB_STATUS['PENDING'], JOB_STATUS['PROCESSING']],
+    'completed': [JOB_STATUS['COMPLETED']],
+    'failed': [JOB_STATUS['FAILED']]
+}
+
 @api_bp.route('/jobs', methods=['GET'])
 def get_active_jobs_endpoint():
-    """獲取工作列表的 API 端點，可選擇性過濾狀態"""
+    """獲取工作列表的 API 端點，可選擇性過濾狀態
+
+    依建立時間由新到舊以游標分頁：limit 為每頁筆數，將回應中的 next_cursor 帶入 cursor 參數取得下一頁。
+    """
     try:
         # Get filter status from query parameter, default to show only active jobs
         filter_status = request.args.get('filter', 'active')
+        if filter_status not in JOB_LIST_FILTERS:
+            # Invalid filter value
+            return jsonify({"success": False, "error": "Invalid filter parameter. Use 'active', 'all', 'completed', or 'failed'"}), 400
         
-        # Create a consistent snapshot of jobs while holding the lock
-        with processor.jobs_lock:
-            # First create a snapshot of all jobs while holding the lock
-            all_jobs = {job_id: job.copy() for job_id, job in processor.jobs.items()}
+        try:
+            limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        except ValueError:
+            return jsonify({"success": False, "error": "limit 必須是整數"}), 400
         
-        # Process the jobs data outside the lock to minimize lock contention
-        if filter_status == 'all':
-            # Return all jobs regardless of status
-            jobs_to_return = {
-                job_id: {
-                    'id': job['id'],
-                    'status': job['status'],
-                    'progress': job['progress'],
-                    'created_at': job['created_at'],
-                    'updated_at': job['updated_at']
-                }
-                for job_id, job in all_jobs.items()
-            }
-        elif filter_status == 'active':
-            # Return only pending or processing jobs
-            jobs_to_return = {
-                job_id: {
-                    'id': job['id'],
-                    'status': job['status'],
-                    'progress': job['progress'],
-                    'created_at': job['created_at'],
-                    'updated_at': job['updated_at']
-                }
-                for job_id, job in all_jobs.items()
-                if job['status'] in [JOB_STATUS['PENDING'], JOB_STATUS['PROCESSING']]
-            }
-        elif filter_status == 'completed':
-            # Return only completed jobs
-            jobs_to_return = {
-                job_id: {
-                    'id': job['id'],
-                    'status': job['status'],
-                    'progress': job['progress'],
-                    'created_at': job['created_at'],
-                    'updated_at': job['updated_at']
-                }
-                for job_id, job in all_jobs.items()
-                if job['status'] == JOB_STATUS['COMPLETED']
-            }
-        elif filter_status == 'failed':
-            # Return only failed jobs
-            jobs_to_return = {
-                job_id: {
-                    'id': job['id'],
-                    'status': job['status'],
-                    'progress': job['progress'],
-                    'created_at': job['created_at'],
-                    'updated_at': job['updated_at']
-                }
-                for job_id, job in all_jobs.items()
-                if job['status'] == JOB_STATUS['FAILED']
+        # Only jobs in the requested statuses are read (via the status index)
+        try:
+            jobs, next_cursor = processor.job_store.list_page(
+                JOB_LIST_FILTERS[filter_status], cursor=request.args.get('cursor'), limit=limit
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        jobs_to_return = {
+            job['id']: {
+                'id': job['id'],
+                'status': job['status'],
+                'progress': job['progress'],
+                'created_at': job['created_at'],
+                'updated_at': job['updated_at']
             }
-        else:
-            # Invalid filter value
-            return jsonify({"success": False, "error": "Invalid filter parameter. Use 'active', 'all', 'completed', or 'failed'"}), 400
+            for job in jobs
+        }
             
         # Add job count information
         result = {
             "success": True,
             "active_jobs": jobs_to_return,
             "count": len(jobs_to_return),
+            "next_cursor": next_cursor,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -184,9 +270,49 @@ def get_active_jobs_endpoint():
         logging.error(f"API 錯誤: {e}", exc_info=True)
         return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
 
+def _drive_file_query(base_query: str, filter_active: bool, folder_name: Optional[str],
+                      user_id: Optional[str], label: str) -> Optional[str]:
+    """組出單一類型檔案的查詢；啟用資料夾過濾但找不到資料夾時回傳 None (此類型沒有檔案)"""
+    if not filter_active:
+        logging.debug(f"{label} filter: OFF, fetching all files.")
+        return base_query
+    if not folder_name:
+        # Filter is on, but no folder name provided (should not happen if UI is correct)
+        logging.debug(f"{label} filter: Active but no folder name provided.")
+        return None
+    folder_id = processor.find_folder_id_by_path(folder_name, user_id=user_id)
+    if not folder_id:
+        logging.debug(f"{label} filter: Folder path '{folder_name}' not found.")
+        return None
+    logging.debug(f"{label} filter: Found folder ID '{folder_id}' for path '{folder_name}'")
+    return f"{base_query} and '{folder_id}' in parents"
+
+def _format_drive_file(file_data: Dict[str, Any]) -> Dict[str, Any]:
+    """整理 Drive 檔案資訊 (size 轉為數字)"""
+    # 確保 size 是數字類型
+    size = file_data.get('size', '0')
+    if isinstance(size, str):
+        try:
+            size = int(size)
+        except (ValueError, TypeError):
+            size = 0
+    return {
+        'id': file_data['id'],
+        'name': file_data.get('name', '未命名檔案'),
+        'mimeType': file_data.get('mimeType', 'application/octet-stream'),
+        'size': size,
+        'parents': file_data.get('parents', [])
+    }
+
 @api_bp.route('/drive/files')
 def drive_files():
-    """獲取Google Drive檔案列表"""
+    """獲取Google Drive檔案列表
+
+    fileType 為 audio / pdf 時只查詢該類型，否則音訊與 PDF 兩個查詢同時執行。
+    stream=ndjson (或 Accept: application/x-ndjson) 時每取得一頁就送出，每行一個檔案，
+    最後一行為 {"done": true, "count": N}；發生錯誤時送出 {"error": ...}。
+    列表依使用者快取 (Drive 有變動時失效)，快取命中時回應帶 ETag，If-None-Match 相符時回 304。
+    """
     if not session.get('authenticated', False):
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
 
@@ -194,94 +320,60 @@ def drive_files():
         if processor.oauth_drive_service is None:
             return jsonify({'success': False, 'error': '未完成OAuth認證，請先登入'}), 401
 
+        user_id = (session.get('user_info') or {}).get('id')
+        file_type = request.args.get('fileType')
         recordings_folder_name = request.args.get('recordingsFolderName')
         pdf_folder_name = request.args.get('pdfFolderName')
         recordings_filter_active = request.args.get('recordingsFilter') == 'enabled'
         pdf_filter_active = request.args.get('pdfFilter') == 'enabled'
 
         logging.debug(
-            f"Drive files request: recordingsFilter={recordings_filter_active}, "
+            f"Drive files request: fileType={file_type}, recordingsFilter={recordings_filter_active}, "
             f"pdfFilter={pdf_filter_active}, recordingsFolder='{recordings_folder_name}', "
             f"pdfFolder='{pdf_folder_name}'"
         )
 
-        audio_files_list = []
-        pdf_files_list = []
-
-        # 1. Fetch Audio Files
-        base_audio_query = "trashed = false and mimeType contains 'audio/'"
-        if recordings_filter_active:
-            if recordings_folder_name:
-                recordings_folder_id = processor.find_folder_id_by_path(recordings_folder_name)
-                if recordings_folder_id:
-                    logging.debug(f"Audio filter: Found folder ID '{recordings_folder_id}' for path '{recordings_folder_name}'")
-                    audio_query = f"{base_audio_query} and '{recordings_folder_id}' in parents"
-                    audio_files_list = processor.list_drive_files(query=audio_query)
-                else:
-                    # Filter is on, folder name provided, but folder not found. Return no audio files for this filter.
-                    logging.debug(f"Audio filter: Folder path '{recordings_folder_name}' not found.")
-                    audio_files_list = []
-            else:
-                # Filter is on, but no folder name provided (should not happen if UI is correct)
-                logging.debug("Audio filter: Active but no folder name provided.")
-                audio_files_list = []
-        else:
-            # Recordings filter is OFF, fetch all audio files
-            logging.debug("Audio filter: OFF, fetching all audio files.")
-            audio_files_list = processor.list_drive_files(query=base_audio_query)
-
-        # 2. Fetch PDF Files
-        base_pdf_query = "trashed = false and mimeType = 'application/pdf'"
-        if pdf_filter_active:
-            if pdf_folder_name:
-                pdf_folder_id = processor.find_folder_id_by_path(pdf_folder_name)
-                if pdf_folder_id:
-                    logging.debug(f"PDF filter: Found folder ID '{pdf_folder_id}' for path '{pdf_folder_name}'")
-                    pdf_query = f"{base_pdf_query} and '{pdf_folder_id}' in parents"
-                    pdf_files_list = processor.list_drive_files(query=pdf_query)
-                else:
-                    # Filter is on, folder name provided, but folder not found. Return no PDF files for this filter.
-                    logging.debug(f"PDF filter: Folder path '{pdf_folder_name}' not found.")
-                    pdf_files_list = []
-            else:
-                # Filter is on, but no folder name provided
-                logging.debug("PDF filter: Active but no folder name provided.")
-                pdf_files_list = []
-        else:
-            # PDF filter is OFF, fetch all PDF files
-            logging.debug("PDF filter: OFF, fetching all PDF files.")
-            pdf_files_list = processor.list_drive_files(query=base_pdf_query)
-
-        # Combine and de-duplicate by ID
-        combined_files_map = {}
-        for f in audio_files_list:
-            if f.get('id'):
-                combined_files_map[f.get('id')] = f
-        for f in pdf_files_list:
-            if f.get('id'):
-                combined_files_map[f.get('id')] = f
-
-        # Format files with proper size conversion
-        formatted_files = []
-        for file_id, file_data in combined_files_map.items():
-            # 確保 size 是數字類型
-            size = file_data.get('size', '0')
-            if isinstance(size, str):
+        queries = []
+        if file_type != 'pdf':
+            queries.append(_drive_file_query("trashed = false and mimeType contains 'audio/'",
+                                             recordings_filter_active, recordings_folder_name, user_id, 'Audio'))
+        if file_type != 'audio':
+            queries.append(_drive_file_query("trashed = false and mimeType = 'application/pdf'",
+                                             pdf_filter_active, pdf_folder_name, user_id, 'PDF'))
+        queries = [query for query in queries if query]
+        user_key = user_id or 'default'
+        cache_key = tuple(queries)
+        cache = processor.drive_listing_cache
+        entry, generation = cache.lookup(user_key, cache_key, processor.oauth_drive_service)
+        if entry and is_not_modified(entry['etag']):
+            return not_modified_response(entry['etag'])
+
+        if request.args.get('stream') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+            def generate():
+                if entry:
+                    yield ''.join(json.dumps(f, ensure_ascii=False) + '\n' for f in entry['files'])
+                    yield json.dumps({'done': True, 'count': len(entry['files'])}) + '\n'
+                    return
+                files = []
                 try:
-                    size = int(size)
-                except (ValueError, TypeError):
-                    size = 0
-            
-            formatted_files.append({
-                'id': file_id,
-                'name': file_data.get('name', '未命名檔案'),
-                'mimeType': file_data.get('mimeType', 'application/octet-stream'),
-                'size': size,
-                'parents': file_data.get('parents', [])
-            })
-        
-        logging.info(f"Found {len(formatted_files)} unique files after filtering and combination.")
-        return jsonify({'success': True, 'files': formatted_files})
+                    for page in processor.stream_drive_queries(queries):
+                        formatted = [_format_drive_file(f) for f in page]
+                        files.extend(formatted)
+                        if formatted:
+                            yield ''.join(json.dumps(f, ensure_ascii=False) + '\n' for f in formatted)
+                    cache.put(user_key, cache_key, files, generation)
+                    yield json.dumps({'done': True, 'count': len(files)}) + '\n'
+                except Exception as e:
+                    logging.error(f"串流 Google Drive 檔案列表時發生錯誤: {str(e)}", exc_info=True)
+                    yield json.dumps({'error': f'獲取檔案列表失敗: {str(e)}'}, ensure_ascii=False) + '\n'
+
+            return streaming_response(generate(), 'application/x-ndjson', etag=entry['etag'] if entry else None)
+
+        if not entry:
+            formatted_files = [_format_drive_file(f) for page in processor.stream_drive_queries(queries) for f in page]
+            entry = cache.put(user_key, cache_key, formatted_files, generation)
+        logging.info(f"Found {len(entry['files'])} unique files after filtering and combination.")
+        return json_response({'success': True, 'files': entry['files']}, etag=entry['etag'])
 
     except Exception as e:
         logging.error(f"獲取 Google Drive 檔案列表時發生錯誤: {str(e)}", exc_info=True)
@@ -294,14 +386,12 @@ def cancel_job_endpoint(job_id):
         logging.info(f"嘗試取消任務: {job_id}")
         
         # 檢查任務是否存在，並記錄調試信息
-        with processor.jobs_lock:
-            job_exists = job_id in processor.jobs
-            total_jobs = len(processor.jobs)
-            existing_jobs = list(processor.jobs.keys())
+        job_exists = processor.job_store.exists(job_id)
             
-        logging.info(f"任務存在檢查: {job_exists}, 總任務數: {total_jobs}")
+        logging.info(f"任務存在檢查: {job_exists}")
         if not job_exists:
-            logging.warning(f"任務 {job_id} 不存在於 processor.jobs 中")
+            existing_jobs = processor.job_store.job_ids()
+            logging.warning(f"任務 {job_id} 不存在於任務儲存中 (總任務數: {len(existing_jobs)})")
             logging.debug(f"現有任務ID (前5個): {existing_jobs[:5]}")
             return jsonify({"success": False, "error": "任務不存在"}), 404
         
@@ -331,22 +421,95 @@ def get_batch_job_status_endpoint():
         if not isinstance(job_ids, list):
             return jsonify({"success": False, "error": "job_ids 必須是陣列"}), 400
         
-        # 批量獲取任務狀態
-        jobs_status = {}
-        for job_id in job_ids:
-            job_status = processor.get_job_status(job_id)
-            if job_status and 'error' not in job_status:
-                jobs_status[job_id] = job_status
+        # 先取得版本號再讀取快照，之後的變化都會出現在 /jobs/stream 或 /jobs/changes
+        version = processor.job_store.current_version()
+        # 批量獲取任務狀態 (單一快照，不存在的任務會被略過)
+        jobs_status = processor.get_jobs_status(job_ids)
         
         return jsonify({
             "success": True,
-            "jobs": jobs_status
+            "jobs": jobs_status,
+            "version": version
         })
         
     except Exception as e:
         logging.error(f"批量獲取任務狀態 API 錯誤: {e}", exc_info=True)
         return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
 
+# 單一連線可關注的任務數上限
+MAX_WATCHED_JOBS = 200
+
+def _parse_job_changes_args():
+    """解析 job_ids (逗號分隔，省略表示目前使用者的全部任務) 與 since_version 查詢參數，並取得目前使用者"""
+    raw_ids = request.args.get('job_ids')
+    job_ids = [job_id for job_id in raw_ids.split(',') if job_id][:MAX_WATCHED_JOBS] if raw_ids else None
+    # EventSource 重新連線時會以 Last-Event-ID 帶上最後收到的版本號
+    since_version = request.headers.get('Last-Event-ID') or request.args.get('since_version', 0)
+    # 只回傳目前使用者的任務
+    user_id = (session.get('user_info') or {}).get('id')
+    return job_ids, int(since_version), user_id
+
+@api_bp.route('/jobs/changes', methods=['GET'])
+def get_job_changes_endpoint():
+    """長輪詢：回傳 since_version 之後有變化的任務；沒有變化時最多等待 timeout 秒 (供無法使用 SSE 的客戶端)
+
+    reset 為 True 時回傳的是完整快照 (伺服器的版本號已重新起算)，客戶端應以回傳的 version 取代原本的版本號。
+    """
+    try:
+        try:
+            job_ids, since_version, user_id = _parse_job_changes_args()
+            timeout = min(max(float(request.args.get('timeout', 25)), 0), 60)
+        except ValueError:
+            return jsonify({"success": False, "error": "since_version 與 timeout 必須是數字"}), 400
+        
+        processor.job_store.wait_for_change(since_version, timeout)
+        jobs, version = processor.get_job_changes(since_version, job_ids, user_id)
+        return jsonify({
+            "success": True,
+            "jobs": jobs,
+            "version": version,
+            "reset": version < since_version
+        })
+        
+    except Exception as e:
+        logging.error(f"任務變化查詢 API 錯誤: {e}", exc_info=True)
+        return jsonify({"success": False, "error": f"伺服器內部錯誤: {e}"}), 500
+
+@api_bp.route('/jobs/stream', methods=['GET'])
+def job_stream_endpoint():
+    """以 Server-Sent Events 推送有變化的任務狀態 (event: jobs，id 為版本號)
+
+    版本號已重新起算時先送出完整快照 (event: snapshot)，客戶端應以其 id 取代原本的版本號。
+    """
+    try:
+        job_ids, since_version, user_id = _parse_job_changes_args()
+    except ValueError:
+        return jsonify({"success": False, "error": "since_version 必須是數字"}), 400
+    
+    keepalive = processor.job_stream_keepalive_seconds
+    deadline = time.monotonic() + processor.job_stream_max_seconds
+    
+    def generate():
+        version = since_version
+        # 告訴瀏覽器斷線後稍候重新連線
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            processor.job_store.wait_for_change(version, min(keepalive, max(0.0, deadline - time.monotonic())))
+            jobs, new_version = processor.get_job_changes(version, job_ids, user_id)
+            if new_version == version:
+                # 沒有變化，送出註解行維持連線 (同時偵測客戶端是否已離開)
+                yield ": keepalive\n\n"
+                continue
+            event = 'snapshot' if new_version < version else 'jobs'
+            version = new_version
+            if jobs or event == 'snapshot':
+                yield f"id: {version}\nevent: {event}\ndata: {json.dumps(jobs, ensure_ascii=False)}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @api_bp.route('/jobs/<job_id>/result', methods=['GET'])
 def get_job_result_endpoint(job_id):
     """獲取任務結果的 API 端點"""
@@ -382,16 +545,15 @@ def get_job_result_endpoint(job_id):
 def debug_jobs_endpoint():
     """調試端點：列出所有任務ID (僅用於開發階段)"""
     try:
-        with processor.jobs_lock:
-            jobs_info = {
-                job_id: {
-                    'status': job['status'],
-                    'progress': job['progress'],
-                    'created_at': job['created_at'],
-                    'updated_at': job['updated_at']
-                }
-                for job_id, job in processor.jobs.items()
+        jobs_info = {
+            job['id']: {
+                'status': job['status'],
+                'progress': job['progress'],
+                'created_at': job['created_at'],
+                'updated_at': job['updated_at']
             }
+            for job in processor.job_store.list_jobs()
+        }
             
         return jsonify({
             "success": True,
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request, session, current_app
+from flask import Blueprint, jsonify, session, current_app
 import google.oauth2.credentials
 import googleapiclient.discovery
 
@@ -12,10 +12,6 @@ def list_files():
         if 'credentials' not in session:
             return jsonify({'error': 'User not authenticated'}), 401
             
-        # 獲取兩個獨立的過濾器設置
-        recordings_filter = request.args.get('recordingsFilter', 'disabled')
-        pdf_filter = request.args.get('pdfFilter', 'disabled')
-        
         # 建立 Drive API 服務
         credentials = google.oauth2.credentials.Credentials(**session['credentials'])
         drive = googleapiclient.discovery.build('drive', 'v3', credentials=credentials)
@@ -0,0 +1,57 @@
+import math
+from typing import Any, Dict, Optional
+
+
+class AdmissionController:
+    """任務准入控制：等待中的任務數或音訊時數超過上限時拒絕新任務，並依實測吞吐量估算多久後可再送出
+
+    上限設為 0 表示不限制。吞吐量 (throughput) 為 dict: jobs_per_second / audio_seconds_per_second，
+    尚無實測資料時改以並行數與等待中任務的預測處理秒數估算排空速度。
+    """
+
+    def __init__(self, max_queued_jobs: int = 0, max_queued_audio_seconds: float = 0,
+                 min_retry_after: int = 5, max_retry_after: int = 3600):
+        self.max_queued_jobs = max_queued_jobs
+        self.max_queued_audio_seconds = max_queued_audio_seconds
+        self.min_retry_after = min_retry_after
+        self.max_retry_after = max_retry_after
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_queued_jobs > 0 or self.max_queued_audio_seconds > 0
+
+    @staticmethod
+    def estimate_throughput(backlog: Dict[str, Any], concurrency: int) -> Optional[Dict[str, float]]:
+        """沒有實測資料時的吞吐量估算：concurrency 個任務同時處理，每個任務花費平均預測秒數"""
+        if not backlog['jobs'] or not backlog['cost_seconds'] or concurrency <= 0:
+            return None
+        jobs_per_second = concurrency / (backlog['cost_seconds'] / backlog['jobs'])
+        return {
+            'jobs_per_second': jobs_per_second,
+            'audio_seconds_per_second': jobs_per_second * backlog['audio_seconds'] / backlog['jobs']
+        }
+
+    def evaluate(self, backlog: Dict[str, Any], throughput: Optional[Dict[str, float]]) -> Dict[str, Any]:
+        """判斷是否接受新任務
+
+        backlog 為等待中任務的統計 (jobs / audio_seconds / cost_seconds)；
+        回傳 {'admitted': bool, 'reason': str, 'retry_after': 秒數}。
+        """
+        waits = []
+        reasons = []
+        if self.max_queued_jobs > 0 and backlog['jobs'] >= self.max_queued_jobs:
+            reasons.append(f"等待中的任務數已達上限 ({backlog['jobs']}/{self.max_queued_jobs})")
+            rate = (throughput or {}).get('jobs_per_second')
+            excess = backlog['jobs'] - self.max_queued_jobs + 1
+            waits.append(excess / rate if rate else self.max_retry_after)
+        if self.max_queued_audio_seconds > 0 and backlog['audio_seconds'] >= self.max_queued_audio_seconds:
+            reasons.append(f"等待中的音訊時數已達上限 ({backlog['audio_seconds'] / 3600:.1f}/"
+                           f"{self.max_queued_audio_seconds / 3600:.1f} 小時)")
+            rate = (throughput or {}).get('audio_seconds_per_second')
+            excess = backlog['audio_seconds'] - self.max_queued_audio_seconds
+            waits.append(excess / rate if rate else self.max_retry_after)
+
+        if not reasons:
+            return {'admitted': True, 'reason': None, 'retry_after': 0}
+        retry_after = min(self.max_retry_after, max(self.min_retry_after, math.ceil(max(waits))))
+        return {'admitted': False, 'reason': '；'.join(reasons), 'retry_after': retry_after}
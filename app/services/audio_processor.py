@@ -5,24 +5,34 @@ import shutil
 import subprocess
 import io
 import json
+import hashlib
 import re
 import time
+import uuid
+import socket
 import logging
 import threading
 from datetime import datetime
-from typing import Dict, List, Tuple, Any, Optional
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Any, Optional, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, Future, InvalidStateError
+from contextlib import ExitStack
+from collections import deque
 import requests
 import atexit
+import queue
+import httplib2
 
 # Google API 相關
 from google.oauth2.credentials import Credentials
 from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 
 # 語音處理相關
 import whisper
+import torch
 from pyannote.audio import Pipeline
 import numpy as np
 import soundfile as sf
@@ -33,6 +43,24 @@ import google.generativeai as genai
 
 # 添加導入 NotionFormatter
 from ..utils.notion_formatter import NotionFormatter
+from .stream_ingest import StreamingDecoder, StreamingIngestSink
+from .ranged_downloader import RangedDownloader, RangeNotSupportedError, partial_download_lock
+from .media_cache import MediaCache
+from .workspace_manager import WorkspaceManager, WorkspaceWaitCancelled
+from .media_probe import MediaProbe
+from .job_store import create_job_store, RedisJobStore, TERMINAL_STATUSES, job_timestamp
+from .job_queue import RedisJobQueue
+from .job_scheduler import SchedulingPolicy, JobScheduler
+from .admission import AdmissionController
+from .drive_watcher import DriveChangeWatcher, FileWatchState, RedisWatchState
+from .concurrency_controller import AdaptiveConcurrencyController
+from .drive_listing_cache import DriveListingCache
+from .folder_index import FolderIndex, FolderIndexCache
+from .runtime_predictor import RuntimePredictor, FileRuntimeBackend, RedisRuntimeBackend, estimate_progress
+from .cancellation import (
+    CancellationToken, JobCancelled, bind_token, check_cancelled,
+    install_whisper_cancellation, diarization_hook
+)
 
 # PDF 處理 (需要 pip install PyPDF2)
 try:
@@ -42,31 +70,194 @@ except ImportError:
     PyPDF2 = None
 
 # 導入工作狀態常數
-from app.utils.constants import JOB_STATUS
+from app.utils.constants import JOB_STATUS, TRANSCRIPTION_MODE, PROCESSED_FILENAME_PATTERN
+
+# 下載媒體時需要的 Drive 欄位 (md5Checksum / modifiedTime 用於媒體快取的版本判斷)
+DRIVE_MEDIA_FIELDS = "name,mimeType,size,md5Checksum,modifiedTime"
 
 
 class AudioProcessor:
-    def __init__(self, max_workers=3):
+    def __init__(self, max_workers=3, run_local_scheduler=True):
         self.whisper_model = None
         self.diarization_pipeline = None
         self.drive_service = None
         self.oauth_drive_service = None  # 專門用於OAuth認證的Drive服務
+        self.oauth_credentials = None  # OAuth 憑證 (平行查詢時每個執行緒各自建立 AuthorizedHttp)
+        self.drive_http_session = None  # 服務帳號的 HTTP session (用於分段下載)
+        
+        # 自動調整並行數：依記憶體與 CPU 壓力在 CONCURRENCY_MIN 與 CONCURRENCY_MAX 之間調整同時執行的推論任務數
+        # (max_workers 為初始值；每個任務的預測記憶體 = 基本用量 + 每分鐘音檔用量 × 音檔分鐘數)
+        self.concurrency_controller = None
+        if os.getenv("ADAPTIVE_CONCURRENCY", "true").lower() == "true":
+            self.concurrency_controller = AdaptiveConcurrencyController(
+                min_concurrency=int(os.getenv("CONCURRENCY_MIN", 1)),
+                max_concurrency=int(os.getenv("CONCURRENCY_MAX", max(max_workers, os.cpu_count() or 1))),
+                job_base_memory=float(os.getenv("JOB_MEMORY_BASE_MB", 1500)) * 1024 ** 2,
+                memory_per_audio_second=float(os.getenv("JOB_MEMORY_PER_AUDIO_MINUTE_MB", 20)) * 1024 ** 2 / 60,
+                memory_reserve=float(os.getenv("CONCURRENCY_MEMORY_RESERVE_MB", 1024)) * 1024 ** 2,
+                target_cpu_utilization=float(os.getenv("CONCURRENCY_TARGET_CPU", 0.85)),
+                interval=float(os.getenv("CONCURRENCY_SAMPLE_INTERVAL", 10)),
+                cooldown=float(os.getenv("CONCURRENCY_COOLDOWN_SECONDS", 60))
+            )
+        max_concurrency = self.concurrency_controller.max_concurrency if self.concurrency_controller else max_workers
         
-        # 初始化執行緒池
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 分階段執行緒池：CPU 池只執行轉錄與說話人分離，I/O 池執行下載、Gemini、Notion 與 Drive 操作
+        # (任務的協調流程也在 I/O 池中執行，只有 CPU 階段會佔用 CPU 池；啟用自動調整時池的大小須容納並行數上限)
+        default_cpu_workers = max_concurrency if self.concurrency_controller else min(max_workers, os.cpu_count() or 1)
+        self.cpu_pool_workers = int(os.getenv("CPU_POOL_WORKERS", max(1, default_cpu_workers)))
+        self.io_pool_workers = int(os.getenv("IO_POOL_WORKERS", max_concurrency * 4))
+        self.cpu_executor = ThreadPoolExecutor(max_workers=self.cpu_pool_workers, thread_name_prefix='cpu-stage')
+        self.io_executor = ThreadPoolExecutor(max_workers=self.io_pool_workers, thread_name_prefix='io-stage')
         # 註冊 executor 關閉函數
         atexit.register(self.shutdown_executor)
-        # 工作狀態追蹤
-        self.jobs = {}
-        # 確保線程安全的鎖
-        self.jobs_lock = threading.Lock()
+        # 工作狀態追蹤 (Redis 可用時由所有 worker 共享)
+        self.job_store = create_job_store()
+        # 本程序提交的 future (無法序列化，不放入共享儲存)
+        self.job_futures = {}
+        self.futures_lock = threading.Lock()
+        # 執行中任務的取消權杖 (轉錄 / 說話人分離內部的檢查點會查詢)
+        self.cancellation_tokens: Dict[str, CancellationToken] = {}
+        self.cancel_poll_interval = float(os.getenv("CANCEL_POLL_INTERVAL", 1.0))
+        # 最近取消任務從提出取消到釋放資源的秒數
+        self.cancel_release_seconds = deque(maxlen=100)
+        # 任務保留策略：已結束的任務超過保留秒數或數量上限時，由背景執行緒淘汰
+        self.job_retention_seconds = float(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+        self.job_retention_max_count = int(os.getenv("JOB_RETENTION_MAX_COUNT", 1000))
+        self.job_retention_interval = float(os.getenv("JOB_RETENTION_INTERVAL", 300))
+        self._retention_stop = threading.Event()
+        threading.Thread(target=self._retention_loop, name='job-retention', daemon=True).start()
+        atexit.register(self._retention_stop.set)
+        # 任務狀態推送 (SSE / long-poll)：無變化時的心跳間隔與單一連線的最長秒數 (之後由瀏覽器重新連線)
+        self.job_stream_keepalive_seconds = float(os.getenv("JOB_STREAM_KEEPALIVE_SECONDS", 15))
+        self.job_stream_max_seconds = float(os.getenv("JOB_STREAM_MAX_SECONDS", 300))
+        # 重複送出的處理：冪等鍵保留秒數；相同檔案 / 附件 / 選項的任務在等待或處理中時直接沿用，
+        # 已完成且 Drive md5Checksum 未變的任務在 JOB_DEDUP_WINDOW_SECONDS 內沿用其結果
+        self.idempotency_key_ttl = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 3600))
+        self.job_coalescing = os.getenv("JOB_COALESCING", "true").lower() == "true"
+        self.job_dedup_window_seconds = int(os.getenv("JOB_DEDUP_WINDOW_SECONDS", 24 * 3600))
+        # 每位使用者的 Drive 資料夾索引 (資料夾路徑查詢不需逐層呼叫 API)，超過秒數時以 Changes feed 更新
+        self.folder_index_cache = FolderIndexCache(refresh_interval=float(os.getenv("FOLDER_INDEX_REFRESH_SECONDS", 60)))
+        # 每位使用者的 Drive 檔案列表快取：最長保留秒數，以及每隔多少秒以 Changes API 檢查是否有變動
+        self.drive_listing_cache = DriveListingCache(
+            ttl=float(os.getenv("DRIVE_LISTING_CACHE_TTL", 600)),
+            check_interval=float(os.getenv("DRIVE_LISTING_CHECK_INTERVAL", 30))
+        )
+        # 批次送出 (/api/process/batch) 的檔案數上限
+        self.batch_max_files = int(os.getenv("BATCH_MAX_FILES", 200))
+        # 群組共用附件的擷取鎖 (同一群組的附件只擷取一次)：依群組 ID 的雜湊分配到固定數量的鎖，
+        # 不會隨群組數增加而累積
+        self.group_attachment_locks = [threading.Lock() for _ in range(64)]
+        # 任務執行方式：local (本程序執行緒池) 或 queue (放入 Redis 佇列，由 python -m app.worker 處理)
+        self.job_queue = None
+        if os.getenv("JOB_EXECUTION", "local").lower() == "queue":
+            if isinstance(self.job_store, RedisJobStore):
+                self.job_queue = RedisJobQueue(
+                    self.job_store.redis,
+                    visibility_timeout=int(os.getenv("JOB_VISIBILITY_TIMEOUT", 120))
+                )
+                logging.info("✅ 任務將放入 Redis 佇列，由獨立 worker 處理")
+            else:
+                logging.warning("⚠️ JOB_EXECUTION=queue 需要 Redis 任務儲存，改由本程序執行任務")
+        self.job_max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+        # 排程：最短任務優先 + 老化 + 每位使用者並行上限 (本程序與佇列模式共用同一策略)
+        self.scheduling_policy = SchedulingPolicy(
+            aging_factor=float(os.getenv("SCHEDULER_AGING_FACTOR", 1.0)),
+            per_user_max_running=int(os.getenv("SCHEDULER_PER_USER_MAX_RUNNING", 2)),
+            default_cost_seconds=float(os.getenv("SCHEDULER_DEFAULT_COST_SECONDS", 600))
+        )
+        # 排程器的並行數只計算尚未離開 CPU 階段的任務 (已進入 Gemini / Notion 階段的任務不佔名額)；
+        # 另可多放行 PREFETCH_JOBS 個任務在 CPU 忙碌時先行下載與轉檔
+        self.prefetch_jobs = int(os.getenv("PREFETCH_JOBS", 1))
+        self.scheduler = JobScheduler(
+            self.scheduling_policy, max_workers, self._start_local_job, prefetch_depth=self.prefetch_jobs
+        )
+        # 轉錄名額：任務須取得名額才能進入 CPU 階段，實際同時轉錄的任務數不會超過排程器 (或 worker) 的並行數
+        self.asr_slots = self.scheduler.asr_slots
+        # 佇列模式下任務由獨立 worker 執行；worker 程序 (run_local_scheduler=False) 的並行數調整由 JobWorker 啟動
+        if self.concurrency_controller and run_local_scheduler and not self.job_queue:
+            self.concurrency_controller.start(self.scheduler.get_load, self.scheduler.set_concurrency)
+            atexit.register(self.concurrency_controller.stop)
+        # 准入控制：等待中的任務數或音訊時數超過上限時拒絕新任務 (HTTP 429)，0 表示不限制；
+        # Retry-After 依最近 ADMISSION_THROUGHPUT_WINDOW_SECONDS 內完成的任務計算吞吐量
+        self.admission = AdmissionController(
+            max_queued_jobs=int(os.getenv("ADMISSION_MAX_QUEUED_JOBS", 0)),
+            max_queued_audio_seconds=float(os.getenv("ADMISSION_MAX_QUEUED_AUDIO_HOURS", 0)) * 3600
+        )
+        self.throughput_window_seconds = float(os.getenv("ADMISSION_THROUGHPUT_WINDOW_SECONDS", 900))
+        self._throughput_cache: Tuple[float, Optional[Dict[str, float]]] = (0.0, None)
         # 初始化 Notion 格式化工具
         self.notion_formatter = NotionFormatter()
-        # 任務取消支援
-        self.cancelled_jobs = set()  # 存儲已取消的任務ID
+        # 轉錄模式設定
+        self.transcription_mode = os.getenv("TRANSCRIPTION_MODE", TRANSCRIPTION_MODE['WHISPER_FIRST'])
+        if self.transcription_mode not in TRANSCRIPTION_MODE.values():
+            logging.warning(f"⚠️ 未知的轉錄模式 {self.transcription_mode}，改用 {TRANSCRIPTION_MODE['WHISPER_FIRST']}")
+            self.transcription_mode = TRANSCRIPTION_MODE['WHISPER_FIRST']
+        self.asr_batch_size = int(os.getenv("ASR_BATCH_SIZE", 8))
+        self.max_utterance_seconds = float(os.getenv("MAX_UTTERANCE_SECONDS", 30))
+        self.whisper_language = os.getenv("WHISPER_LANGUAGE") or None
+        # 串流下載解碼設定
+        self.stream_ingest = os.getenv("STREAM_INGEST", "true").lower() == "true"
+        self.stream_chunk_size = int(os.getenv("STREAM_CHUNK_SIZE", 4 * 1024 * 1024))
+        # 分段並行下載設定
+        self.drive_api_endpoint = os.getenv("DRIVE_API_ENDPOINT", "https://www.googleapis.com").rstrip('/')
+        self.ranged_download_min_size = int(os.getenv("RANGED_DOWNLOAD_MIN_SIZE", 32 * 1024 * 1024))
+        self.ranged_download_part_size = int(os.getenv("RANGED_DOWNLOAD_PART_SIZE", 8 * 1024 * 1024))
+        self.ranged_download_concurrency = int(os.getenv("RANGED_DOWNLOAD_CONCURRENCY", 4))
+        self.partial_download_dir = os.getenv(
+            "PARTIAL_DOWNLOAD_DIR", os.path.join(tempfile.gettempdir(), "audio-processor-partials")
+        )
+        # 本機媒體快取 (MEDIA_CACHE_MAX_BYTES=0 表示停用)
+        self.media_cache = MediaCache(
+            os.getenv("MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "audio-processor-media-cache")),
+            int(os.getenv("MEDIA_CACHE_MAX_BYTES", 5 * 1024 * 1024 * 1024))
+        )
+        # 任務工作目錄與磁碟預算
+        self.workspace_manager = WorkspaceManager(
+            root=os.getenv("WORKSPACE_ROOT") or None,
+            budget_bytes=int(os.getenv("WORKSPACE_DISK_BUDGET_BYTES", 20 * 1024 * 1024 * 1024)),
+            use_tmpfs=os.getenv("WORKSPACE_USE_TMPFS", "false").lower() == "true",
+            prefetch_budget_bytes=int(os.getenv("PREFETCH_DISK_BUDGET_BYTES", 5 * 1024 * 1024 * 1024)),
+            prefetch_min_available_memory=int(os.getenv("PREFETCH_MIN_AVAILABLE_MEMORY_BYTES", 2 * 1024 * 1024 * 1024))
+        )
+        self.workspace_reserve_factor = float(os.getenv("WORKSPACE_RESERVE_FACTOR", 5))
+        # 處理成本估算參數 (處理秒數 = 固定開銷 + 音檔秒數 × (ASR + 說話人分離) real-time factor)
+        self.cost_asr_rtf = float(os.getenv("COST_ASR_RTF", 1.0))
+        self.cost_diarization_rtf = float(os.getenv("COST_DIARIZATION_RTF", 0.15))
+        self.cost_fixed_overhead_seconds = float(os.getenv("COST_FIXED_OVERHEAD_SECONDS", 60))
+        self.whisper_model_name = os.getenv("WHISPER_MODEL", "medium")
+        # 各階段耗時預測：依實際執行紀錄學習 (模型 / 引擎 / 主機分組)，樣本不足時以上述成本參數為預設值
+        if isinstance(self.job_store, RedisJobStore):
+            runtime_backend = RedisRuntimeBackend(self.job_store.redis)
+        else:
+            runtime_backend = FileRuntimeBackend(os.getenv(
+                "RUNTIME_MODEL_PATH", os.path.join(tempfile.gettempdir(), "audio-processor-runtime-model.json")
+            ))
+        overhead = self.cost_fixed_overhead_seconds
+        self.runtime_predictor = RuntimePredictor(
+            runtime_backend,
+            priors={
+                'download': (overhead / 6, 0.0),
+                'transcription': (0.0, self.cost_asr_rtf + self.cost_diarization_rtf),
+                'analysis': (overhead / 2, 0.0),
+                'publish': (overhead / 3, 0.0)
+            },
+            context={
+                'model': self.whisper_model_name,
+                'engine': f"{self.transcription_mode}/{'cuda' if torch.cuda.is_available() else 'cpu'}",
+                'host': socket.gethostname()
+            },
+            min_samples=int(os.getenv("RUNTIME_MODEL_MIN_SAMPLES", 3))
+        )
+        atexit.register(self.workspace_manager.release_all)
         
         # 初始化服務
         self.init_services()
+        
+        # Drive 變更監看：以 Changes API 偵測指定資料夾 (DRIVE_WATCH_FOLDER_IDS) 中新增或修改的音檔並自動建立任務
+        self.drive_watcher = None
+        drive_watch_folder_ids = [f.strip() for f in os.getenv("DRIVE_WATCH_FOLDER_IDS", "").split(',') if f.strip()]
+        if drive_watch_folder_ids:
+            self._start_drive_watcher(drive_watch_folder_ids)
 
     def init_services(self):
         """初始化所有需要的服務"""
@@ -112,6 +303,7 @@ class AudioProcessor:
                 scopes=['https://www.googleapis.com/auth/drive']
             )
             self.drive_service = build('drive', 'v3', credentials=service_credentials)
+            self.drive_http_session = AuthorizedSession(service_credentials)
             logging.info("✅ 使用服務帳號初始化 Drive API 成功")
         except Exception as e:
             logging.error(f"❌ 初始化服務帳號 Google Drive API 失敗: {str(e)}")
@@ -136,6 +328,7 @@ class AudioProcessor:
             # 直接使用提供的憑證來建立oauth_drive_service
             # 不再寫入憑證到文件系統
             self.oauth_drive_service = build('drive', 'v3', credentials=credentials)
+            self.oauth_credentials = credentials
             logging.info("✅ 使用OAuth憑證初始化Drive API成功")
             
             # 記錄憑證的有效期限
@@ -149,6 +342,163 @@ class AudioProcessor:
             self.oauth_drive_service = None
             return False
 
+    def _start_drive_watcher(self, folder_ids: List[str]):
+        """啟動 Drive 變更監看 (page token 存於 Redis 或本機檔案，多個程序中只有一個會實際輪詢)"""
+        if not self.drive_http_session:
+            logging.warning("⚠️ 服務帳號 Drive API 未初始化，無法啟動 Drive 變更監看")
+            return
+        if isinstance(self.job_store, RedisJobStore):
+            state = RedisWatchState(self.job_store.redis)
+        else:
+            state = FileWatchState(os.getenv(
+                "DRIVE_WATCH_STATE_PATH", os.path.join(tempfile.gettempdir(), "audio-processor-drive-watch.json")
+            ))
+        self.drive_watcher = DriveChangeWatcher(
+            self.drive_http_session,
+            self.drive_api_endpoint,
+            state,
+            folder_ids,
+            on_file=self.ingest_drive_file,
+            poll_interval=float(os.getenv("DRIVE_WATCH_INTERVAL", 15))
+        )
+        self.drive_watcher.start()
+        atexit.register(self.drive_watcher.stop)
+
+    def ingest_drive_file(self, file_meta: Dict[str, Any]) -> bool:
+        """為 Drive 變更監看偵測到的音檔建立任務；等待中的任務已達上限時回傳 False (稍後重試)"""
+        if not self.check_admission()['admitted']:
+            return False
+        file_id = file_meta['id']
+        # 同一檔案內容只建立一次任務 (重複的變更通知或重新讀取同一頁變更時沿用既有任務)
+        version = file_meta.get('md5Checksum') or file_meta.get('modifiedTime')
+        job_data = self.create_job(str(uuid.uuid4()), file_id, user_id=self.DRIVE_WATCHER_USER,
+                                   file_meta=file_meta, idempotency_key=f"drive:{file_id}:{version}")
+        if not job_data.get('deduplicated'):
+            self.process_file_async(job_data['id'], file_id)
+            logging.info(f"[Job {job_data['id']}] 📥 偵測到 Drive 新音檔 {file_meta.get('name')}，已自動建立任務")
+        return True
+
+    def _drive_media_url(self, file_id: str) -> str:
+        """Drive 檔案內容的下載 URL (可透過 DRIVE_API_ENDPOINT 指向本機測試伺服器)"""
+        return f"{self.drive_api_endpoint}/drive/v3/files/{file_id}?alt=media"
+
+    def _get_ranged_downloader(self, size: Optional[int]) -> Optional[RangedDownloader]:
+        """檔案大小達到門檻時回傳分段下載器，否則回傳 None"""
+        if not self.drive_http_session or not size or self.ranged_download_min_size <= 0:
+            return None
+        if int(size) < self.ranged_download_min_size:
+            return None
+        return RangedDownloader(
+            self.drive_http_session,
+            part_size=self.ranged_download_part_size,
+            concurrency=self.ranged_download_concurrency
+        )
+
+    def _media_cache_key(self, file_id: str, file_meta: Dict[str, Any]) -> Optional[str]:
+        """以檔案的 md5Checksum / modifiedTime 產生媒體快取鍵"""
+        return MediaCache.make_key(file_id, file_meta.get('md5Checksum'), file_meta.get('modifiedTime'))
+
+    def _partial_download_path(self, file_id: str) -> str:
+        """大型檔案未完成分段的固定位置 (串流與一般下載共用，失敗重試時可互相續傳)
+
+        使用前須以 partial_download_lock 鎖定，同一檔案同時只有一個任務寫入。
+        """
+        os.makedirs(self.partial_download_dir, exist_ok=True)
+        return os.path.join(self.partial_download_dir, file_id)
+
+    @staticmethod
+    def _drive_media_version(file_meta: Dict[str, Any]) -> str:
+        """檔案版本 (md5Checksum / modifiedTime)，續傳時用來確認分段屬於同一份內容"""
+        return f"{file_meta.get('md5Checksum') or ''}:{file_meta.get('modifiedTime') or ''}"
+
+    def _download_drive_media(self, file_id: str, local_path: str, file_meta: Dict[str, Any],
+                              progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """下載 Drive 檔案內容；優先使用本機媒體快取，大型檔案使用分段並行下載並可續傳"""
+        cache_key = self._media_cache_key(file_id, file_meta)
+        if self.media_cache.materialize(cache_key, local_path):
+            return
+        
+        size = int(file_meta['size']) if file_meta.get('size') else None
+        ranged_downloader = self._get_ranged_downloader(size)
+        if ranged_downloader:
+            # 未完成的分段保存在固定目錄，失敗重試時可從最後完成的分段續傳；
+            # 其他任務正在下載同一檔案時先等待，之後直接使用它放入媒體快取的檔案
+            try:
+                with partial_download_lock(self._partial_download_path(file_id)) as partial_path:
+                    if self.media_cache.materialize(cache_key, local_path):
+                        return
+                    ranged_downloader.download(self._drive_media_url(file_id), partial_path, size, progress_callback,
+                                               version=self._drive_media_version(file_meta))
+                    shutil.move(partial_path, local_path)
+                    self.media_cache.put(local_path, cache_key)
+                return
+            except RangeNotSupportedError as e:
+                logging.warning(f"⚠️ 分段下載不可用，改用單一連線下載: {e}")
+        
+        request = self.drive_service.files().get_media(fileId=file_id)
+        with open(local_path, 'wb') as f:
+            downloader = MediaIoBaseDownload(f, request)
+            done = False
+            while not done:
+                status, done = downloader.next_chunk()
+                logging.debug(f"下載進度: {int(status.progress() * 100)}%")
+        self.media_cache.put(local_path, cache_key)
+
+    def _fetch_drive_range(self, file_id: str, start: int, end: int) -> bytes:
+        """以 HTTP Range 讀取 Drive 檔案的部分內容"""
+        response = self.drive_http_session.get(
+            self._drive_media_url(file_id), headers={'Range': f'bytes={start}-{end}'}, timeout=30
+        )
+        response.raise_for_status()
+        return response.content
+
+    # 媒體探測與批次送出所需的 Drive 檔案欄位
+    MEDIA_FIELDS = "id,name,mimeType,size,md5Checksum,modifiedTime,videoMediaMetadata(durationMillis)"
+    # 任務處理期間 (下載、Notion 頁面、附件擷取) 所需的全部 Drive 檔案欄位，任務開始時一次取得
+    JOB_FILE_FIELDS = MEDIA_FIELDS + ",webViewLink"
+    # Drive 變更監看自動建立的任務所屬的使用者 (排程的每位使用者並行上限同樣適用)
+    DRIVE_WATCHER_USER = 'drive-watcher'
+
+    def probe_media(self, file_id: str, file_meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """在下載前取得音訊時長、取樣率與聲道數
+        
+        優先使用 Drive 的 videoMediaMetadata，否則只以 Range 讀取容器標頭；
+        兩者皆不可用時依檔案大小粗估 (假設 64 kbps)。已取得檔案資訊 (file_meta) 時不再查詢 Drive。
+        """
+        if file_meta is None:
+            file_meta = self.drive_service.files().get(fileId=file_id, fields=self.MEDIA_FIELDS).execute()
+        size = int(file_meta['size']) if file_meta.get('size') else None
+        info = {'size_bytes': size, 'mime_type': file_meta.get('mimeType')}
+        
+        duration_millis = (file_meta.get('videoMediaMetadata') or {}).get('durationMillis')
+        if duration_millis:
+            info['duration_seconds'] = int(duration_millis) / 1000
+            info['source'] = 'drive_metadata'
+        elif self.drive_http_session:
+            try:
+                probe = MediaProbe(lambda start, end: self._fetch_drive_range(file_id, start, end))
+                info.update(probe.probe(size))
+            except Exception as e:
+                logging.warning(f"⚠️ 讀取檔案標頭失敗 ({file_id}): {e}")
+        
+        if not info.get('duration_seconds') and size:
+            info['duration_seconds'] = size * 8 / 64000
+            info['duration_estimated'] = True
+            info['source'] = 'size_heuristic'
+        
+        logging.info(f"✅ 媒體探測完成 ({file_id}): {info}")
+        return info
+
+    def estimate_processing_cost(self, audio_seconds: Optional[float]) -> Dict[str, Any]:
+        """依音檔長度預測處理所需時間 (各階段耗時來自 runtime_predictor，排程器也以此作為任務成本)"""
+        audio_seconds = audio_seconds or 0
+        prediction = self.runtime_predictor.predict(audio_seconds)
+        return {
+            'audio_seconds': round(audio_seconds, 1),
+            'predicted_processing_seconds': prediction['total_seconds'],
+            'predicted_stages': prediction['stages']
+        }
+
     def download_file(self, file_id: str, target_dir: str) -> str: # Returns filename
         """從 Google Drive 下載檔案到指定的目標目錄 (使用服務帳號)"""
         logging.info(f"🔄 從 Google Drive 下載檔案 (ID: {file_id}) 到目錄 {target_dir}")
@@ -161,21 +511,14 @@ class AudioProcessor:
             os.makedirs(target_dir, exist_ok=True)
             
             file_meta = self.drive_service.files().get(
-                fileId=file_id, fields="name,mimeType"
+                fileId=file_id, fields=DRIVE_MEDIA_FIELDS
             ).execute()
             
             raw_file_name = file_meta.get('name', f"file_{file_id}")
             safe_file_name = re.sub(r'[\\/*?:"<>|]', "_", raw_file_name)
             local_path = os.path.join(target_dir, safe_file_name)
             
-            request_obj = self.drive_service.files().get_media(fileId=file_id)
-            
-            with open(local_path, 'wb') as f:
-                downloader = MediaIoBaseDownload(f, request_obj)
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                    # logging.debug(f"下載進度: {int(status.progress() * 100)}%") # Can be verbose
+            self._download_drive_media(file_id, local_path, file_meta)
             
             logging.info(f"✅ 檔案下載完成: {safe_file_name} (儲存於 {target_dir})")
             return safe_file_name # Return just the filename
@@ -184,8 +527,13 @@ class AudioProcessor:
             logging.error(f"❌ 下載檔案 ID {file_id} 到 {target_dir} 失敗: {str(e)}")
             raise
 
-    def download_from_drive(self, file_id: str) -> Tuple[str, str]:
-        """從 Google Drive 下載檔案到臨時目錄 (使用服務帳號)"""
+    def download_from_drive(self, file_id: str, progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                            target_dir: Optional[str] = None,
+                            file_meta: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+        """從 Google Drive 下載檔案到臨時目錄 (使用服務帳號)；指定 target_dir 時下載到該目錄
+        
+        已取得檔案資訊 (file_meta，需包含 DRIVE_MEDIA_FIELDS) 時不再查詢 Drive。
+        """
         logging.info(f"🔄 從 Google Drive 下載檔案 (ID: {file_id})")
         
         try:
@@ -193,13 +541,14 @@ class AudioProcessor:
             if not self.drive_service:
                 raise RuntimeError("服務帳號 Drive API 未初始化，無法下載檔案")
             
-            # 建立臨時目錄
-            temp_dir = tempfile.mkdtemp()
+            # 建立臨時目錄 (由呼叫端提供的目錄則不在失敗時刪除)
+            temp_dir = target_dir or tempfile.mkdtemp()
             
             # 獲取文件資訊
-            file_meta = self.drive_service.files().get(
-                fileId=file_id, fields="name,mimeType"
-            ).execute()
+            if file_meta is None:
+                file_meta = self.drive_service.files().get(
+                    fileId=file_id, fields=DRIVE_MEDIA_FIELDS
+                ).execute()
             
             # 獲取檔案名稱並清理不安全的字元
             raw_file_name = file_meta.get('name', f"file_{file_id}")
@@ -208,26 +557,122 @@ class AudioProcessor:
             local_path = os.path.join(temp_dir, safe_file_name)
             
             # 下載檔案
-            request = self.drive_service.files().get_media(fileId=file_id)
-            
-            with open(local_path, 'wb') as f:
-                downloader = MediaIoBaseDownload(f, request)
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                    logging.debug(f"下載進度: {int(status.progress() * 100)}%")
+            self._download_drive_media(file_id, local_path, file_meta, progress_callback)
             
             logging.info(f"✅ 檔案下載完成: {safe_file_name} (儲存於 {temp_dir})")
             return local_path, temp_dir
             
         except Exception as e:
             logging.error(f"❌ 下載檔案失敗: {str(e)}")
-            if 'temp_dir' in locals() and os.path.exists(temp_dir):
+            if not target_dir and 'temp_dir' in locals() and os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
             raise
     
+    def download_and_convert_stream(self, file_id: str, progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                    target_dir: Optional[str] = None,
+                                    file_meta: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+        """串流下載並同時以 ffmpeg 解碼為 WAV (16kHz 單聲道)，下載與解碼重疊進行
+        
+        僅寫入一個 WAV 檔；若檔案無法由管線解碼 (如 moov 位於檔尾的 M4A)，
+        則將已下載的位元組落地後改用 convert_to_wav，不需重新下載。已取得檔案資訊 (file_meta) 時不再查詢 Drive。
+        """
+        logging.info(f"🔄 串流下載並解碼檔案 (ID: {file_id})")
+        
+        if not self.drive_service:
+            raise RuntimeError("服務帳號 Drive API 未初始化，無法下載檔案")
+        
+        temp_dir = target_dir or tempfile.mkdtemp()
+        decoder = None
+        sink = None
+        cache_tmp_path = None
+        try:
+            if file_meta is None:
+                file_meta = self.drive_service.files().get(
+                    fileId=file_id, fields=DRIVE_MEDIA_FIELDS
+                ).execute()
+            raw_file_name = file_meta.get('name', f"file_{file_id}")
+            safe_file_name = re.sub(r'[\\/*?:"<>|]', "_", raw_file_name)
+            base_name = os.path.splitext(safe_file_name)[0]
+            
+            # 媒體快取命中時完全不經過網路
+            cache_key = self._media_cache_key(file_id, file_meta)
+            cached_path = os.path.join(temp_dir, safe_file_name)
+            if self.media_cache.materialize(cache_key, cached_path):
+                wav_path = self.convert_to_wav(cached_path)
+                os.remove(cached_path)
+                return wav_path, temp_dir
+            
+            size = int(file_meta['size']) if file_meta.get('size') else None
+            ranged_downloader = self._get_ranged_downloader(size)
+            with ExitStack() as stack:
+                if ranged_downloader:
+                    # 分段檔案同時只給一個任務寫入：其他任務正在下載同一檔案時先等待，
+                    # 之後若它已放入媒體快取即直接使用
+                    partial_path = stack.enter_context(partial_download_lock(self._partial_download_path(file_id)))
+                    if self.media_cache.materialize(cache_key, cached_path):
+                        wav_path = self.convert_to_wav(cached_path)
+                        os.remove(cached_path)
+                        return wav_path, temp_dir
+                
+                if cache_key and self.media_cache.enabled:
+                    cache_tmp_path = self.media_cache.new_temp_path()
+                decoder = StreamingDecoder(os.path.join(temp_dir, f"{base_name}.wav"))
+                sink = StreamingIngestSink(decoder, cached_path, tee_path=cache_tmp_path)
+                
+                if ranged_downloader:
+                    # 大型檔案：分段並行下載，依序餵入 ffmpeg；已完成的分段同時落地，失敗重試時可續傳
+                    ranged_downloader.download_to_sink(
+                        self._drive_media_url(file_id), sink, size, progress_callback,
+                        resume_path=partial_path,
+                        version=self._drive_media_version(file_meta)
+                    )
+                else:
+                    request = self.drive_service.files().get_media(fileId=file_id)
+                    downloader = MediaIoBaseDownload(sink, request, chunksize=self.stream_chunk_size)
+                    done = False
+                    while not done:
+                        status, done = downloader.next_chunk()
+                        logging.debug(f"串流下載進度: {int(status.progress() * 100)}%")
+                sink.close()
+
+                if sink.mode is None:
+                    # 沒有收到任何位元組：ffmpeg 尚未啟動，直接回報空檔案
+                    raise ValueError(f"檔案是空的 (0 bytes)，無法解碼: {raw_file_name}")
+                if sink.mode == 'spool':
+                    self.media_cache.discard(cache_tmp_path)
+                    self.media_cache.put(sink.spool_path, cache_key)
+                    wav_path = self.convert_to_wav(sink.spool_path)
+                    os.remove(sink.spool_path)
+                else:
+                    wav_path = decoder.finish()
+                    self.media_cache.commit(cache_tmp_path, cache_key)
+            
+            logging.info(f"✅ 串流下載與解碼完成: {os.path.basename(wav_path)} (儲存於 {temp_dir})")
+            return wav_path, temp_dir
+        
+        except Exception as e:
+            if sink:
+                sink.close()
+            if decoder:
+                decoder.abort()
+            self.media_cache.discard(cache_tmp_path)
+            if not target_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            if isinstance(e, (BrokenPipeError, RuntimeError)) and sink and sink.mode == 'stream':
+                # ffmpeg 無法解碼此串流，回退為先下載再轉換
+                logging.warning(f"⚠️ 串流解碼失敗，改用完整下載後轉換: {e}")
+                audio_path, temp_dir = self.download_from_drive(file_id, progress_callback, target_dir, file_meta)
+                wav_path = self.convert_to_wav(audio_path)
+                os.remove(audio_path)
+                return wav_path, temp_dir
+            logging.error(f"❌ 串流下載檔案失敗: {str(e)}")
+            raise
+    
+    # 檔案列表只取前端需要的欄位
+    DRIVE_LIST_FIELDS = "nextPageToken, files(id, name, mimeType, size, parents)"
+
     def list_drive_files(self, query="trashed = false and (mimeType contains 'audio/' or mimeType = 'application/pdf')"):
-        """列出Google Drive檔案 (使用OAuth認證)"""
+        """列出Google Drive檔案 (使用OAuth認證，會讀完所有分頁)"""
         logging.info(f"🔄 使用OAuth憑證列出Google Drive檔案")
 
         if not self.oauth_drive_service:
@@ -235,49 +680,141 @@ class AudioProcessor:
             return []
 
         try:
-            # 執行查詢，取得檔案 ID、名稱、MIME 類型、大小與父資料夾
-            results = self.oauth_drive_service.files().list(
-                q=query,
-                spaces='drive',
-                fields="files(id, name, mimeType, size, parents)",
-                orderBy="modifiedTime desc"
-            ).execute()
-
-            files = results.get('files', [])
+            files = [file for page in self.iter_drive_file_pages(query) for file in page]
             logging.info(f"✅ 已成功獲取 {len(files)} 個檔案")
             return files
         except Exception as e:
             logging.error(f"❌ 列出Google Drive檔案失敗: {str(e)}")
             return []
 
-    def find_folder_id_by_path(self, folder_path: str) -> Optional[str]:
-        """
-        根據多層資料夾名稱（如 'WearNote_Recordings/Documents'）遞迴查找最終資料夾ID。
+    def iter_drive_file_pages(self, query: str, http=None, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """依 nextPageToken 逐頁列出符合查詢的檔案 (產生器，每次產出一頁)；http 為此執行緒專用的 AuthorizedHttp"""
+        page_token = None
+        while True:
+            request = self.oauth_drive_service.files().list(
+                q=query,
+                spaces='drive',
+                fields=self.DRIVE_LIST_FIELDS,
+                orderBy="modifiedTime desc",
+                pageSize=page_size,
+                pageToken=page_token
+            )
+            results = request.execute(http=http) if http is not None else request.execute()
+            yield results.get('files', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    def stream_drive_queries(self, queries: List[str]) -> Iterator[List[Dict[str, Any]]]:
+        """同時執行多個檔案查詢，依取得的先後逐頁產出 (已產出過的檔案 ID 不重複)
+
+        googleapiclient 的 HTTP 物件不能跨執行緒共用，因此每個查詢在自己的執行緒中使用獨立的 AuthorizedHttp。
+        呼叫端提前結束 (例如客戶端中斷連線) 時，其餘查詢會在讀完目前這一頁後停止。
         """
-        if not self.oauth_drive_service:
-            return None
-        names = folder_path.strip('/').split('/')
-        parent_id = 'root'
-        for name in names:
+        seen = set()
+
+        def unique(page):
+            fresh = [file for file in page if file.get('id') and file['id'] not in seen]
+            seen.update(file['id'] for file in fresh)
+            return fresh
+
+        if len(queries) <= 1 or self.oauth_credentials is None:
+            for query in queries:
+                for page in self.iter_drive_file_pages(query):
+                    yield unique(page)
+            return
+
+        pages: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce(query):
+            try:
+                http = AuthorizedHttp(self.oauth_credentials, http=httplib2.Http())
+                for page in self.iter_drive_file_pages(query, http=http):
+                    if stop.is_set():
+                        break
+                    pages.put(page)
+                pages.put(done)
+            except Exception as e:
+                pages.put(e)
+
+        for query in queries:
+            threading.Thread(target=produce, args=(query,), name='drive-list', daemon=True).start()
+        try:
+            remaining = len(queries)
+            while remaining:
+                item = pages.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield unique(item)
+        finally:
+            stop.set()
+
+    def get_files_metadata(self, file_ids: List[str], fields: Optional[str] = None,
+                           chunk_size: int = 100) -> Dict[str, Optional[Dict[str, Any]]]:
+        """以 BatchHttpRequest 一次查詢多個檔案的資訊 (每批最多 100 個)，查詢失敗的檔案為 None"""
+        fields = fields or self.MEDIA_FIELDS
+        # 重複的 request_id 會讓 BatchHttpRequest.add 拋出例外，先去除重複 (保留順序)
+        file_ids = list(dict.fromkeys(file_ids))
+        metadata: Dict[str, Optional[Dict[str, Any]]] = {}
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                logging.warning(f"⚠️ 取得檔案資訊失敗 ({request_id}): {exception}")
+                metadata[request_id] = None
+            else:
+                metadata[request_id] = response
+        
+        for start in range(0, len(file_ids), chunk_size):
+            batch = self.drive_service.new_batch_http_request(callback=callback)
+            for file_id in file_ids[start:start + chunk_size]:
+                batch.add(self.drive_service.files().get(fileId=file_id, fields=fields), request_id=file_id)
+            batch.execute()
+        return metadata
+
+    def list_folder_audio_files(self, folder_id: str) -> List[Dict[str, Any]]:
+        """列出資料夾內 (不含子資料夾) 的所有音訊檔案及其媒體資訊"""
+        files = []
+        page_token = None
+        while True:
             results = self.oauth_drive_service.files().list(
-                q=f"trashed = false and mimeType = 'application/vnd.google-apps.folder' and name = '{name}' and '{parent_id}' in parents",
+                q=f"trashed = false and mimeType contains 'audio/' and '{folder_id}' in parents",
                 spaces='drive',
-                fields="files(id, name)",
-                pageSize=10
+                fields=f"nextPageToken, files({self.MEDIA_FIELDS})",
+                orderBy="modifiedTime desc",
+                pageSize=1000,
+                pageToken=page_token
             ).execute()
-            folders = results.get('files', [])
-            if not folders:
-                return None
-            parent_id = folders[0]['id']
-        return parent_id
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
+
+    def get_folder_index(self, user_id: Optional[str] = None, drive_service=None) -> FolderIndex:
+        """取得使用者的資料夾索引 (drive_service 預設為 OAuth Drive 服務)"""
+        return self.folder_index_cache.get(user_id or 'default', drive_service or self.oauth_drive_service)
+
+    def find_folder_id_by_path(self, folder_path: str, user_id: Optional[str] = None) -> Optional[str]:
+        """
+        根據多層資料夾名稱（如 'WearNote_Recordings/Documents'）查找最終資料夾ID (透過資料夾索引，不需逐層查詢)。
+        """
+        if not self.oauth_drive_service:
+            return None
+        return self.get_folder_index(user_id).find(folder_path)
 
-    def download_and_extract_text(self, file_id: str) -> Tuple[Optional[str], Optional[str]]:
-        """下載並提取 PDF 文字內容 (使用服務帳號)"""
+    def download_and_extract_text(self, file_id: str, target_dir: Optional[str] = None,
+                                  file_meta: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """下載並提取 PDF 文字內容 (使用服務帳號)；已取得檔案資訊 (file_meta) 時不再查詢 Drive"""
         try:
-            # 獲取文件資訊
-            file_meta = self.drive_service.files().get(
-                fileId=file_id, fields="name,mimeType"
-            ).execute()
+            # 獲取文件資訊 (取得下載所需的全部欄位，下載時不必再查詢一次)
+            if file_meta is None:
+                file_meta = self.drive_service.files().get(
+                    fileId=file_id, fields=DRIVE_MEDIA_FIELDS
+                ).execute()
             
             mime_type = file_meta.get('mimeType', '')
             
@@ -286,7 +823,7 @@ class AudioProcessor:
                 return None, None
             
             # 下載文件
-            local_path, temp_dir = self.download_from_drive(file_id)
+            local_path, temp_dir = self.download_from_drive(file_id, target_dir=target_dir, file_meta=file_meta)
             
             # 提取 PDF 文字
             text = ""
@@ -368,8 +905,8 @@ class AudioProcessor:
         # 如果都無法匹配，返回 None
         return None
 
-    def get_file_folder_path(self, file_id):
-        """獲取檔案所在的完整資料夾路徑"""
+    def get_file_folder_path(self, file_id, user_id: Optional[str] = None):
+        """獲取檔案所在的完整資料夾路徑 (父資料夾的路徑由資料夾索引計算)"""
         try:
             if not self.oauth_drive_service:
                 logging.error("未初始化 Drive 服務，無法獲取資料夾路徑")
@@ -380,41 +917,7 @@ class AudioProcessor:
                 fileId=file_id, 
                 fields="parents"
             ).execute()
-            
-            if not file.get('parents'):
-                return "root"
-            
-            # 構建資料夾路徑
-            path = []
-            parent_id = file['parents'][0]
-            
-            # 向上尋找父資料夾直到根目錄
-            max_depth = 10  # 防止無限循環
-            depth = 0
-            
-            while parent_id and depth < max_depth:
-                try:
-                    parent = self.oauth_drive_service.files().get(
-                        fileId=parent_id,
-                        fields="id,name,parents"
-                    ).execute()
-                    
-                    path.insert(0, parent.get('name', 'unknown'))
-                    
-                    # 檢查是否有父資料夾
-                    if 'parents' in parent and parent['parents']:
-                        parent_id = parent['parents'][0]
-                    else:
-                        break
-                        
-                    depth += 1
-                    
-                except Exception as e:
-                    logging.error(f"獲取父資料夾資訊失敗: {e}")
-                    break
-            
-            # 返回由 / 連接的資料夾路徑
-            return "/".join(path)
+            return self.get_folder_index(user_id).file_path(file.get('parents'))
             
         except Exception as e:
             logging.error(f"獲取檔案資料夾路徑失敗: {e}")
@@ -501,8 +1004,12 @@ class AudioProcessor:
             logging.error(f"❌ 筆記生成失敗: {str(e)}")
             return "筆記生成失敗，請參考會議摘要和完整記錄。"
 
-    def create_notion_page(self, title: str, summary: str, todos: List[str], segments: List[Dict[str, Any]], speaker_map: Dict[str, str], file_id: str = None) -> Tuple[str, str]:
-        """建立單一 Notion 頁面，包含標題、日期、參與者、摘要、待辦事項、完整筆記與內嵌的逐字稿"""
+    def create_notion_page(self, title: str, summary: str, todos: List[str], segments: List[Dict[str, Any]], speaker_map: Dict[str, str], file_id: str = None,
+                           file_meta: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+        """建立單一 Notion 頁面，包含標題、日期、參與者、摘要、待辦事項、完整筆記與內嵌的逐字稿
+        
+        已取得音檔的檔案資訊 (file_meta，需包含 name 與 webViewLink) 時不再查詢 Drive。
+        """
         logging.info("🔄 建立 Notion 頁面...")
 
         notion_token = os.getenv("NOTION_TOKEN")
@@ -522,9 +1029,10 @@ class AudioProcessor:
         file_date = None
         if file_id:
             try:
-                file_meta = self.drive_service.files().get(
-                    fileId=file_id, fields="name"
-                ).execute()
+                if file_meta is None:
+                    file_meta = self.drive_service.files().get(
+                        fileId=file_id, fields="name,webViewLink"
+                    ).execute()
                 filename = file_meta.get('name', '')
                 if filename:
                     file_date = self.extract_date_from_filename(filename)
@@ -705,7 +1213,7 @@ class AudioProcessor:
             audio_link_blocks = []
             if file_id:
                 try:
-                    file_info = self.drive_service.files().get(
+                    file_info = file_meta or self.drive_service.files().get(
                         fileId=file_id, fields="name,webViewLink"
                     ).execute()
                     file_name = file_info.get('name', '音頻檔案')
@@ -859,8 +1367,8 @@ class AudioProcessor:
         # 載入 Whisper 模型 (如果尚未載入)
         if self.whisper_model is None:
             try:
-                logging.info("- 載入 Whisper 模型 (medium)...")
-                self.whisper_model = whisper.load_model("medium")
+                logging.info(f"- 載入 Whisper 模型 ({self.whisper_model_name})...")
+                self.whisper_model = install_whisper_cancellation(whisper.load_model(self.whisper_model_name))
                 logging.info("✅ Whisper 模型載入成功")
             except Exception as e:
                 logging.error(f"❌ Whisper 模型載入失敗: {e}")
@@ -1029,7 +1537,7 @@ class AudioProcessor:
                 "todos": ["檢查摘要生成服務"]
             }
 
-    def process_audio(self, audio_path: str) -> Tuple[str, List[Dict[str, Any]], List[str]]:
+    def process_audio(self, audio_path: str, mode: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]], List[str]]:
         """處理音檔：預處理、轉文字並進行說話人分離"""
         logging.info(f"🔄 處理音檔: {os.path.basename(audio_path)}")
         
@@ -1049,8 +1557,38 @@ class AudioProcessor:
             # 如果產生了新的處理檔案，可以選擇刪除原始檔案
             os.remove(audio_path)
             audio_path = preprocessed_path
+        
+        mode = mode or self.transcription_mode
+        transcript_full = ""
+        
+        if mode == TRANSCRIPTION_MODE['DIARIZE_FIRST']:
+            # 先說話人分離，再將合併後的發言批次送入 Whisper
+            logging.info("- 執行說話人分離 (diarize-first 模式)...")
+            diarization = self.run_diarization(audio_path)
+            utterances = self.merge_speaker_turns(diarization)
+            segments = self.transcribe_utterances(audio_path, utterances)
+            original_speakers = sorted({seg["speaker"] for seg in segments})
+        else:
+            asr_result = self.transcribe_full(audio_path)
             
-        # 使用 Whisper 進行語音轉文字，添加錯誤處理和回退機制
+            # 使用 Pyannote 進行說話人分離
+            logging.info("- 執行說話人分離...")
+            diarization = self.run_diarization(audio_path)
+            
+            # 整合結果
+            logging.info("- 整合結果...")
+            segments, original_speakers = self.assign_speakers_to_segments(asr_result["segments"], diarization)
+        
+        logging.info(f"✅ 音檔處理完成，共 {len(segments)} 個段落")
+        return transcript_full, segments, original_speakers
+
+    def run_diarization(self, audio_path: str):
+        """使用 Pyannote 進行說話人分離 (每個步驟之間檢查取消狀態)"""
+        check_cancelled()
+        return self.diarization_pipeline(audio_path, hook=diarization_hook)
+
+    def transcribe_full(self, audio_path: str) -> Dict[str, Any]:
+        """使用 Whisper 對整段音檔進行語音轉文字，包含錯誤處理和回退機制"""
         logging.info("- 執行語音轉文字...")
         asr_result = None
         transcription_attempts = [
@@ -1066,8 +1604,8 @@ class AudioProcessor:
                 
                 # 如果指定了不同的模型大小，臨時加載該模型
                 temp_model = None
-                if attempt['model_name'] and attempt['model_name'] != "medium":
-                    temp_model = whisper.load_model(attempt['model_name'])
+                if attempt['model_name'] and attempt['model_name'] != self.whisper_model_name:
+                    temp_model = install_whisper_cancellation(whisper.load_model(attempt['model_name']))
                     model_to_use = temp_model
                 else:
                     model_to_use = self.whisper_model
@@ -1083,6 +1621,8 @@ class AudioProcessor:
                 logging.info(f"✅ 語音轉錄成功 ({attempt['description']})")
                 break
             
+            except JobCancelled:
+                raise
             except RuntimeError as e:
                 # 檢查是否是張量大小不匹配錯誤
                 if "must match the size of tensor" in str(e):
@@ -1100,18 +1640,15 @@ class AudioProcessor:
         if not asr_result:
             raise RuntimeError("無法轉錄音頻文件")
         
-        # 使用 Pyannote 進行說話人分離
-        logging.info("- 執行說話人分離...")
-        diarization = self.diarization_pipeline(audio_path)
-        
-        # 整合結果
-        logging.info("- 整合結果...")
+        return asr_result
+
+    def assign_speakers_to_segments(self, asr_segments: List[Dict[str, Any]], diarization) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """將 Whisper 段落對齊到說話人 (取重疊時間最長的說話人)"""
         segments = []
-        transcript_full = ""
         original_speakers = set()
         
         # 製作格式化的輸出
-        for i, segment in enumerate(asr_result["segments"]):
+        for i, segment in enumerate(asr_segments):
             # 找出此段落的主要說話人
             segment_start = segment["start"]
             segment_end = segment["end"]
@@ -1144,104 +1681,379 @@ class AudioProcessor:
             
             segments.append(segment_data)
         
-        logging.info(f"✅ 音檔處理完成，共 {len(segments)} 個段落")
-        return transcript_full, segments, list(original_speakers)
+        return segments, list(original_speakers)
+
+    def merge_speaker_turns(self, diarization, max_duration: Optional[float] = None, max_gap: float = 1.0) -> List[Dict[str, Any]]:
+        """將說話人分離結果合併為不超過 max_duration 秒的發言段落
+        
+        相鄰且同一說話人、間隔不超過 max_gap 秒的片段會被合併；
+        超過 max_duration 的單一片段會被切分，以符合 Whisper 的 30 秒輸入窗口。
+        """
+        max_duration = max_duration or self.max_utterance_seconds
+        turns = sorted(
+            ((turn.start, turn.end, speaker) for turn, _, speaker in diarization.itertracks(yield_label=True)),
+            key=lambda t: t[0]
+        )
+        
+        utterances = []
+        for start, end, speaker in turns:
+            if end <= start:
+                continue
+            last = utterances[-1] if utterances else None
+            if (last and last["speaker"] == speaker
+                    and start - last["end"] <= max_gap
+                    and max(end, last["end"]) - last["start"] <= max_duration):
+                last["end"] = max(end, last["end"])
+                continue
+            
+            # 切分過長的片段
+            while end - start > max_duration:
+                utterances.append({"speaker": speaker, "start": start, "end": start + max_duration})
+                start += max_duration
+            utterances.append({"speaker": speaker, "start": start, "end": end})
+        
+        logging.info(f"- 說話人片段合併完成: {len(turns)} 個片段 -> {len(utterances)} 段發言")
+        return utterances
 
-    def create_job(self, job_id: str, file_id: str, attachment_file_ids: Optional[List[str]] = None) -> Dict[str, Any]:
-        """創建一個新的處理任務"""
+    def transcribe_utterances(self, audio_path: str, utterances: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """以批次方式將各段發言送入 Whisper 解碼，直接得到帶說話人的段落"""
+        batch_size = batch_size or self.asr_batch_size
+        if not utterances:
+            return []
+        
+        model = self.whisper_model
+        sample_rate = whisper.audio.SAMPLE_RATE
+        audio = whisper.load_audio(audio_path)
+        n_mels = getattr(model.dims, "n_mels", 80)
+        
+        def utterance_mel(utterance):
+            clip = audio[int(utterance["start"] * sample_rate):int(utterance["end"] * sample_rate)]
+            return whisper.log_mel_spectrogram(whisper.pad_or_trim(clip), n_mels=n_mels)
+        
+        # 以第一段發言偵測語言，避免短句各自判斷造成語言跳動
+        language = self.whisper_language
+        if language is None:
+            _, probs = model.detect_language(utterance_mel(utterances[0]).to(model.device))
+            language = max(probs, key=probs.get)
+            logging.info(f"- 偵測到語言: {language}")
+        
+        options = whisper.DecodingOptions(
+            language=language,
+            without_timestamps=True,
+            fp16=model.device.type == "cuda"
+        )
+        
+        segments = []
+        total_batches = (len(utterances) + batch_size - 1) // batch_size
+        for batch_index, i in enumerate(range(0, len(utterances), batch_size)):
+            check_cancelled()
+            batch = utterances[i:i + batch_size]
+            logging.info(f"- 批次轉錄 {batch_index + 1}/{total_batches} ({len(batch)} 段發言)")
+            mel = torch.stack([utterance_mel(u) for u in batch]).to(model.device)
+            results = whisper.decode(model, mel, options)
+            
+            for utterance, result in zip(batch, results):
+                text = result.text.strip()
+                if not text or result.no_speech_prob > 0.8:
+                    continue
+                segments.append({
+                    "speaker": utterance["speaker"],
+                    "start": utterance["start"],
+                    "end": utterance["end"],
+                    "text": text
+                })
+        
+        return segments
+
+    def create_job(self, job_id: str, file_id: str, attachment_file_ids: Optional[List[str]] = None,
+                   user_id: Optional[str] = None, file_meta: Optional[Dict[str, Any]] = None,
+                   group_id: Optional[str] = None, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """創建一個新的處理任務 (同時探測媒體資訊並預測處理成本)
+        
+        file_meta 為已取得的 Drive 檔案資訊 (例如批次送出時一次查詢)；group_id 為所屬任務群組。
+        重複的請求不會建立新任務，而是回傳既有任務 (回傳值帶有 deduplicated=True，呼叫端不需再送出處理)：
+        同一使用者的相同 idempotency_key、同一使用者仍在等待或處理中的相同任務，或同一使用者內容未變且近期已完成的相同任務。
+        """
+        idempotency_scope = f"idem:{user_id or 'anonymous'}:{idempotency_key}" if idempotency_key else None
+        if idempotency_scope:
+            existing_id = self.job_store.reserve_key(idempotency_scope, job_id, self.idempotency_key_ttl)
+            existing = self.job_store.get(existing_id) if existing_id else None
+            if existing:
+                logging.info(f"✅ 冪等鍵 {idempotency_key} 已對應任務 {existing_id}，不重複建立")
+                return {**existing, 'deduplicated': True}
+            if existing_id:
+                self.job_store.set_key(idempotency_scope, job_id, self.idempotency_key_ttl)
+        
+        media_info = None
+        if self.drive_service:
+            try:
+                if file_meta is None:
+                    file_meta = self.drive_service.files().get(fileId=file_id, fields=self.MEDIA_FIELDS).execute()
+                media_info = self.probe_media(file_id, file_meta)
+            except Exception as e:
+                logging.warning(f"⚠️ 任務 {job_id} 媒體探測失敗: {e}")
+        md5_checksum = (file_meta or {}).get('md5Checksum')
+        
+        fingerprint = self._job_fingerprint(file_id, attachment_file_ids)
+        if self.job_coalescing:
+            # 與冪等鍵相同，以使用者區隔：不同使用者的相同檔案不會共用任務 (避免逐字稿外洩給其他使用者)
+            fingerprint_key = f"fp:{user_id or 'anonymous'}:{fingerprint}"
+            existing_id = self.job_store.reserve_key(fingerprint_key, job_id, self.job_dedup_window_seconds)
+            existing = self.job_store.get(existing_id) if existing_id else None
+            if existing and self._can_reuse_job(existing, md5_checksum):
+                logging.info(f"✅ 檔案 {file_id} 已有相同的任務 {existing_id} ({existing['status']})，不重複建立")
+                if idempotency_scope:
+                    self.job_store.set_key(idempotency_scope, existing_id, self.idempotency_key_ttl)
+                return {**existing, 'deduplicated': True}
+            if existing_id:
+                self.job_store.set_key(fingerprint_key, job_id, self.job_dedup_window_seconds)
+        
         job_data = {
             'id': job_id,
             'file_id': file_id,
             'attachment_file_ids': attachment_file_ids,
+            'user_id': user_id,
             'status': JOB_STATUS['PENDING'],
             'progress': 0,
             'message': '任務已創建，等待處理...',
+            'media_info': media_info,
+            'estimated_cost': self.estimate_processing_cost((media_info or {}).get('duration_seconds')),
+            'fingerprint': fingerprint,
+            'md5_checksum': md5_checksum,
             'created_at': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat()
         }
+        if group_id:
+            job_data['group_id'] = group_id
         
-        with self.jobs_lock:
-            self.jobs[job_id] = job_data
+        self.job_store.create(job_data)
             
         logging.info(f"✅ 任務已創建: {job_id}")
         return job_data
 
+    def _job_fingerprint(self, file_id: str, attachment_file_ids: Optional[List[str]]) -> str:
+        """任務指紋：檔案、附件 (順序會影響摘要) 與處理選項相同的任務視為重複"""
+        payload = json.dumps([file_id, attachment_file_ids or [], self.transcription_mode])
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def _can_reuse_job(self, job: Dict[str, Any], md5_checksum: Optional[str]) -> bool:
+        """既有任務是否可直接沿用：仍在等待或處理中，或在保留時間內完成且檔案內容未變"""
+        if job['status'] in (JOB_STATUS['QUEUED'], JOB_STATUS['PENDING'], JOB_STATUS['PROCESSING']):
+            return not self.job_store.is_cancelled(job['id'])
+        if job['status'] != JOB_STATUS['COMPLETED'] or not md5_checksum:
+            return False
+        return (job.get('md5_checksum') == md5_checksum
+                and time.time() - job_timestamp(job) <= self.job_dedup_window_seconds)
+
+    def create_job_group(self, file_ids: Optional[List[str]] = None, folder_path: Optional[str] = None,
+                         attachment_file_ids: Optional[List[str]] = None, user_id: Optional[str] = None,
+                         skip_processed: bool = True) -> Dict[str, Any]:
+        """批次建立一組任務 (指定檔案 ID 或 Drive 資料夾路徑) 並送出處理
+        
+        檔案資訊以批次請求一次取得；非音訊檔與已處理過的檔案 (檔名已被重新命名為 "[日期] 標題") 會被略過。
+        群組內的任務共用同一份附件，附件只會擷取一次。
+        """
+        if folder_path:
+            folder_id = self.find_folder_id_by_path(folder_path, user_id=user_id)
+            if not folder_id:
+                raise ValueError(f"找不到資料夾: {folder_path}")
+            files = self.list_folder_audio_files(folder_id)
+        else:
+            file_ids = list(dict.fromkeys(file_ids or []))
+            metadata = self.get_files_metadata(file_ids)
+            files = [metadata.get(file_id) or {'id': file_id} for file_id in file_ids]
+        
+        if len(files) > self.batch_max_files:
+            raise ValueError(f"批次送出的檔案數 ({len(files)}) 超過上限 {self.batch_max_files}")
+        
+        group_id = str(uuid.uuid4())
+        jobs, skipped = [], []
+        for file_meta in files:
+            file_id = file_meta['id']
+            name = file_meta.get('name')
+            if 'mimeType' not in file_meta:
+                skipped.append({'file_id': file_id, 'name': name, 'reason': 'not_found'})
+            elif not file_meta['mimeType'].startswith('audio/'):
+                skipped.append({'file_id': file_id, 'name': name, 'reason': 'not_audio'})
+            elif skip_processed and re.match(PROCESSED_FILENAME_PATTERN, name or ''):
+                skipped.append({'file_id': file_id, 'name': name, 'reason': 'already_processed'})
+            else:
+                job_data = self.create_job(str(uuid.uuid4()), file_id, attachment_file_ids, user_id=user_id,
+                                           file_meta=file_meta, group_id=group_id)
+                jobs.append({'job_id': job_data['id'], 'file_id': file_id, 'name': name,
+                             'deduplicated': bool(job_data.get('deduplicated'))})
+        
+        group = {
+            'id': group_id,
+            'user_id': user_id,
+            'folder_path': folder_path,
+            'job_ids': [job['job_id'] for job in jobs],
+            'attachment_file_ids': attachment_file_ids,
+            'skipped': skipped,
+            'created_at': datetime.now().isoformat()
+        }
+        self.job_store.create_group(group)
+        for job in jobs:
+            if not job['deduplicated']:
+                self.process_file_async(job['job_id'], job['file_id'], attachment_file_ids)
+        
+        logging.info(f"✅ 任務群組已建立: {group_id} ({len(jobs)} 個任務，略過 {len(skipped)} 個檔案)")
+        return {'group_id': group_id, 'jobs': jobs, 'skipped': skipped}
+
+    def get_group_status(self, group_id: str) -> Optional[Dict[str, Any]]:
+        """任務群組的整體進度：各狀態數量，以及依預測處理秒數加權的整體進度"""
+        group = self.job_store.get_group(group_id)
+        if not group:
+            return None
+        jobs = self.job_store.get_many(group.get('job_ids') or [])
+        counts: Dict[str, int] = {}
+        weighted_progress = total_weight = 0.0
+        for job in jobs.values():
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+            weight = (job.get('estimated_cost') or {}).get('predicted_processing_seconds') or 1
+            weighted_progress += weight * (job.get('progress') or 0)
+            total_weight += weight
+        finished = sum(counts.get(status, 0) for status in TERMINAL_STATUSES)
+        return {
+            'id': group_id,
+            'folder_path': group.get('folder_path'),
+            'created_at': group.get('created_at'),
+            'total': len(group.get('job_ids') or []),
+            'status_counts': counts,
+            'finished': finished,
+            'done': finished == len(jobs),
+            'progress': round(weighted_progress / total_weight, 1) if total_weight else 100,
+            'skipped': group.get('skipped') or [],
+            'jobs': {job_id: {'status': job['status'], 'progress': job['progress']} for job_id, job in jobs.items()}
+        }
+
     def process_file_async(self, job_id: str, file_id: str, attachment_file_ids: Optional[List[str]] = None):
-        """非同步處理音頻檔案"""
-        # 提交任務到線程池
-        future = self.executor.submit(self._process_file_job, job_id, file_id, attachment_file_ids)
+        """非同步處理音頻檔案 (佇列模式下放入 Redis 佇列，否則交由本程序排程器依序送入線程池)"""
+        job = self.job_store.get(job_id) or {'id': job_id}
+        entry = self.scheduling_policy.make_entry(job)
+        if self.job_queue:
+            self.job_queue.enqueue(entry)
+            logging.info(f"[Job {job_id}] 📥 已放入任務佇列")
+        else:
+            self.scheduler.submit(entry)
+
+    def _start_local_job(self, job_id: str, prefetch: bool = False) -> Future:
+        """由排程器呼叫：回傳的 future 在任務離開 CPU 階段時完成，排程器即可放行下一個任務"""
+        job = self.job_store.get(job_id) or {}
+        cpu_released, _ = self.submit_job(job_id, job.get('file_id'), job.get('attachment_file_ids'), prefetch=prefetch)
+        return cpu_released
+
+    def submit_job(self, job_id: str, file_id: str, attachment_file_ids: Optional[List[str]] = None,
+                   prefetch: bool = False) -> Tuple[Future, Future]:
+        """將任務送入分階段管線，回傳 (CPU 階段結束, 任務結束) 兩個 future
+
+        prefetch=True 表示任務在 CPU 忙碌時先行下載，工作目錄受預先下載的磁碟與記憶體預算限制。
+        """
+        cpu_released = Future()
+        future = self.io_executor.submit(
+            self._process_file_job, job_id, file_id, attachment_file_ids, cpu_released, prefetch
+        )
+        # 任務在進入 CPU 階段前就結束 (失敗或取消) 時也要放行
+        future.add_done_callback(lambda _: self._release_cpu_stage(cpu_released))
         
-        # 可以選擇保存 future 引用以便後續取消操作
-        with self.jobs_lock:
-            if job_id in self.jobs:
-                self.jobs[job_id]['future'] = future
+        # 保存 future 引用以便後續取消操作
+        with self.futures_lock:
+            self.job_futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget_future(job_id))
         
-        return future
+        return cpu_released, future
 
-    def _process_file_job(self, job_id: str, file_id: str, attachment_file_ids: Optional[List[str]] = None):
-        """後台處理音頻檔案的工作函數 (在線程中執行)"""
-        attachments_temp_dir = None
+    @staticmethod
+    def _release_cpu_stage(cpu_released: Optional[Future]):
+        if cpu_released is None:
+            return
+        try:
+            cpu_released.set_result(None)
+        except InvalidStateError:
+            pass
+
+    def _forget_future(self, job_id: str):
+        with self.futures_lock:
+            self.job_futures.pop(job_id, None)
+
+    def _process_file_job(self, job_id: str, file_id: str, attachment_file_ids: Optional[List[str]] = None,
+                          cpu_released: Optional[Future] = None, prefetch: bool = False):
+        """後台處理音頻檔案的工作函數 (在 I/O 池中執行，轉錄與說話人分離交由 CPU 池)"""
+        workspace = None
+        self._create_cancellation_token(job_id)
 
         try:
             logging.info(f"[Job {job_id}] 開始處理 file_id: {file_id}")
             
             # 確保任務存在
-            with self.jobs_lock:
-                if job_id not in self.jobs:
-                    logging.error(f"[Job {job_id}] ❌ 任務不存在於 jobs 字典中")
-                    return
+            job = self.job_store.get(job_id)
+            if not job:
+                logging.error(f"[Job {job_id}] ❌ 任務不存在於任務儲存中")
+                return
             
             # 檢查是否已被取消
             if self._is_job_cancelled(job_id):
                 self._handle_job_cancellation(job_id)
                 return
             
-            # 更新狀態為處理中
-            with self.jobs_lock:
-                if job_id in self.jobs:  # 再次檢查，確保安全
-                    self.jobs[job_id]['status'] = JOB_STATUS['PROCESSING']
-                    self.jobs[job_id]['message'] = '開始處理任務...'
-                    self.jobs[job_id]['updated_at'] = datetime.now().isoformat()
+            # 更新狀態為處理中 (並記錄各階段的預測耗時，供估算剩餘時間)
+            audio_seconds = (job.get('estimated_cost') or {}).get('audio_seconds')
+            self.job_store.update(
+                job_id,
+                status=JOB_STATUS['PROCESSING'],
+                message='開始處理任務...',
+                stage_plan=self.runtime_predictor.predict(audio_seconds)['stages']
+            )
             
-            # 獲取原始檔案名稱
+            # 以一次批次請求取得音檔與所有附件的檔案資訊 (任務內的下載、附件擷取與 Notion 頁面都沿用，不再重複查詢)
+            file_size = 0
+            original_filename = ""
+            job_file_meta: Dict[str, Optional[Dict[str, Any]]] = {}
             try:
-                file_meta = self.drive_service.files().get(
-                    fileId=file_id, fields="name"
-                ).execute()
+                job_file_meta = self.get_files_metadata(
+                    list(dict.fromkeys([file_id] + list(attachment_file_ids or []))),
+                    fields=self.JOB_FILE_FIELDS
+                )
+            except Exception as e:
+                logging.error(f"[Job {job_id}] ❌ 批次取得檔案資訊失敗: {e}")
+            file_meta = job_file_meta.get(file_id)
+            if file_meta:
                 original_filename = file_meta.get('name', '')
+                file_size = int(file_meta.get('size') or 0)
                 logging.info(f"[Job {job_id}] 原始檔案名稱: {original_filename}")
-                
-                with self.jobs_lock:
-                    self.jobs[job_id]['message'] = f'準備下載檔案: {original_filename}'
-                    self.jobs[job_id]['updated_at'] = datetime.now().isoformat()
-                    
-            except Exception as e:
-                logging.error(f"[Job {job_id}] ❌ 獲取原始檔案名稱失敗: {e}")
-                original_filename = ""
+                self.job_store.update(job_id, message=f'準備下載檔案: {original_filename}')
+            else:
+                logging.error(f"[Job {job_id}] ❌ 獲取原始檔案名稱失敗")
+            
+            # 配置工作目錄 (磁碟預算不足時等待其他任務釋放空間)
+            workspace = self.workspace_manager.allocate(
+                job_id,
+                self._estimate_workspace_bytes(job_id, file_size),
+                cancel_check=lambda: self._is_job_cancelled(job_id),
+                on_wait=lambda: self._update_job_progress(job_id, 0, '等待磁碟空間釋放...'),
+                prefetch=prefetch
+            )
             
             # 更新進度: 5% - 準備階段
+            download_started = self._start_stage(job_id, 'download')
             self._update_job_progress(job_id, 5, '準備下載檔案...')
             if self._is_job_cancelled(job_id):
                 self._handle_job_cancellation(job_id)
                 return
             
-            # 處理附件 (如果有)
+            # 處理附件 (如果有；群組任務共用群組已擷取的附件文字)
             attachment_texts = []
             if attachment_file_ids:
-                self._update_job_progress(job_id, 8, '正在下載附件檔案...')
-                for i, attachment_file_id in enumerate(attachment_file_ids):
-                    if self._is_job_cancelled(job_id):
-                        self._handle_job_cancellation(job_id)
-                        return
-                        
-                    attachment_text, attachment_temp_dir = self.download_and_extract_text(attachment_file_id)
-                    attachment_texts.append(attachment_text)
-                    if attachment_temp_dir:
-                        attachments_temp_dir = attachment_temp_dir
-                    
-                    # 更新附件下載進度
-                    progress = 8 + (i + 1) * 2  # 每個附件2%進度
-                    self._update_job_progress(job_id, progress, f'已下載附件 {i+1}/{len(attachment_file_ids)}')
+                group_id = (self.job_store.get(job_id) or {}).get('group_id')
+                if group_id:
+                    attachment_texts = self._load_group_attachment_texts(
+                        job_id, group_id, attachment_file_ids, workspace, job_file_meta
+                    )
+                else:
+                    attachment_texts = self._load_attachment_texts(job_id, attachment_file_ids, workspace, job_file_meta)
+                if attachment_texts is None:
+                    self._handle_job_cancellation(job_id)
+                    return
             
             # 更新進度: 15% - 下載音訊檔案
             self._update_job_progress(job_id, 15, '正在下載音訊檔案...')
@@ -1249,8 +2061,22 @@ class AudioProcessor:
                 self._handle_job_cancellation(job_id)
                 return
             
-            # 下載音頻檔案
-            audio_path, audio_temp_dir = self.download_from_drive(file_id)
+            # 下載音頻檔案 (串流模式下同時解碼為 WAV)
+            download_callback = lambda info: self._update_job_download(job_id, info)
+            audio_dir = workspace.subdir('audio')
+            if self.stream_ingest:
+                audio_path, _ = self.download_and_convert_stream(
+                    file_id, download_callback, target_dir=audio_dir, file_meta=file_meta
+                )
+            else:
+                audio_path, _ = self.download_from_drive(
+                    file_id, download_callback, target_dir=audio_dir, file_meta=file_meta
+                )
+            self.workspace_manager.track(job_id)
+            # 以實際音檔長度記錄下載耗時，並更新之後各階段的預測
+            audio_seconds = self._audio_duration(audio_path) or audio_seconds
+            self._finish_stage('download', download_started, audio_seconds)
+            self.job_store.update(job_id, stage_plan=self.runtime_predictor.predict(audio_seconds)['stages'])
             
             # 更新進度: 25% - 轉換音訊格式
             self._update_job_progress(job_id, 25, '正在轉換音訊格式...')
@@ -1258,11 +2084,22 @@ class AudioProcessor:
                 self._handle_job_cancellation(job_id)
                 return
             
-            # 處理音頻: 轉錄和說話人分離
-            self._update_job_progress(job_id, 30, '正在進行語音轉錄...')
-            _, segments, original_speakers = self.process_audio(audio_path)
+            # 處理音頻: 轉錄和說話人分離 (CPU 池)，取得轉錄名額後才開始，完成後立即放行下一個任務
+            if prefetch:
+                self._update_job_progress(job_id, 28, '音訊已預先下載，等待轉錄資源...')
+            if not self.asr_slots.acquire(cancel_check=lambda: self._is_job_cancelled(job_id)):
+                raise JobCancelled(job_id)
+            try:
+                _, segments, original_speakers = self.cpu_executor.submit(
+                    self._run_cpu_stage, job_id, audio_path, audio_seconds
+                ).result()
+            finally:
+                self.asr_slots.release()
+                self._release_cpu_stage(cpu_released)
+            self.workspace_manager.track(job_id)
             
             # 更新進度: 65% - 分析說話人
+            analysis_started = self._start_stage(job_id, 'analysis')
             self._update_job_progress(job_id, 65, '正在分析說話人...')
             if self._is_job_cancelled(job_id):
                 self._handle_job_cancellation(job_id)
@@ -1298,8 +2135,10 @@ class AudioProcessor:
             title = summary_data["title"]
             summary = summary_data["summary"]
             todos = summary_data["todos"]
+            self._finish_stage('analysis', analysis_started, audio_seconds)
             
             # 更新進度: 90% - 建立 Notion 頁面
+            publish_started = self._start_stage(job_id, 'publish')
             self._update_job_progress(job_id, 90, '正在建立 Notion 頁面...')
             if self._is_job_cancelled(job_id):
                 self._handle_job_cancellation(job_id)
@@ -1307,7 +2146,7 @@ class AudioProcessor:
             
             # 建立 Notion 頁面
             page_id, page_url = self.create_notion_page(
-                title, summary, todos, updated_segments, speaker_map, file_id
+                title, summary, todos, updated_segments, speaker_map, file_id, file_meta=file_meta
             )
             
             # 更新進度: 95% - 整理檔案
@@ -1324,6 +2163,7 @@ class AudioProcessor:
             date_str = file_date if file_date else datetime.now().strftime('%Y-%m-%d')
             new_filename = f"[{date_str}] {title}.m4a"
             self.rename_drive_file(file_id, new_filename)
+            self._finish_stage('publish', publish_started, audio_seconds)
             
             # 更新工作狀態為完成
             result = {
@@ -1338,16 +2178,21 @@ class AudioProcessor:
             }
             
             # 更新進度: 100% - 完成
-            with self.jobs_lock:
-                self.jobs[job_id]['status'] = JOB_STATUS['COMPLETED']
-                self.jobs[job_id]['progress'] = 100
-                self.jobs[job_id]['message'] = '任務處理完成！'
-                self.jobs[job_id]['result'] = result
-                self.jobs[job_id]['updated_at'] = datetime.now().isoformat()
+            self.job_store.update(
+                job_id,
+                status=JOB_STATUS['COMPLETED'],
+                progress=100,
+                message='任務處理完成！',
+                result=result
+            )
             
             logging.info(f"[Job {job_id}] ✅ 處理完成")
             return result
 
+        except (WorkspaceWaitCancelled, JobCancelled):
+            self._handle_job_cancellation(job_id)
+            return
+
         except Exception as e:
             # 檢查是否為取消操作導致的異常
             if self._is_job_cancelled(job_id):
@@ -1374,47 +2219,262 @@ class AudioProcessor:
                 "identified_speakers": final_speakers
             }
             
-            with self.jobs_lock:
-                if job_id in self.jobs:  # 確保任務存在才更新
-                    self.jobs[job_id]['status'] = JOB_STATUS['FAILED']
-                    self.jobs[job_id]['progress'] = 100
-                    self.jobs[job_id]['message'] = f'處理失敗: {str(e)}'
-                    self.jobs[job_id]['result'] = error_result
-                    self.jobs[job_id]['error'] = str(e)
-                    self.jobs[job_id]['updated_at'] = datetime.now().isoformat()
+            self.job_store.update(
+                job_id,
+                status=JOB_STATUS['FAILED'],
+                progress=100,
+                message=f'處理失敗: {str(e)}',
+                result=error_result,
+                error=str(e)
+            )
             
             return error_result
 
         finally:
-            # 清理臨時檔案
-            if 'audio_temp_dir' in locals() and audio_temp_dir and os.path.exists(audio_temp_dir):
-                logging.info(f"[Job {job_id}] 🧹 清理音檔臨時目錄")
-                shutil.rmtree(audio_temp_dir)
-            if 'attachments_temp_dir' in locals() and attachments_temp_dir and os.path.exists(attachments_temp_dir):
-                logging.info(f"[Job {job_id}] 🧹 清理附件臨時目錄")
-                shutil.rmtree(attachments_temp_dir)
+            # 清理工作目錄 (完成、失敗與取消皆會執行)
+            if workspace:
+                self.workspace_manager.release(job_id)
+            self.cancellation_tokens.pop(job_id, None)
+            if self._is_job_cancelled(job_id):
+                self._record_cancel_release(job_id)
+
+    def _load_attachment_texts(self, job_id: str, attachment_file_ids: List[str], workspace,
+                               file_metas: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+                               ) -> Optional[List[Optional[str]]]:
+        """下載附件並擷取文字 (file_metas 為已批次取得的附件檔案資訊)；任務在過程中被取消時回傳 None"""
+        attachment_texts = []
+        self._update_job_progress(job_id, 8, '正在下載附件檔案...')
+        for i, attachment_file_id in enumerate(attachment_file_ids):
+            if self._is_job_cancelled(job_id):
+                return None
+                
+            attachment_text, _ = self.download_and_extract_text(
+                attachment_file_id, target_dir=workspace.subdir(f'attachment_{i}'),
+                file_meta=(file_metas or {}).get(attachment_file_id)
+            )
+            attachment_texts.append(attachment_text)
+            
+            # 更新附件下載進度
+            progress = 8 + (i + 1) * 2  # 每個附件2%進度
+            self._update_job_progress(job_id, progress, f'已下載附件 {i+1}/{len(attachment_file_ids)}')
+        return attachment_texts
+
+    def _load_group_attachment_texts(self, job_id: str, group_id: str, attachment_file_ids: List[str], workspace,
+                                     file_metas: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+                                     ) -> Optional[List[Optional[str]]]:
+        """群組共用的附件文字：第一個任務擷取後存入群組，其餘任務直接沿用"""
+        lock = self.group_attachment_locks[hash(group_id) % len(self.group_attachment_locks)]
+        with lock:
+            group = self.job_store.get_group(group_id) or {}
+            if group.get('attachment_texts') is not None:
+                logging.info(f"[Job {job_id}] ✅ 沿用群組 {group_id} 已擷取的附件")
+                return group['attachment_texts']
+            attachment_texts = self._load_attachment_texts(job_id, attachment_file_ids, workspace, file_metas)
+            if attachment_texts is not None:
+                self.job_store.update_group(group_id, attachment_texts=attachment_texts)
+            return attachment_texts
+
+    def _retention_loop(self):
+        """定期淘汰已結束的舊任務 (連同磁碟 / Redis 中的任務結果)"""
+        while not self._retention_stop.wait(self.job_retention_interval):
+            try:
+                evicted = self.job_store.evict(self.job_retention_seconds, self.job_retention_max_count)
+                if evicted:
+                    logging.info(f"🧹 已淘汰 {evicted} 個已結束的任務")
+            except Exception as e:
+                logging.error(f"❌ 淘汰舊任務失敗: {e}")
+
+    def _run_cpu_stage(self, job_id: str, audio_path: str, audio_seconds: Optional[float] = None):
+        """CPU 池中執行：轉錄與說話人分離 (綁定取消權杖，取消後在數秒內中斷)"""
+        token = self.cancellation_tokens.get(job_id) or self._create_cancellation_token(job_id)
+        with bind_token(token):
+            token.raise_if_cancelled()
+            self.workspace_manager.promote(job_id)
+            started = self._start_stage(job_id, 'transcription')
+            self._update_job_progress(job_id, 30, '正在進行語音轉錄...')
+            result = self.process_audio(audio_path)
+            self._finish_stage('transcription', started, audio_seconds)
+            return result
+
+    def _start_stage(self, job_id: str, stage: str) -> float:
+        """標記任務進入某個處理階段 (狀態查詢據此估算剩餘時間)，回傳開始時間供 _finish_stage 使用"""
+        self.job_store.update(job_id, stage=stage, stage_started_at=time.time())
+        return time.monotonic()
+
+    def _finish_stage(self, stage: str, started: float, audio_seconds: Optional[float]):
+        """記錄階段耗時，讓耗時預測模型持續學習"""
+        self.runtime_predictor.record(stage, audio_seconds, time.monotonic() - started)
+
+    @staticmethod
+    def _audio_duration(audio_path: str) -> Optional[float]:
+        """讀取音檔標頭取得實際長度 (秒)，無法讀取時回傳 None"""
+        try:
+            return sf.info(audio_path).duration
+        except Exception:
+            return None
+
+    def _create_cancellation_token(self, job_id: str) -> CancellationToken:
+        token = CancellationToken(
+            job_id,
+            remote_check=lambda: self.job_store.is_cancelled(job_id),
+            poll_interval=self.cancel_poll_interval
+        )
+        self.cancellation_tokens[job_id] = token
+        return token
+
+    def _record_cancel_release(self, job_id: str):
+        """記錄任務從提出取消到實際釋放資源的秒數"""
+        requested_at = (self.job_store.get(job_id) or {}).get('cancel_requested_at')
+        if not requested_at:
+            return
+        release_seconds = round(time.time() - requested_at, 2)
+        self.cancel_release_seconds.append(release_seconds)
+        self.job_store.update(job_id, cancel_release_seconds=release_seconds)
+        logging.info(f"[Job {job_id}] 🛑 取消後 {release_seconds} 秒釋放資源")
+
+    def _estimate_workspace_bytes(self, job_id: str, file_size: int) -> int:
+        """預估任務的磁碟用量：已知時長時為原始檔 + 16kHz 16-bit WAV，否則為原始檔 × 倍數"""
+        media_info = (self.job_store.get(job_id) or {}).get('media_info') or {}
+        duration = media_info.get('duration_seconds')
+        if duration:
+            return int(file_size + duration * 16000 * 2 * 1.1)
+        return int(file_size * self.workspace_reserve_factor)
 
     def _update_job_progress(self, job_id: str, progress: int, message: str):
         """安全地更新任務進度"""
-        with self.jobs_lock:
-            if job_id in self.jobs:
-                self.jobs[job_id]['progress'] = progress
-                self.jobs[job_id]['message'] = message
-                self.jobs[job_id]['updated_at'] = datetime.now().isoformat()
+        self.job_store.update(job_id, progress=progress, message=message)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """匯出處理器的運行指標"""
+        metrics = {
+            'media_cache': self.media_cache.get_stats(),
+            'workspaces': self.workspace_manager.get_stats()
+        }
+        metrics['folder_indexes'] = self.folder_index_cache.get_stats()
+        metrics['drive_listing_cache'] = self.drive_listing_cache.get_stats()
+        if self.drive_watcher:
+            metrics['drive_watcher'] = self.drive_watcher.get_status()
+        if self.job_queue:
+            metrics['job_queue'] = self.job_queue.get_stats()
+        else:
+            metrics['scheduler'] = self.scheduler.get_stats()
+        if self.concurrency_controller:
+            metrics['concurrency_controller'] = self.concurrency_controller.get_stats()
+        metrics['pools'] = {
+            'cpu_workers': self.cpu_pool_workers,
+            'io_workers': self.io_pool_workers
+        }
+        if self.admission.enabled:
+            metrics['admission'] = {
+                'max_queued_jobs': self.admission.max_queued_jobs,
+                'max_queued_audio_hours': round(self.admission.max_queued_audio_seconds / 3600, 2),
+                'backlog': self.get_backlog(),
+                'throughput': self.measure_throughput()
+            }
+        metrics['runtime_model'] = self.runtime_predictor.get_stats()
+        release_times = list(self.cancel_release_seconds)
+        metrics['cancellation'] = {
+            'samples': len(release_times),
+            'avg_release_seconds': round(sum(release_times) / len(release_times), 2) if release_times else None,
+            'max_release_seconds': max(release_times) if release_times else None
+        }
+        return metrics
+
+    def get_backlog(self) -> Dict[str, Any]:
+        """等待中任務的統計 (任務數、音訊秒數、預測處理秒數)"""
+        if self.job_queue:
+            return self.job_queue.get_backlog(self.scheduling_policy)
+        return self.scheduler.get_backlog()
+
+    def get_concurrency(self) -> int:
+        """可同時處理的任務數 (佇列模式下為所有存活 worker 的並行數總和)"""
+        if self.job_queue:
+            return self.job_queue.get_concurrency()
+        return self.scheduler.concurrency
+
+    def measure_throughput(self) -> Optional[Dict[str, float]]:
+        """依最近完成 (或失敗) 的任務計算吞吐量，結果快取 10 秒；時間窗內沒有任務結束時回傳 None"""
+        cached_at, cached = self._throughput_cache
+        now = time.time()
+        if now - cached_at < 10:
+            return cached
+        
+        finished = [job for job in self.job_store.list_jobs([JOB_STATUS['COMPLETED'], JOB_STATUS['FAILED']])
+                    if now - job_timestamp(job) <= self.throughput_window_seconds]
+        throughput = None
+        if finished:
+            audio_seconds = sum((job.get('estimated_cost') or {}).get('audio_seconds') or 0 for job in finished)
+            throughput = {
+                'jobs_per_second': len(finished) / self.throughput_window_seconds,
+                'audio_seconds_per_second': audio_seconds / self.throughput_window_seconds
+            }
+        self._throughput_cache = (now, throughput)
+        return throughput
+
+    def check_admission(self) -> Dict[str, Any]:
+        """檢查目前是否接受新任務；拒絕時附上建議的 retry_after 秒數與等待中任務的統計"""
+        if not self.admission.enabled:
+            return {'admitted': True, 'reason': None, 'retry_after': 0}
+        backlog = self.get_backlog()
+        throughput = self.measure_throughput() or AdmissionController.estimate_throughput(backlog, self.get_concurrency())
+        decision = self.admission.evaluate(backlog, throughput)
+        decision['backlog'] = {
+            'jobs': backlog['jobs'],
+            'audio_hours': round(backlog['audio_seconds'] / 3600, 2)
+        }
+        if not decision['admitted']:
+            logging.warning(f"⚠️ 拒絕新任務: {decision['reason']}，建議 {decision['retry_after']} 秒後重試")
+        return decision
+
+    def get_job_eta(self, job_id: str) -> Dict[str, Any]:
+        """剛送出任務的預計開始與完成時間 (依排程模擬與預測處理秒數)"""
+        return self.get_jobs_eta([job_id]).get(job_id, {})
+
+    def get_jobs_eta(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """多個任務的預計開始與完成時間 (排程模擬只計算一次)"""
+        jobs = self.job_store.get_many(job_ids)
+        has_pending = any(job['status'] == JOB_STATUS['PENDING'] for job in jobs.values())
+        plan = self.get_queue_plan() if has_pending else {}
+        now = time.time()
+        etas = {}
+        for job_id, job in jobs.items():
+            cost = (job.get('estimated_cost') or {}).get('predicted_processing_seconds') or self.scheduling_policy.default_cost_seconds
+            job_plan = plan.get(job_id) if job['status'] == JOB_STATUS['PENDING'] else None
+            start_seconds = job_plan['estimated_start_seconds'] if job_plan else 0
+            eta = {
+                'queue_position': job_plan['queue_position'] if job_plan else 0,
+                'estimated_start_seconds': start_seconds,
+                'estimated_completion_seconds': None,
+                'estimated_completion_at': None
+            }
+            # 佇列模式下沒有存活的 worker 時無法預估
+            if start_seconds is not None:
+                eta['estimated_completion_seconds'] = round(start_seconds + cost, 1)
+                eta['estimated_completion_at'] = datetime.fromtimestamp(now + start_seconds + cost).isoformat()
+            etas[job_id] = eta
+        return etas
+
+    def get_queue_plan(self) -> Dict[str, Dict[str, Any]]:
+        """取得等待中任務的佇列位置與預計開始秒數"""
+        if self.job_queue:
+            return self.job_queue.get_plan(self.scheduling_policy)
+        return self.scheduler.get_plan()
+
+    def _update_job_download(self, job_id: str, download_info: Dict[str, Any]):
+        """記錄任務的下載進度與吞吐量"""
+        self.job_store.update(job_id, download=download_info)
 
     def _is_job_cancelled(self, job_id: str) -> bool:
         """檢查任務是否已被取消"""
-        return job_id in self.cancelled_jobs
+        return self.job_store.is_cancelled(job_id)
 
     def cancel_job(self, job_id: str) -> Dict[str, Any]:
         """取消指定的任務"""
-        with self.jobs_lock:
-            job = self.jobs.get(job_id)
+        job = self.job_store.get(job_id)
             
         if not job:
             # 詳細記錄所有現有任務ID用於調試
-            with self.jobs_lock:
-                existing_jobs = list(self.jobs.keys())
+            existing_jobs = self.job_store.job_ids()
             logging.error(f"任務 {job_id} 不存在。現有任務: {existing_jobs}")
             return {'success': False, 'error': '任務不存在'}
         
@@ -1424,16 +2484,25 @@ class AudioProcessor:
         if current_status in ['completed', 'failed', 'cancelled']:
             return {'success': False, 'error': f'任務已{current_status}，無法取消'}
         
-        # 標記任務為已取消
-        self.cancelled_jobs.add(job_id)
+        # 標記任務為已取消，並通知本程序內執行中的轉錄 / 說話人分離
+        self.job_store.mark_cancelled(job_id)
+        self.job_store.update(job_id, cancel_requested_at=time.time())
+        token = self.cancellation_tokens.get(job_id)
+        if token:
+            token.cancel()
+        
+        # 尚未開始的任務直接從佇列 / 排程器移除
+        if self.job_queue and self.job_queue.remove(job_id):
+            logging.info(f"[Job {job_id}] 已從任務佇列移除")
+        if self.scheduler.remove(job_id):
+            logging.info(f"[Job {job_id}] 已從排程器移除")
         
-        # 嘗試取消正在執行的 Future
-        with self.jobs_lock:
-            if job_id in self.jobs and 'future' in self.jobs[job_id]:
-                future = self.jobs[job_id]['future']
-                if future and not future.done():
-                    cancelled = future.cancel()
-                    logging.info(f"Future取消結果: {cancelled}")
+        # 嘗試取消正在執行的 Future (僅限本程序提交的任務)
+        with self.futures_lock:
+            future = self.job_futures.get(job_id)
+        if future and not future.done():
+            cancelled = future.cancel()
+            logging.info(f"Future取消結果: {cancelled}")
         
         # 直接更新任務狀態為已取消
         self._handle_job_cancellation(job_id)
@@ -1443,48 +2512,120 @@ class AudioProcessor:
 
     def _handle_job_cancellation(self, job_id: str):
         """處理任務取消"""
-        with self.jobs_lock:
-            if job_id in self.jobs:
-                self.jobs[job_id]['status'] = 'cancelled'
-                self.jobs[job_id]['progress'] = 100
-                self.jobs[job_id]['message'] = '任務已被使用者取消'
-                self.jobs[job_id]['updated_at'] = datetime.now().isoformat()
-                
-                # 確保移除 future 引用以避免內存洩漏
-                if 'future' in self.jobs[job_id]:
-                    del self.jobs[job_id]['future']
+        self.job_store.update(
+            job_id,
+            status=JOB_STATUS['CANCELLED'],
+            progress=100,
+            message='任務已被使用者取消'
+        )
+        
+        # 確保移除 future 引用以避免內存洩漏
+        self._forget_future(job_id)
         
         logging.info(f"[Job {job_id}] 任務已取消")
 
     def get_job_status(self, job_id: str) -> Dict[str, Any]:
         """獲取工作狀態"""
-        with self.jobs_lock:
-            job = self.jobs.get(job_id)
+        job = self.job_store.get(job_id)
             
         if not job:
             # 詳細記錄調試信息
-            with self.jobs_lock:
-                existing_jobs = list(self.jobs.keys())
-                total_jobs = len(self.jobs)
+            existing_jobs = self.job_store.job_ids()
+            total_jobs = len(existing_jobs)
             logging.warning(f"查詢不存在的任務 {job_id}。目前共有 {total_jobs} 個任務: {existing_jobs[:5]}{'...' if total_jobs > 5 else ''}")
             return {'error': '工作不存在'}
         
+        plan = self.get_queue_plan() if job['status'] == JOB_STATUS['PENDING'] else {}
+        return self._format_job_status(job, plan)
+
+    def get_jobs_status(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量獲取工作狀態：所有任務讀取自同一個快照，佇列預估也只計算一次；不存在的任務會被略過"""
+        jobs = self.job_store.get_many(job_ids)
+        has_pending = any(job['status'] == JOB_STATUS['PENDING'] for job in jobs.values())
+        plan = self.get_queue_plan() if has_pending else {}
+        return {job_id: self._format_job_status(job, plan) for job_id, job in jobs.items()}
+
+    def get_job_changes(self, since_version: int, job_ids: Optional[List[str]] = None,
+                        user_id: Optional[str] = None) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """取得 user_id 的任務中版本號大於 since_version 者的狀態，回傳 ({job_id: 狀態}, 目前版本號)
+
+        指定 job_ids 時只回傳這些任務；其中等待中的任務即使本身沒有變化也會一併回傳，
+        因為其他任務開始或結束後，它的佇列位置與預計開始時間可能已改變。
+        since_version 大於目前版本號時 (本機任務儲存重啟後版本號重新起算) 回傳完整快照，
+        此時回傳的版本號會小於 since_version，客戶端應以它取代原本的版本號。
+        """
+        version = self.job_store.current_version()
+        if version == since_version:
+            return {}, version
+        if since_version > version:
+            logging.info(f"ℹ️ 客戶端版本號 {since_version} 大於目前版本號 {version}，回傳完整快照")
+            since_version = 0
+        if job_ids is None:
+            jobs = self.job_store.changes_since(since_version)
+        else:
+            jobs = [job for job in self.job_store.get_many(job_ids).values()
+                    if (job.get('version') or 0) > since_version or job['status'] == JOB_STATUS['PENDING']]
+        jobs = [job for job in jobs if job.get('user_id') == user_id]
+        version = max([version] + [job.get('version') or 0 for job in jobs])
+        has_pending = any(job['status'] == JOB_STATUS['PENDING'] for job in jobs)
+        plan = self.get_queue_plan() if has_pending else {}
+        return {job['id']: self._format_job_status(job, plan) for job in jobs}, version
+
+    def _format_job_status(self, job: Dict[str, Any], plan: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """將任務紀錄整理成 API 回傳的狀態格式"""
+        job_id = job['id']
         # 基本任務信息
         result = {
             'id': job['id'],
             'status': job['status'],
             'progress': job['progress'],
             'created_at': job['created_at'],
-            'updated_at': job['updated_at']
+            'updated_at': job['updated_at'],
+            'version': job.get('version') or 0
         }
         
         # 添加訊息（如果有）
         if 'message' in job:
             result['message'] = job['message']
         
+        # 取消後釋放資源所花的秒數（如果有）
+        if job.get('cancel_release_seconds') is not None:
+            result['cancel_release_seconds'] = job['cancel_release_seconds']
+        
+        # 添加下載進度與吞吐量（如果有）
+        if 'download' in job:
+            result['download'] = job['download']
+        
+        # 添加媒體資訊與預測處理成本
+        if job.get('media_info'):
+            result['media_info'] = job['media_info']
+        if job.get('estimated_cost'):
+            result['estimated_cost'] = job['estimated_cost']
+        
+        # 等待中的任務：佇列位置與預計開始時間
+        if job['status'] == JOB_STATUS['PENDING']:
+            job_plan = plan.get(job_id)
+            if job_plan:
+                result['queue_position'] = job_plan['queue_position']
+                result['estimated_start_seconds'] = job_plan['estimated_start_seconds']
+                if job_plan['estimated_start_seconds'] is not None:
+                    result['estimated_start_at'] = datetime.fromtimestamp(
+                        time.time() + job_plan['estimated_start_seconds']
+                    ).isoformat()
+        
+        # 處理中的任務：依各階段預測耗時估算時間進度與剩餘秒數
+        if job['status'] == JOB_STATUS['PROCESSING'] and job.get('stage_plan') and job.get('stage'):
+            time_progress, remaining = estimate_progress(
+                job['stage_plan'], job['stage'], time.time() - (job.get('stage_started_at') or time.time())
+            )
+            result['stage'] = job['stage']
+            result['time_progress'] = time_progress
+            result['eta_seconds'] = remaining
+            result['estimated_completion_at'] = datetime.fromtimestamp(time.time() + remaining).isoformat()
+        
         # 根據工作狀態返回不同信息
         if job['status'] == JOB_STATUS['COMPLETED']:
-            result['result'] = job.get('result')
+            result['result'] = self.job_store.get_result(job_id)
         elif job['status'] == JOB_STATUS['FAILED']:
             result['error'] = job.get('error')
         
@@ -1492,35 +2633,37 @@ class AudioProcessor:
 
     def update_job_progress(self, job_id: str, progress: int, message: str, status: Optional[str] = None, error: Optional[str] = None, result_url: Optional[str] = None, notion_page_id: Optional[str] = None):
         """更新指定工作的進度、狀態、訊息、錯誤和結果URL"""
-        with self.jobs_lock:
-            if job_id in self.jobs:
-                self.jobs[job_id]['progress'] = progress
-                self.jobs[job_id]['message'] = message
-                self.jobs[job_id]['last_updated'] = datetime.utcnow().isoformat() + 'Z'
-                if status:
-                    self.jobs[job_id]['status'] = status
-                if error:
-                    self.jobs[job_id]['error'] = error
-                if result_url: # Notion page URL or other result link
-                    self.jobs[job_id]['result_url'] = result_url
-                if notion_page_id:
-                    self.jobs[job_id]['notion_page_id'] = notion_page_id
-                
-                # 如果狀態是完成或失敗，記錄完成時間
-                if status in [JOB_STATUS['COMPLETED'], JOB_STATUS['FAILED']]:
-                    self.jobs[job_id]['completed_at'] = datetime.utcnow().isoformat() + 'Z'
-                    
-                logging.info(f"📊 工作進度更新 - ID: {job_id}, 狀態: {self.jobs[job_id]['status']}, 進度: {progress}%, 訊息: {message}")
-            else:
-                logging.warning(f"⚠️ 嘗試更新不存在的工作 ID: {job_id}")
+        fields = {
+            'progress': progress,
+            'message': message,
+            'last_updated': datetime.utcnow().isoformat() + 'Z'
+        }
+        if status:
+            fields['status'] = status
+        if error:
+            fields['error'] = error
+        if result_url: # Notion page URL or other result link
+            fields['result_url'] = result_url
+        if notion_page_id:
+            fields['notion_page_id'] = notion_page_id
+        
+        # 如果狀態是完成或失敗，記錄完成時間
+        if status in [JOB_STATUS['COMPLETED'], JOB_STATUS['FAILED']]:
+            fields['completed_at'] = datetime.utcnow().isoformat() + 'Z'
+            
+        if self.job_store.update(job_id, **fields):
+            logging.info(f"📊 工作進度更新 - ID: {job_id}, 狀態: {status or '(不變)'}, 進度: {progress}%, 訊息: {message}")
+        else:
+            logging.warning(f"⚠️ 嘗試更新不存在的工作 ID: {job_id}")
 
     def shutdown_executor(self):
         """優雅地關閉 ThreadPoolExecutor"""
-        if hasattr(self, 'executor') and self.executor:
+        if hasattr(self, 'io_executor') and self.io_executor:
             logging.info("🔄 正在關閉 AudioProcessor 的 ThreadPoolExecutor...")
             try:
-                # 等待所有目前正在執行的任務完成，但不接受新任務
-                self.executor.shutdown(wait=True)
+                # 等待所有目前正在執行的任務完成，但不接受新任務 (I/O 池中的任務可能仍在等待 CPU 池)
+                self.io_executor.shutdown(wait=True)
+                self.cpu_executor.shutdown(wait=True)
                 logging.info("✅ AudioProcessor 的 ThreadPoolExecutor 已成功關閉。")
             except Exception as e:
                 logging.error(f"❌ 關閉 AudioProcessor 的 ThreadPoolExecutor 時發生錯誤: {e}", exc_info=True)
\ No newline at end of file
@@ -0,0 +1,92 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class JobCancelled(Exception):
+    """任務在執行中被取消 (由取消檢查點拋出，用來中斷轉錄或說話人分離)"""
+
+
+class CancellationToken:
+    """任務的取消權杖
+
+    本程序內取消時呼叫 cancel() 立即生效；任務在其他程序 (例如獨立 worker) 執行時，
+    則以 remote_check 輪詢共享的取消狀態，並以 poll_interval 限制查詢頻率。
+    """
+
+    def __init__(self, job_id: str, remote_check: Optional[Callable[[], bool]] = None,
+                 poll_interval: float = 1.0):
+        self.job_id = job_id
+        self.remote_check = remote_check
+        self.poll_interval = poll_interval
+        self._event = threading.Event()
+        self._last_poll = 0.0
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        now = time.monotonic()
+        if self.remote_check and now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            try:
+                if self.remote_check():
+                    self._event.set()
+            except Exception as e:
+                logging.warning(f"[Job {self.job_id}] ⚠️ 查詢取消狀態失敗: {e}")
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+
+
+_local = threading.local()
+
+
+def current_token() -> Optional[CancellationToken]:
+    """目前執行緒綁定的取消權杖"""
+    return getattr(_local, 'token', None)
+
+
+@contextmanager
+def bind_token(token: CancellationToken):
+    """在此執行緒中綁定取消權杖，讓模型內部的檢查點 (check_cancelled) 能找到它"""
+    previous = current_token()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def check_cancelled():
+    """取消檢查點：目前執行緒的任務已被取消時拋出 JobCancelled"""
+    token = current_token()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def install_whisper_cancellation(model):
+    """包裝 Whisper 模型實例的 decode：transcribe() 每解碼一個 30 秒視窗前都會檢查取消狀態"""
+    if getattr(model, '_cancellation_installed', False):
+        return model
+    original_decode = model.decode
+
+    def decode(*args, **kwargs):
+        check_cancelled()
+        return original_decode(*args, **kwargs)
+
+    model.decode = decode
+    model._cancellation_installed = True
+    return model
+
+
+def diarization_hook(step_name, step_artifact, file=None, total=None, completed=None):
+    """pyannote pipeline 的 hook：每個步驟 (與嵌入向量的每個批次) 之間檢查取消狀態"""
+    check_cancelled()
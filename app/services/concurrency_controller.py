@@ -0,0 +1,216 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+
+class SystemSampler:
+    """讀取 /proc (與 cgroup v2) 取得記憶體與 CPU 使用狀況；非 Linux 平台各欄位為 None"""
+
+    CGROUP_ROOT = '/sys/fs/cgroup'
+
+    def __init__(self):
+        self._last_cpu = self._read_cpu_times()
+
+    @staticmethod
+    def _read_meminfo() -> Dict[str, int]:
+        values = {}
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    name, value = line.split(':', 1)
+                    values[name] = int(value.split()[0]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return values
+
+    @staticmethod
+    def _read_int(path: str) -> Optional[int]:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            return None if value == 'max' else int(value)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _read_rss() -> Optional[int]:
+        """本程序的常駐記憶體 (VmRSS)"""
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    @staticmethod
+    def _read_cpu_times():
+        """/proc/stat 的 (忙碌, 總計) jiffies"""
+        try:
+            with open('/proc/stat') as f:
+                fields = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        total = sum(fields[:8])
+        return total - idle, total
+
+    def sample(self) -> Dict[str, Optional[float]]:
+        """回傳 rss_bytes / available_bytes / total_bytes / cpu_utilization (0-1，自上次取樣以來的平均)"""
+        meminfo = self._read_meminfo()
+        available = meminfo.get('MemAvailable')
+        total = meminfo.get('MemTotal')
+        # 容器內以 cgroup 的記憶體上限為準 (/proc/meminfo 顯示的是整台主機)
+        limit = self._read_int(os.path.join(self.CGROUP_ROOT, 'memory.max'))
+        current = self._read_int(os.path.join(self.CGROUP_ROOT, 'memory.current'))
+        if limit is not None and current is not None and (total is None or limit < total):
+            total = limit
+            available = max(0, limit - current) if available is None else min(available, max(0, limit - current))
+
+        cpu_utilization = None
+        cpu = self._read_cpu_times()
+        if cpu and self._last_cpu:
+            busy = cpu[0] - self._last_cpu[0]
+            elapsed = cpu[1] - self._last_cpu[1]
+            if elapsed > 0:
+                cpu_utilization = busy / elapsed
+        self._last_cpu = cpu
+        return {
+            'rss_bytes': self._read_rss(),
+            'available_bytes': available,
+            'total_bytes': total,
+            'cpu_utilization': cpu_utilization
+        }
+
+
+class AdaptiveConcurrencyController:
+    """依記憶體與 CPU 壓力調整同時執行的推論任務數 (介於 min_concurrency 與 max_concurrency 之間)
+
+    每個任務的預測記憶體 = job_base_memory + memory_per_audio_second × 音檔秒數；
+    已有任務執行時，另以 (目前 RSS - 閒置時 RSS) / 執行中任務數 校正每個任務的基本用量。
+    - 可用記憶體低於 memory_reserve：並行數 -1 (執行中的任務不受影響，只是不再放行新任務)
+    - 名額已滿且仍有等待中任務、CPU 使用率低於 target_cpu_utilization、
+      可用記憶體扣除保留量後足以容納下一個任務：並行數 +1 (距離上次調整需超過 cooldown 秒)
+    """
+
+    def __init__(self, min_concurrency: int, max_concurrency: int, job_base_memory: float,
+                 memory_per_audio_second: float, memory_reserve: float, target_cpu_utilization: float = 0.85,
+                 interval: float = 10, cooldown: float = 60, sampler: Optional[SystemSampler] = None):
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.job_base_memory = job_base_memory
+        self.memory_per_audio_second = memory_per_audio_second
+        self.memory_reserve = memory_reserve
+        self.target_cpu_utilization = target_cpu_utilization
+        self.interval = interval
+        self.cooldown = cooldown
+        self.sampler = sampler or SystemSampler()
+        self.idle_rss: Optional[int] = None
+        self.last_change_at = 0.0
+        self.last_sample: Dict[str, Any] = {}
+        self.decisions = deque(maxlen=50)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._target = None
+
+    def predict_job_memory(self, audio_seconds: float, running: int = 0,
+                           rss: Optional[int] = None) -> float:
+        """預測單一任務所需的記憶體 (位元組)"""
+        base = self.job_base_memory
+        if running > 0 and rss is not None and self.idle_rss is not None:
+            base = max(base, (rss - self.idle_rss) / running)
+        return base + self.memory_per_audio_second * max(0.0, audio_seconds or 0)
+
+    def decide(self, state: Dict[str, Any], sample: Dict[str, Any], now: float) -> Dict[str, Any]:
+        """依目前狀態與系統取樣決定新的並行數
+
+        state: concurrency / running (運算中的任務數) / pending (等待中的任務數) /
+        next_audio_seconds (下一個任務的音檔秒數)；回傳 {'concurrency': int, 'reason': str 或 None}。
+        """
+        concurrency = state['concurrency']
+        running = state['running']
+        rss = sample.get('rss_bytes')
+        available = sample.get('available_bytes')
+        cpu = sample.get('cpu_utilization')
+        if running == 0 and rss is not None:
+            self.idle_rss = rss
+        next_memory = self.predict_job_memory(state.get('next_audio_seconds') or 0, running, rss)
+
+        # 並行數超出範圍 (例如由環境變數設定的初始值)
+        if concurrency > self.max_concurrency or concurrency < self.min_concurrency:
+            target = min(self.max_concurrency, max(self.min_concurrency, concurrency))
+            return {'concurrency': target, 'reason': f'調整至允許範圍 {self.min_concurrency}-{self.max_concurrency}'}
+
+        if available is not None and available < self.memory_reserve and concurrency > self.min_concurrency:
+            return {'concurrency': concurrency - 1,
+                    'reason': f'可用記憶體不足 ({available / 1024 ** 2:.0f} MB < 保留 {self.memory_reserve / 1024 ** 2:.0f} MB)'}
+
+        if (concurrency < self.max_concurrency and state['pending'] > 0 and running >= concurrency
+                and now - self.last_change_at >= self.cooldown):
+            if cpu is not None and cpu >= self.target_cpu_utilization:
+                return {'concurrency': concurrency, 'reason': None}
+            if available is None or available - self.memory_reserve < next_memory:
+                return {'concurrency': concurrency, 'reason': None}
+            return {'concurrency': concurrency + 1,
+                    'reason': (f"資源有餘 (CPU {cpu * 100:.0f}%, " if cpu is not None else "資源有餘 (")
+                              + f"可用記憶體 {available / 1024 ** 2:.0f} MB ≥ 下一個任務預測 "
+                              f"{next_memory / 1024 ** 2:.0f} MB + 保留量)"}
+        return {'concurrency': concurrency, 'reason': None}
+
+    def step(self, get_state: Callable[[], Dict[str, Any]], apply: Callable[[int], None]) -> Dict[str, Any]:
+        """取樣一次並在需要時調整並行數"""
+        now = time.time()
+        state = get_state()
+        sample = self.sampler.sample()
+        decision = self.decide(state, sample, now)
+        self.last_sample = {**sample, **state, 'sampled_at': datetime.now().isoformat()}
+        if decision['concurrency'] != state['concurrency']:
+            apply(decision['concurrency'])
+            self.last_change_at = now
+            record = {
+                'at': datetime.now().isoformat(),
+                'from': state['concurrency'],
+                'to': decision['concurrency'],
+                'reason': decision['reason']
+            }
+            self.decisions.append(record)
+            logging.info(f"📊 並行數 {record['from']} → {record['to']}: {record['reason']}")
+        return decision
+
+    def start(self, get_state: Callable[[], Dict[str, Any]], apply: Callable[[int], None]):
+        """開始定期調整；已啟動時改為調整新的對象 (例如 worker 取代處理器內建的排程器)"""
+        self._target = (get_state, apply)
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.step(*self._target)
+                except Exception as e:
+                    logging.error(f"❌ 調整並行數失敗: {e}")
+
+        self._thread = threading.Thread(target=run, name='concurrency-controller', daemon=True)
+        self._thread.start()
+        logging.info(f"✅ 自動調整並行數已啟動 (範圍 {self.min_concurrency}-{self.max_concurrency})")
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        sample = dict(self.last_sample)
+        return {
+            'min_concurrency': self.min_concurrency,
+            'max_concurrency': self.max_concurrency,
+            'idle_rss_bytes': self.idle_rss,
+            'predicted_job_memory_bytes': round(self.predict_job_memory(
+                sample.get('next_audio_seconds') or 0, sample.get('running') or 0, sample.get('rss_bytes')
+            )),
+            'last_sample': sample,
+            'decisions': list(self.decisions)
+        }
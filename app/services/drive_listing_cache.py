@@ -0,0 +1,113 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class DriveListingCache:
+    """每位使用者的 Drive 檔案列表快取 (記憶體內，最多 max_entries 筆)
+
+    快取項目最長保留 ttl 秒；超過 check_interval 秒後，以 Changes API 檢查使用者的 Drive
+    自上次 token 以來是否有任何變動 (只讀一筆變更，成本遠低於重新列出檔案)，
+    有變動時該使用者的所有列表一併失效。ETag 依列表內容計算，重新列出後內容未變時 ETag 不變。
+    """
+
+    def __init__(self, ttl: float = 600, check_interval: float = 30, max_entries: int = 256):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Tuple[str, Hashable], Dict[str, Any]]' = OrderedDict()
+        # 每位使用者的 Changes token、上次檢查時間與世代 (有變動時世代 +1，舊世代的列表失效)
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @staticmethod
+    def make_etag(files: List[Dict[str, Any]]) -> str:
+        payload = json.dumps(files, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(payload).hexdigest()
+
+    def _validate_user(self, user_key: str, drive_service) -> int:
+        """必要時以 Changes API 檢查使用者的 Drive 是否有變動，回傳目前的世代"""
+        with self.lock:
+            state = self.users.get(user_key)
+            if state and time.time() - state['checked_at'] < self.check_interval:
+                return state['generation']
+        if state is None:
+            token = drive_service.changes().getStartPageToken().execute().get('startPageToken')
+            with self.lock:
+                state = self.users.setdefault(user_key, {'token': token, 'checked_at': time.time(), 'generation': 0})
+                return state['generation']
+
+        results = drive_service.changes().list(
+            pageToken=state['token'],
+            spaces='drive',
+            pageSize=1,
+            fields="nextPageToken, newStartPageToken, changes(fileId)"
+        ).execute()
+        changed = bool(results.get('changes'))
+        if changed:
+            # 有變動：直接取得最新的 token (不必讀完所有變更)
+            token = drive_service.changes().getStartPageToken().execute().get('startPageToken')
+        else:
+            token = results.get('newStartPageToken') or state['token']
+        with self.lock:
+            state['token'] = token
+            state['checked_at'] = time.time()
+            if changed:
+                state['generation'] += 1
+                self.stats['invalidations'] += 1
+                logging.info(f"🔄 使用者 {user_key} 的 Drive 有變動，檔案列表快取已失效")
+            return state['generation']
+
+    def lookup(self, user_key: str, key: Hashable, drive_service) -> Tuple[Optional[Dict[str, Any]], int]:
+        """回傳 (仍有效的快取項目或 None, 目前世代)；未命中時呼叫端列出檔案後以同一世代呼叫 put"""
+        try:
+            generation = self._validate_user(user_key, drive_service)
+        except Exception as e:
+            logging.warning(f"⚠️ 以 Changes API 檢查 Drive 變動失敗，略過快取: {e}")
+            with self.lock:
+                self.users.pop(user_key, None)
+            return None, -1
+        with self.lock:
+            entry = self.entries.get((user_key, key))
+            if (entry and entry['generation'] == generation
+                    and time.time() - entry['cached_at'] < self.ttl):
+                self.entries.move_to_end((user_key, key))
+                self.stats['hits'] += 1
+                return entry, generation
+            self.stats['misses'] += 1
+            return None, generation
+
+    def put(self, user_key: str, key: Hashable, files: List[Dict[str, Any]], generation: int) -> Dict[str, Any]:
+        entry = {
+            'files': files,
+            'etag': self.make_etag(files),
+            'generation': generation,
+            'cached_at': time.time()
+        }
+        if generation < 0:
+            return entry
+        with self.lock:
+            self.entries[(user_key, key)] = entry
+            self.entries.move_to_end((user_key, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_key: Optional[str] = None):
+        with self.lock:
+            if user_key is None:
+                self.entries.clear()
+                self.users.clear()
+                return
+            for cache_key in [k for k in self.entries if k[0] == user_key]:
+                del self.entries[cache_key]
+            self.users.pop(user_key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'entries': len(self.entries), 'users': len(self.users), **self.stats}
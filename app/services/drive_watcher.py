@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import redis
+import requests
+
+from ..utils.constants import PROCESSED_FILENAME_PATTERN
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台
+    fcntl = None
+
+
+class FileWatchState:
+    """將 Changes API 的 page token 存放在本機 JSON 檔；以檔案鎖確保同一台主機只有一個程序在監看"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_file = None
+
+    def get_token(self) -> Optional[str]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('page_token')
+        except (OSError, ValueError):
+            return None
+
+    def set_token(self, token: str):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'page_token': token}, f)
+        os.replace(tmp_path, self.path)
+
+    def acquire_leader(self, owner: str, ttl: int) -> bool:
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_file = open(f"{self.path}.lock", 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def release_leader(self, owner: str):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class RedisWatchState:
+    """將 page token 存放在 Redis，並以帶 TTL 的鎖選出唯一的監看程序 (多個 web / worker 程序共用)"""
+
+    TOKEN_KEY = 'drive:changes:page_token'
+    LEADER_KEY = 'drive:changes:leader'
+
+    # KEYS: leader；ARGV: owner, ttl —— 由自己持有時延長，否則嘗試取得
+    ACQUIRE_SCRIPT = """
+    local holder = redis.call('GET', KEYS[1])
+    if holder == ARGV[1] then
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+        return 1
+    end
+    if holder then return 0 end
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+    return 0
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+        self._acquire = self.redis.register_script(self.ACQUIRE_SCRIPT)
+        self._release = self.redis.register_script(self.RELEASE_SCRIPT)
+
+    def get_token(self) -> Optional[str]:
+        return self.redis.get(self.TOKEN_KEY)
+
+    def set_token(self, token: str):
+        self.redis.set(self.TOKEN_KEY, token)
+
+    def acquire_leader(self, owner: str, ttl: int) -> bool:
+        return bool(self._acquire(keys=[self.LEADER_KEY], args=[owner, ttl]))
+
+    def release_leader(self, owner: str):
+        self._release(keys=[self.LEADER_KEY], args=[owner])
+
+
+class DriveChangeWatcher:
+    """以 Drive Changes API 增量偵測指定資料夾中新增或修改的音檔
+
+    第一次啟動時取得目前的 startPageToken (只處理之後的變更，既有檔案請用批次送出)，
+    之後每 poll_interval 秒以 changes.list 讀取自上次 token 以來的變更，成本只與變更數量有關。
+    符合條件的檔案 (音訊、未刪除、位於 folder_ids 其中之一、檔名尚未加上處理完成的日期前綴)
+    交給 on_file 建立任務；on_file 回傳 False (例如等待中的任務已達上限) 時不推進 token，稍後重試。
+
+    HTTP 請求透過 session 送往 endpoint，因此可指向本機的假 Drive 伺服器進行測試。
+    """
+
+    FILE_FIELDS = "id,name,mimeType,size,md5Checksum,modifiedTime,parents,trashed,videoMediaMetadata(durationMillis)"
+
+    def __init__(self, session: requests.Session, endpoint: str, state, folder_ids: Iterable[str],
+                 on_file: Callable[[Dict[str, Any]], bool], poll_interval: float = 15,
+                 page_size: int = 1000, leader_ttl: int = 60):
+        self.session = session
+        self.endpoint = endpoint.rstrip('/')
+        self.state = state
+        self.folder_ids = set(folder_ids)
+        self.on_file = on_file
+        self.poll_interval = poll_interval
+        self.page_size = page_size
+        self.leader_ttl = max(int(leader_ttl), int(poll_interval * 3))
+        self.owner = uuid.uuid4().hex
+        self.processed_pattern = re.compile(PROCESSED_FILENAME_PATTERN)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'polls': 0, 'changes': 0, 'enqueued': 0, 'errors': 0, 'last_poll_at': None, 'leader': False}
+
+    def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.session.get(f"{self.endpoint}/drive/v3/{path}", params=params, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def get_start_page_token(self) -> str:
+        return self._get('changes/startPageToken', {'supportsAllDrives': 'true'})['startPageToken']
+
+    def is_candidate(self, file: Optional[Dict[str, Any]]) -> bool:
+        """變更的檔案是否需要建立任務"""
+        if not file or file.get('trashed'):
+            return False
+        if not (file.get('mimeType') or '').startswith('audio/'):
+            return False
+        if not self.folder_ids.intersection(file.get('parents') or []):
+            return False
+        return not self.processed_pattern.match(file.get('name') or '')
+
+    def poll_once(self) -> int:
+        """讀取並處理自上次 token 以來的所有變更，回傳建立任務的檔案數"""
+        token = self.state.get_token()
+        if not token:
+            self.state.set_token(self.get_start_page_token())
+            logging.info("✅ Drive 變更監看已取得起始 token，將處理之後新增或修改的音檔")
+            return 0
+
+        enqueued = 0
+        while token:
+            page = self._get('changes', {
+                'pageToken': token,
+                'pageSize': self.page_size,
+                'spaces': 'drive',
+                'supportsAllDrives': 'true',
+                'includeItemsFromAllDrives': 'true',
+                'fields': f"nextPageToken,newStartPageToken,changes(fileId,removed,file({self.FILE_FIELDS}))"
+            })
+            changes: List[Dict[str, Any]] = page.get('changes', [])
+            self.stats['changes'] += len(changes)
+            for change in changes:
+                file = change.get('file')
+                if change.get('removed') or not self.is_candidate(file):
+                    continue
+                if not self.on_file(file):
+                    # 暫時無法接受 (token 不推進，下次輪詢重新讀取此頁；已建立的任務會被去重)
+                    logging.warning("⚠️ Drive 變更暫時無法建立任務，稍後重試")
+                    return enqueued
+                enqueued += 1
+                self.stats['enqueued'] += 1
+            token = page.get('nextPageToken')
+            new_token = token or page.get('newStartPageToken')
+            if new_token:
+                self.state.set_token(new_token)
+        return enqueued
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='drive-watcher', daemon=True)
+            self._thread.start()
+            logging.info(f"✅ Drive 變更監看已啟動 (資料夾 {len(self.folder_ids)} 個，每 {self.poll_interval:g} 秒)")
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.state.release_leader(self.owner)
+        except Exception:
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.stats['leader'] = self.state.acquire_leader(self.owner, self.leader_ttl)
+                if self.stats['leader']:
+                    enqueued = self.poll_once()
+                    self.stats['polls'] += 1
+                    self.stats['last_poll_at'] = datetime.now().isoformat()
+                    if enqueued:
+                        logging.info(f"📥 Drive 變更監看建立了 {enqueued} 個任務")
+            except Exception as e:
+                self.stats['errors'] += 1
+                logging.error(f"❌ Drive 變更監看失敗: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {'folder_ids': sorted(self.folder_ids), 'poll_interval': self.poll_interval, **self.stats}
+
@@ -0,0 +1,173 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+class FolderIndex:
+    """單一使用者的 Drive 資料夾樹 (id → (名稱, 父資料夾))，路徑計算結果會被記住
+
+    以一次分頁的 files.list 列出所有資料夾建立，之後可用 Changes feed 增量更新 (apply_changes)。
+    父資料夾不在索引中的資料夾 (例如他人分享的資料夾) 視為最上層。
+    """
+
+    MAX_DEPTH = 50
+
+    def __init__(self, root_id: str, root_name: str, folders: Dict[str, Tuple[str, Optional[str]]],
+                 page_token: Optional[str] = None):
+        self.root_id = root_id
+        self.folders = {root_id: (root_name, None), **folders}
+        self.page_token = page_token
+        self.built_at = time.time()
+        self.refreshed_at = self.built_at
+        self.lock = threading.Lock()
+        self._paths: Dict[str, str] = {}
+        self._children: Optional[Dict[Tuple[str, str], str]] = None
+
+    @classmethod
+    def build(cls, drive_service) -> 'FolderIndex':
+        """列出使用者所有的資料夾 (每頁 1000 筆) 建立索引"""
+        # 先取得 Changes feed 的起點，建立索引期間的變動之後仍會被套用
+        page_token = drive_service.changes().getStartPageToken().execute().get('startPageToken')
+        root = drive_service.files().get(fileId='root', fields='id,name').execute()
+        folders: Dict[str, Tuple[str, Optional[str]]] = {}
+        request_token = None
+        while True:
+            results = drive_service.files().list(
+                q=f"trashed = false and mimeType = '{FOLDER_MIME_TYPE}'",
+                spaces='drive',
+                fields="nextPageToken, files(id, name, parents)",
+                pageSize=1000,
+                pageToken=request_token
+            ).execute()
+            for folder in results.get('files', []):
+                folders[folder['id']] = (folder.get('name', 'unknown'), (folder.get('parents') or [None])[0])
+            request_token = results.get('nextPageToken')
+            if not request_token:
+                break
+        logging.info(f"✅ 已建立資料夾索引 ({len(folders)} 個資料夾)")
+        return cls(root['id'], root.get('name', ''), folders, page_token)
+
+    def apply_changes(self, drive_service) -> int:
+        """讀取自上次 token 以來的 Changes feed，套用資料夾的新增、改名、移動與刪除，回傳變動的資料夾數"""
+        changed = 0
+        token = self.page_token
+        while token:
+            results = drive_service.changes().list(
+                pageToken=token,
+                spaces='drive',
+                pageSize=1000,
+                fields="nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, mimeType, parents, trashed))"
+            ).execute()
+            with self.lock:
+                for change in results.get('changes', []):
+                    file = change.get('file') or {}
+                    file_id = change.get('fileId')
+                    if change.get('removed') or file.get('trashed'):
+                        if file_id in self.folders and file_id != self.root_id:
+                            del self.folders[file_id]
+                            changed += 1
+                    elif file.get('mimeType') == FOLDER_MIME_TYPE:
+                        self.folders[file_id] = (file.get('name', 'unknown'), (file.get('parents') or [None])[0])
+                        changed += 1
+                if changed:
+                    self._paths = {}
+                    self._children = None
+            token = results.get('nextPageToken')
+            self.page_token = token or results.get('newStartPageToken') or self.page_token
+        self.refreshed_at = time.time()
+        return changed
+
+    def path(self, folder_id: Optional[str]) -> str:
+        """資料夾的完整路徑 (包含根目錄名稱，以 / 連接)"""
+        if not folder_id:
+            return ""
+        with self.lock:
+            cached = self._paths.get(folder_id)
+            if cached is not None:
+                return cached
+            # 往上走到已記住路徑的祖先或最上層，再沿途記住每一層的路徑
+            chain: List[str] = []
+            current = folder_id
+            prefix = ""
+            while current in self.folders and len(chain) < self.MAX_DEPTH:
+                if current in self._paths:
+                    prefix = self._paths[current]
+                    break
+                chain.append(current)
+                current = self.folders[current][1]
+                if current in chain:
+                    break
+            for node in reversed(chain):
+                name = self.folders[node][0]
+                prefix = f"{prefix}/{name}" if prefix else name
+                self._paths[node] = prefix
+            return self._paths.get(folder_id, "")
+
+    def file_path(self, parents: Optional[List[str]]) -> str:
+        """檔案所在的資料夾路徑 (與 get_file_folder_path 相同：沒有父資料夾時為 root)"""
+        if not parents:
+            return "root"
+        return self.path(parents[0])
+
+    def find(self, folder_path: str) -> Optional[str]:
+        """依多層資料夾名稱 (如 'WearNote_Recordings/Documents'，從根目錄開始) 找出資料夾 ID"""
+        with self.lock:
+            if self._children is None:
+                self._children = {}
+                for folder_id, (name, parent_id) in self.folders.items():
+                    self._children.setdefault((parent_id, name), folder_id)
+            parent_id = self.root_id
+            for name in folder_path.strip('/').split('/'):
+                parent_id = self._children.get((parent_id, name))
+                if parent_id is None:
+                    return None
+            return parent_id
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'folders': len(self.folders),
+            'memoized_paths': len(self._paths),
+            'built_at': self.built_at,
+            'refreshed_at': self.refreshed_at
+        }
+
+
+class FolderIndexCache:
+    """每位使用者一份資料夾索引；超過 refresh_interval 時以 Changes feed 增量更新，更新失敗才重新建立"""
+
+    def __init__(self, refresh_interval: float = 60):
+        self.refresh_interval = refresh_interval
+        self.indexes: Dict[str, FolderIndex] = {}
+        self.locks: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_key: str, drive_service) -> FolderIndex:
+        with self.lock:
+            user_lock = self.locks.setdefault(user_key, threading.Lock())
+        with user_lock:
+            index = self.indexes.get(user_key)
+            if index is None:
+                index = self.indexes[user_key] = FolderIndex.build(drive_service)
+            elif time.time() - index.refreshed_at >= self.refresh_interval:
+                try:
+                    changed = index.apply_changes(drive_service)
+                    if changed:
+                        logging.info(f"🔄 資料夾索引已套用 {changed} 個變動")
+                except Exception as e:
+                    logging.warning(f"⚠️ 以 Changes feed 更新資料夾索引失敗，重新建立: {e}")
+                    index = self.indexes[user_key] = FolderIndex.build(drive_service)
+            return index
+
+    def invalidate(self, user_key: Optional[str] = None):
+        with self.lock:
+            if user_key is None:
+                self.indexes.clear()
+            else:
+                self.indexes.pop(user_key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {user_key: index.get_stats() for user_key, index in self.indexes.items()}
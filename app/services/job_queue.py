@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import socket
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from .job_scheduler import SchedulingPolicy
+
+
+class RedisJobQueue:
+    """以 Redis 實作的持久化任務佇列，供獨立的 worker 程序 (可跨多台主機) 消費
+
+    - jobs:queue      待處理任務 (sorted set，分數為入列時間；重新入列的任務為 0)
+                      重新入列的任務在排程資訊中標記 requeued，排程時優先於其他任務 (仍受每位使用者並行上限限制)
+    - jobs:meta       排程資訊 (hash，JSON: user_id / cost_seconds / audio_seconds / enqueued_at)
+    - jobs:inflight   處理中任務 (sorted set，分數為可見性逾時的截止時間)
+    - jobs:leases     任務目前由哪個 worker 持有 (hash)
+    - jobs:started    任務開始處理的時間 (hash)
+    - jobs:attempts   任務被領取的次數 (hash)
+    - worker:<id>     worker 心跳 (帶 TTL 的 key)
+
+    worker 須定期呼叫 heartbeat() 延長持有任務的截止時間；截止時間已過的任務
+    (worker 當機或卡住) 會由 requeue_expired() 放回佇列，因此為至少一次 (at-least-once) 的語意。
+    領取順序由 SchedulingPolicy 決定 (最短任務優先、老化與每位使用者並行上限皆跨 worker 計算)。
+    """
+
+    QUEUE_KEY = 'jobs:queue'
+    INFLIGHT_KEY = 'jobs:inflight'
+    LEASES_KEY = 'jobs:leases'
+    ATTEMPTS_KEY = 'jobs:attempts'
+    META_KEY = 'jobs:meta'
+    STARTED_KEY = 'jobs:started'
+    WORKERS_KEY = 'jobs:workers'
+    WORKER_PREFIX = 'worker:'
+
+    # KEYS: queue, inflight, leases, attempts, started；ARGV: worker_id, 截止時間, job_id, 現在時間
+    # 任務已被其他 worker 領取 (或已移除) 時回傳 false
+    CLAIM_SCRIPT = """
+    if redis.call('ZREM', KEYS[1], ARGV[3]) == 0 then return false end
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+    redis.call('HSET', KEYS[3], ARGV[3], ARGV[1])
+    redis.call('HSET', KEYS[5], ARGV[3], ARGV[4])
+    return redis.call('HINCRBY', KEYS[4], ARGV[3], 1)
+    """
+
+    # KEYS: inflight, leases；ARGV: worker_id, 新截止時間, job_id...
+    EXTEND_SCRIPT = """
+    local extended = 0
+    for i = 3, #ARGV do
+        if redis.call('HGET', KEYS[2], ARGV[i]) == ARGV[1] then
+            redis.call('ZADD', KEYS[1], 'XX', ARGV[2], ARGV[i])
+            extended = extended + 1
+        end
+    end
+    return extended
+    """
+
+    # KEYS: inflight, leases, attempts, started, meta；ARGV: worker_id, job_id
+    ACK_SCRIPT = """
+    if redis.call('HGET', KEYS[2], ARGV[2]) ~= ARGV[1] then return 0 end
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    for i = 2, 5 do redis.call('HDEL', KEYS[i], ARGV[2]) end
+    return 1
+    """
+
+    # KEYS: queue, inflight, leases, started, meta；ARGV: 現在時間, 重新入列分數
+    REQUEUE_SCRIPT = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+    local result = {}
+    for _, job_id in ipairs(expired) do
+        local owner = redis.call('HGET', KEYS[3], job_id) or ''
+        redis.call('ZREM', KEYS[2], job_id)
+        redis.call('HDEL', KEYS[3], job_id)
+        redis.call('HDEL', KEYS[4], job_id)
+        local meta = redis.call('HGET', KEYS[5], job_id)
+        if meta then
+            local entry = cjson.decode(meta)
+            entry['requeued'] = true
+            redis.call('HSET', KEYS[5], job_id, cjson.encode(entry))
+        end
+        redis.call('ZADD', KEYS[1], ARGV[2], job_id)
+        table.insert(result, job_id)
+        table.insert(result, owner)
+    end
+    return result
+    """
+
+    def __init__(self, redis_client: redis.Redis, visibility_timeout: int = 120):
+        self.redis = redis_client
+        self.visibility_timeout = visibility_timeout
+        self._claim_script = self.redis.register_script(self.CLAIM_SCRIPT)
+        self._extend_script = self.redis.register_script(self.EXTEND_SCRIPT)
+        self._ack_script = self.redis.register_script(self.ACK_SCRIPT)
+        self._requeue_script = self.redis.register_script(self.REQUEUE_SCRIPT)
+
+    @staticmethod
+    def new_worker_id() -> str:
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    def enqueue(self, entry: Dict[str, Any]):
+        """將排程項目 (SchedulingPolicy.make_entry) 放入佇列"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(self.META_KEY, entry['job_id'], json.dumps(entry))
+        pipe.zadd(self.QUEUE_KEY, {entry['job_id']: entry['enqueued_at']})
+        pipe.execute()
+
+    def remove(self, job_id: str) -> bool:
+        """從待處理佇列移除任務 (例如任務在開始前被取消)"""
+        if not self.redis.zrem(self.QUEUE_KEY, job_id):
+            return False
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hdel(self.META_KEY, job_id)
+        pipe.hdel(self.ATTEMPTS_KEY, job_id)
+        pipe.execute()
+        return True
+
+    def _snapshot(self, policy: SchedulingPolicy):
+        """讀取所有等待中與處理中任務的排程資訊"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zrange(self.QUEUE_KEY, 0, -1, withscores=True)
+        pipe.zrange(self.INFLIGHT_KEY, 0, -1)
+        pipe.hgetall(self.META_KEY)
+        pipe.hgetall(self.STARTED_KEY)
+        queued, inflight, meta, started = pipe.execute()
+
+        def entry_for(job_id: str, score: float) -> Dict[str, Any]:
+            if job_id in meta:
+                return json.loads(meta[job_id])
+            return {
+                'job_id': job_id,
+                'user_id': 'anonymous',
+                'cost_seconds': policy.default_cost_seconds,
+                'enqueued_at': score or time.time()
+            }
+
+        pending = [entry_for(job_id, score) for job_id, score in queued]
+        running = []
+        for job_id in inflight:
+            entry = entry_for(job_id, 0)
+            entry['started_at'] = float(started.get(job_id) or time.time())
+            running.append(entry)
+        return pending, running
+
+    @staticmethod
+    def _count_by_user(entries: List[Dict[str, Any]]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in entries:
+            counts[entry['user_id']] = counts.get(entry['user_id'], 0) + 1
+        return counts
+
+    def claim(self, worker_id: str, policy: SchedulingPolicy, max_retries: int = 5) -> Optional[Dict[str, Any]]:
+        """依排程策略領取下一個任務；沒有可執行的任務時回傳 None"""
+        for _ in range(max_retries):
+            pending, running = self._snapshot(policy)
+            now = time.time()
+            entry = policy.select(pending, self._count_by_user(running), now)
+            if entry is None:
+                return None
+            attempts = self._claim_script(
+                keys=[self.QUEUE_KEY, self.INFLIGHT_KEY, self.LEASES_KEY, self.ATTEMPTS_KEY, self.STARTED_KEY],
+                args=[worker_id, now + self.visibility_timeout, entry['job_id'], now]
+            )
+            if attempts:
+                return {**entry, 'attempts': int(attempts)}
+            # 同時被其他 worker 領走，重新挑選
+        return None
+
+    def get_plan(self, policy: SchedulingPolicy) -> Dict[str, Dict[str, Any]]:
+        """依目前存活 worker 的總並行數模擬排程，回傳各等待中任務的佇列位置與預計開始秒數"""
+        pending, running = self._snapshot(policy)
+        concurrency = self.get_concurrency()
+        plan = policy.plan(pending, running, concurrency, time.time())
+        if concurrency <= 0:
+            # 沒有存活的 worker，無法預測開始時間
+            for item in plan.values():
+                item['estimated_start_seconds'] = None
+        return plan
+
+    def get_backlog(self, policy: SchedulingPolicy) -> Dict[str, Any]:
+        """等待中任務的統計 (任務數、音訊秒數、預測處理秒數)"""
+        pending, _ = self._snapshot(policy)
+        return policy.summarize(pending)
+
+    def get_concurrency(self) -> int:
+        """目前存活 worker 的總並行數"""
+        return sum(int(w.get('concurrency') or 0) for w in self.list_workers())
+
+    def ack(self, worker_id: str, job_id: str) -> bool:
+        """任務處理結束 (完成、失敗或取消)，釋放持有權"""
+        return bool(self._ack_script(
+            keys=[self.INFLIGHT_KEY, self.LEASES_KEY, self.ATTEMPTS_KEY, self.STARTED_KEY, self.META_KEY],
+            args=[worker_id, job_id]
+        ))
+
+    def heartbeat(self, worker_id: str, job_ids: List[str], info: Optional[Dict[str, Any]] = None) -> int:
+        """更新 worker 心跳，並延長其持有任務的可見性截止時間"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(f"{self.WORKER_PREFIX}{worker_id}",
+                 json.dumps({**(info or {}), 'jobs': job_ids, 'last_seen': time.time()}),
+                 ex=self.visibility_timeout)
+        pipe.sadd(self.WORKERS_KEY, worker_id)
+        pipe.execute()
+        if not job_ids:
+            return 0
+        return int(self._extend_script(
+            keys=[self.INFLIGHT_KEY, self.LEASES_KEY],
+            args=[worker_id, time.time() + self.visibility_timeout, *job_ids]
+        ))
+
+    def requeue_expired(self) -> List[Dict[str, str]]:
+        """將超過可見性逾時的任務放回佇列最前端，回傳 [{'job_id', 'worker_id'}]"""
+        result = self._requeue_script(
+            keys=[self.QUEUE_KEY, self.INFLIGHT_KEY, self.LEASES_KEY, self.STARTED_KEY, self.META_KEY],
+            args=[time.time(), 0]
+        )
+        return [{'job_id': result[i], 'worker_id': result[i + 1]} for i in range(0, len(result), 2)]
+
+    def unregister_worker(self, worker_id: str):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(f"{self.WORKER_PREFIX}{worker_id}")
+        pipe.srem(self.WORKERS_KEY, worker_id)
+        pipe.execute()
+
+    def list_workers(self) -> List[Dict[str, Any]]:
+        """列出仍有心跳的 worker (並清除已消失的 worker)"""
+        worker_ids = list(self.redis.smembers(self.WORKERS_KEY))
+        pipe = self.redis.pipeline(transaction=False)
+        for worker_id in worker_ids:
+            pipe.get(f"{self.WORKER_PREFIX}{worker_id}")
+        workers = []
+        for worker_id, raw in zip(worker_ids, pipe.execute()):
+            if raw is None:
+                self.redis.srem(self.WORKERS_KEY, worker_id)
+                continue
+            workers.append({'worker_id': worker_id, **json.loads(raw)})
+        return workers
+
+    def get_attempts(self, job_id: str) -> int:
+        return int(self.redis.hget(self.ATTEMPTS_KEY, job_id) or 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard(self.QUEUE_KEY)
+        pipe.zcard(self.INFLIGHT_KEY)
+        queued, inflight = pipe.execute()
+        return {
+            'queued': queued,
+            'inflight': inflight,
+            'workers': self.list_workers()
+        }
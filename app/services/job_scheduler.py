@@ -0,0 +1,252 @@
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SchedulingPolicy:
+    """最短任務優先 (依預測處理秒數) + 老化 + 每位使用者公平分享與並行上限
+
+    - 優先值 = 預測處理秒數 - aging_factor × 已等待秒數，越小越先執行 (等待越久的長任務最終會被排到前面)
+    - 先挑選目前執行中任務最少、且未達並行上限的使用者，再取該使用者優先值最小的任務
+    - 因 worker 中斷而重新入列的任務 (requeued) 優先於其他任務
+
+    任務項目 (entry) 為 dict: job_id, user_id, cost_seconds, audio_seconds, enqueued_at
+    (執行中任務另有 started_at，重新入列的任務另有 requeued)。
+    """
+
+    def __init__(self, aging_factor: float = 1.0, per_user_max_running: int = 2,
+                 default_cost_seconds: float = 600):
+        self.aging_factor = aging_factor
+        self.per_user_max_running = per_user_max_running
+        self.default_cost_seconds = default_cost_seconds
+
+    def make_entry(self, job: Dict[str, Any], enqueued_at: Optional[float] = None) -> Dict[str, Any]:
+        """由任務資料建立排程項目"""
+        estimated_cost = job.get('estimated_cost') or {}
+        cost = estimated_cost.get('predicted_processing_seconds')
+        return {
+            'job_id': job['id'],
+            'user_id': job.get('user_id') or 'anonymous',
+            'cost_seconds': float(cost) if cost else self.default_cost_seconds,
+            'audio_seconds': float(estimated_cost.get('audio_seconds') or 0),
+            'enqueued_at': time.time() if enqueued_at is None else enqueued_at
+        }
+
+    @staticmethod
+    def summarize(pending: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """等待中任務的統計：任務數、音訊秒數與預測處理秒數總和"""
+        return {
+            'jobs': len(pending),
+            'audio_seconds': sum(entry.get('audio_seconds') or 0 for entry in pending),
+            'cost_seconds': sum(entry['cost_seconds'] for entry in pending)
+        }
+
+    def priority(self, entry: Dict[str, Any], now: float) -> float:
+        if entry.get('requeued'):
+            return float('-inf')
+        waited = max(0.0, now - entry['enqueued_at'])
+        return entry['cost_seconds'] - self.aging_factor * waited
+
+    def _under_cap(self, user_id: str, running_by_user: Dict[str, int]) -> bool:
+        return self.per_user_max_running <= 0 or running_by_user.get(user_id, 0) < self.per_user_max_running
+
+    def select(self, pending: List[Dict[str, Any]], running_by_user: Dict[str, int],
+               now: float) -> Optional[Dict[str, Any]]:
+        """挑選下一個要執行的任務；所有使用者皆達上限時回傳 None"""
+        best_by_user: Dict[str, Dict[str, Any]] = {}
+        for entry in pending:
+            user_id = entry['user_id']
+            if not self._under_cap(user_id, running_by_user):
+                continue
+            current = best_by_user.get(user_id)
+            if current is None or self.priority(entry, now) < self.priority(current, now):
+                best_by_user[user_id] = entry
+        if not best_by_user:
+            return None
+        return min(
+            best_by_user.values(),
+            key=lambda e: (running_by_user.get(e['user_id'], 0), self.priority(e, now), e['enqueued_at'])
+        )
+
+    def plan(self, pending: List[Dict[str, Any]], running: List[Dict[str, Any]],
+             concurrency: int, now: float) -> Dict[str, Dict[str, Any]]:
+        """模擬排程順序，回傳每個等待中任務的佇列位置與預計開始秒數 (相對於 now)"""
+        finish_events = []
+        running_by_user: Dict[str, int] = {}
+        for entry in running:
+            elapsed = now - entry.get('started_at', now)
+            heapq.heappush(finish_events, (max(0.0, entry['cost_seconds'] - elapsed), entry['user_id']))
+            running_by_user[entry['user_id']] = running_by_user.get(entry['user_id'], 0) + 1
+
+        free_slots = max(1, concurrency) - len(running)
+        clock = 0.0
+        remaining = list(pending)
+        result: Dict[str, Dict[str, Any]] = {}
+
+        while remaining:
+            entry = self.select(remaining, running_by_user, now + clock) if free_slots > 0 else None
+            if entry is None:
+                if not finish_events:
+                    break
+                # 推進到下一個任務完成的時間點
+                finish_at, user_id = heapq.heappop(finish_events)
+                clock = max(clock, finish_at)
+                running_by_user[user_id] -= 1
+                free_slots += 1
+                continue
+
+            result[entry['job_id']] = {
+                'queue_position': len(result) + 1,
+                'estimated_start_seconds': round(clock, 1)
+            }
+            remaining.remove(entry)
+            heapq.heappush(finish_events, (clock + entry['cost_seconds'], entry['user_id']))
+            running_by_user[entry['user_id']] = running_by_user.get(entry['user_id'], 0) + 1
+            free_slots -= 1
+        return result
+
+
+class ResizableSemaphore:
+    """可調整容量的計數號誌 (轉錄名額)
+
+    調低容量時已取得的名額不受影響，只是在歸還到低於新容量之前不再放行新的取得者。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, cancel_check: Optional[Callable[[], bool]] = None, poll_interval: float = 1.0) -> bool:
+        """取得一個名額 (必要時等待)；等待期間 cancel_check 回傳 True 時放棄並回傳 False"""
+        with self.condition:
+            while self.in_use >= self.capacity:
+                if cancel_check and cancel_check():
+                    return False
+                self.condition.wait(timeout=poll_interval)
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.in_use = max(0, self.in_use - 1)
+            self.condition.notify_all()
+
+    def set_capacity(self, capacity: int):
+        with self.condition:
+            self.capacity = max(1, capacity)
+            self.condition.notify_all()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.condition:
+            return {'capacity': self.capacity, 'in_use': self.in_use}
+
+
+class JobScheduler:
+    """本程序執行模式的排程器：任務先進入等待區，有空位時依排程策略送入執行緒池
+
+    除了 concurrency 個運算名額外，另可多放行 prefetch_depth 個任務先行下載與轉檔
+    (start_job 的 prefetch 參數為 True)，待運算名額空出時即可直接開始轉錄。
+    實際進行轉錄的任務數由 asr_slots 限制為 concurrency (預先下載的任務與並行數調低前已放行的任務
+    都須取得名額才能開始轉錄)，set_concurrency 會同時調整其容量。
+    """
+
+    def __init__(self, policy: SchedulingPolicy, concurrency: int,
+                 start_job: Callable[[str, bool], Future], prefetch_depth: int = 0):
+        self.policy = policy
+        self.concurrency = max(1, concurrency)
+        self.prefetch_depth = max(0, prefetch_depth)
+        self.start_job = start_job
+        self.asr_slots = ResizableSemaphore(self.concurrency)
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.running: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, entry: Dict[str, Any]):
+        with self.lock:
+            self.pending[entry['job_id']] = entry
+        self._dispatch()
+
+    def remove(self, job_id: str) -> bool:
+        """移除尚未開始的任務 (例如任務被取消)"""
+        with self.lock:
+            return self.pending.pop(job_id, None) is not None
+
+    def _dispatch(self):
+        while True:
+            with self.lock:
+                if len(self.running) >= self.concurrency + self.prefetch_depth or not self.pending:
+                    return
+                prefetch = len(self.running) >= self.concurrency
+                now = time.time()
+                entry = self.policy.select(list(self.pending.values()), self._running_by_user(), now)
+                if entry is None:
+                    return
+                del self.pending[entry['job_id']]
+                self.running[entry['job_id']] = {**entry, 'started_at': now}
+
+            logging.info(f"[Job {entry['job_id']}] ▶️ 排程開始{' (預先下載)' if prefetch else ''} (使用者: {entry['user_id']}, 預測 {entry['cost_seconds']:.0f} 秒, 等待 {now - entry['enqueued_at']:.0f} 秒)")
+            try:
+                future = self.start_job(entry['job_id'], prefetch)
+            except Exception as e:
+                logging.error(f"[Job {entry['job_id']}] ❌ 提交任務失敗: {e}")
+                self._on_done(entry['job_id'])
+                continue
+            future.add_done_callback(lambda _, job_id=entry['job_id']: self._on_done(job_id))
+
+    def _on_done(self, job_id: str):
+        with self.lock:
+            self.running.pop(job_id, None)
+        self._dispatch()
+
+    def _running_by_user(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.running.values():
+            counts[entry['user_id']] = counts.get(entry['user_id'], 0) + 1
+        return counts
+
+    def set_concurrency(self, concurrency: int):
+        """調整運算名額 (調低時轉錄中的任務不受影響，只是不再放行新任務開始轉錄)"""
+        with self.lock:
+            self.concurrency = max(1, concurrency)
+        self.asr_slots.set_capacity(self.concurrency)
+        self._dispatch()
+
+    def get_load(self) -> Dict[str, Any]:
+        """目前的並行數、執行中與等待中的任務數，以及下一個將被放行之任務的音檔秒數"""
+        with self.lock:
+            pending = list(self.pending.values())
+            running_by_user = self._running_by_user()
+            running = len(self.running)
+            concurrency = self.concurrency
+        next_entry = self.policy.select(pending, running_by_user, time.time()) if pending else None
+        return {
+            'concurrency': concurrency,
+            'running': running,
+            'pending': len(pending),
+            'next_audio_seconds': next_entry['audio_seconds'] if next_entry else 0
+        }
+
+    def get_plan(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            pending = list(self.pending.values())
+            running = list(self.running.values())
+        return self.policy.plan(pending, running, self.concurrency, time.time())
+
+    def get_backlog(self) -> Dict[str, Any]:
+        with self.lock:
+            return self.policy.summarize(list(self.pending.values()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'running': len(self.running),
+                'concurrency': self.concurrency,
+                'prefetch_depth': self.prefetch_depth,
+                'running_by_user': self._running_by_user(),
+                'asr_slots': self.asr_slots.get_stats()
+            }
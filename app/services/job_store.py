@@ -0,0 +1,884 @@
+import os
+import json
+import base64
+import atexit
+import shutil
+import logging
+import tempfile
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+
+from app.utils.constants import JOB_STATUS
+
+# 已結束的任務狀態 (可被保留策略淘汰)
+TERMINAL_STATUSES = (JOB_STATUS['COMPLETED'], JOB_STATUS['FAILED'], JOB_STATUS['CANCELLED'])
+
+
+def job_timestamp(job: Dict[str, Any]) -> float:
+    """任務最後更新時間 (epoch 秒)"""
+    try:
+        return datetime.fromisoformat(job.get('updated_at') or job.get('created_at')).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def encode_cursor(created_at: str, job_id: str) -> str:
+    """分頁游標：最後一筆任務的 (created_at, id)，以 base64 編碼成不透明字串"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, job_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """解析分頁游標，格式錯誤時拋出 ValueError"""
+    try:
+        created_at, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(job_id)
+    except Exception:
+        raise ValueError(f"無效的分頁游標: {cursor}")
+
+
+class ReadWriteLock:
+    """讀寫鎖：多個讀取者可同時持有，寫入者獨占；有寫入者等待時新的讀取者會先讓路，避免寫入者餓死"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read_lock(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class DiskResultStore:
+    """將任務結果 (摘要、待辦事項、說話人對照等) 存放在磁碟，需要時才載入"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def put(self, job_id: str, result: Any):
+        tmp_path = f"{self._path(job_id)}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(job_id))
+
+    def get(self, job_id: str) -> Any:
+        try:
+            with open(self._path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, job_id: str):
+        try:
+            os.remove(self._path(job_id))
+        except OSError:
+            pass
+
+
+class RedisResultStore:
+    """將任務結果存放在獨立的 Redis key (job:<id>:result)，列出任務時不會一併讀取"""
+
+    def __init__(self, redis_client: redis.Redis, ttl_seconds: int = 7 * 24 * 3600):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job:{job_id}:result"
+
+    def put(self, job_id: str, result: Any):
+        self.redis.set(self._key(job_id), json.dumps(result, ensure_ascii=False),
+                       ex=self.ttl_seconds if self.ttl_seconds > 0 else None)
+
+    def get(self, job_id: str) -> Any:
+        raw = self.redis.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def delete(self, job_id: str):
+        self.redis.delete(self._key(job_id))
+
+
+class JobStore(ABC):
+    """任務狀態儲存介面
+
+    AudioProcessor 與 API 路由只透過此介面讀寫任務，
+    讓多個 gunicorn worker (或獨立的 worker 程序) 能共享同一份任務狀態。
+    任務結果 (result 欄位) 另存於 result store，get() 不會載入，需要時以 get_result() 讀取。
+    每次建立或更新任務都會取得一個單調遞增的版本號 (version 欄位)，讓客戶端只取得有變化的任務。
+    必要的方法皆為 abstractmethod，缺少實作的後端在建立時即會失敗。
+    """
+
+    results = None
+
+    def _store_result(self, job_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """將 result 欄位移到 result store，任務紀錄只保留 has_result 旗標"""
+        if 'result' in fields:
+            fields = dict(fields)
+            self.results.put(job_id, fields.pop('result'))
+            fields['has_result'] = True
+        return fields
+
+    def get_result(self, job_id: str) -> Any:
+        return self.results.get(job_id)
+
+    def evict(self, max_age_seconds: float = 0, max_count: int = 0) -> int:
+        """淘汰已結束的任務：超過保留秒數，或數量超過上限時由最舊的開始，回傳淘汰數量"""
+        now = datetime.now().timestamp()
+        finished = sorted(self.list_jobs(TERMINAL_STATUSES), key=job_timestamp, reverse=True)
+        expired = [job for index, job in enumerate(finished)
+                   if (max_age_seconds > 0 and now - job_timestamp(job) > max_age_seconds)
+                   or (max_count > 0 and index >= max_count)]
+        for job in expired:
+            self.delete(job['id'])
+        return len(expired)
+
+    def list_page(self, statuses: Optional[Iterable[str]] = None, cursor: Optional[str] = None,
+                  limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """依建立時間由新到舊分頁列出任務，回傳 (任務列表, 下一頁游標)；沒有下一頁時游標為 None
+
+        只排序輕量的 (created_at, id) 鍵，任務內容只讀取該頁需要的部分。
+        """
+        keys = sorted(self._sort_keys(statuses), reverse=True)
+        if cursor:
+            after = decode_cursor(cursor)
+            keys = [key for key in keys if key < after]
+        page_keys = keys[:limit]
+        jobs_by_id = self.get_many([job_id for _, job_id in page_keys])
+        jobs = [jobs_by_id[job_id] for _, job_id in page_keys if job_id in jobs_by_id]
+        next_cursor = encode_cursor(*page_keys[-1]) if len(keys) > limit else None
+        return jobs, next_cursor
+
+    def _sort_keys(self, statuses: Optional[Iterable[str]] = None) -> List[Tuple[str, str]]:
+        """回傳符合狀態的任務排序鍵 (created_at, id) (供預設的 list_page 使用，自行實作 list_page 的後端不需提供)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(self, job_data: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_many(self, job_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """以單一快照讀取多個任務，回傳 {job_id: 任務}；不存在的任務不會出現在結果中"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, job_id: str, **fields) -> bool:
+        """更新任務欄位並自動設定 updated_at；任務不存在時回傳 False"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_jobs(self, statuses: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """列出任務 (可依狀態過濾)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_by_status(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def job_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def mark_cancelled(self, job_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_cancelled(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def reserve_key(self, key: str, job_id: str, ttl_seconds: int) -> Optional[str]:
+        """原子地將 key (冪等鍵或任務指紋) 對應到 job_id；key 已被佔用時不覆寫，回傳原本對應的 job_id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_key(self, key: str, job_id: str, ttl_seconds: int):
+        """覆寫 key 對應的 job_id (原本的任務已不可沿用時)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_group(self, group_data: Dict[str, Any]):
+        """建立任務群組 (批次送出的一組任務)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_group(self, group_id: str, **fields) -> bool:
+        """更新任務群組欄位；群組不存在時回傳 False"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def current_version(self) -> int:
+        """目前最新的任務版本號"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def changes_since(self, version: int) -> List[Dict[str, Any]]:
+        """列出版本號大於 version 的任務 (即之後有變化的任務)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """等待任務版本號與 version 不同 (有新變化，或版本號已重新起算) 或逾時，回傳目前版本號"""
+        raise NotImplementedError
+
+
+class JobRecord:
+    """精簡的任務紀錄：常用欄位以 __slots__ 儲存，其他較少出現的欄位放在 extra"""
+
+    __slots__ = ('id', 'file_id', 'attachment_file_ids', 'user_id', 'status', 'progress',
+                 'message', 'created_at', 'updated_at', 'version', 'extra')
+    FIELDS = __slots__[:-1]
+
+    def __init__(self, data: Dict[str, Any]):
+        for field in self.FIELDS:
+            setattr(self, field, data.get(field))
+        self.extra = {key: value for key, value in data.items() if key not in self.FIELDS} or None
+
+    def update(self, fields: Dict[str, Any]):
+        for key, value in fields.items():
+            if key in self.FIELDS:
+                setattr(self, key, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class LocalJobStore(JobStore):
+    """以程序內 dict 儲存任務 (單一程序或測試使用)，任務結果存放在磁碟
+
+    每次狀態轉換時同步維護各狀態的索引 set，因此計數與依狀態列出任務只與該狀態的任務數有關；
+    讀取 (狀態查詢、列表) 與寫入 (進度更新) 以讀寫鎖分開，輪詢不會阻塞彼此。
+    changes 依版本號由舊到新排列，查詢變化時只需從尾端往回走到指定版本。
+    """
+
+    def __init__(self, result_dir: Optional[str] = None):
+        self.jobs: Dict[str, JobRecord] = {}
+        self.groups: Dict[str, Dict[str, Any]] = {}
+        # 冪等鍵 / 任務指紋 -> (job_id, 到期時間)
+        self.keys: Dict[str, Tuple[str, float]] = {}
+        self.status_index: Dict[str, set] = {status: set() for status in JOB_STATUS.values()}
+        self.cancelled_jobs = set()
+        self.lock = ReadWriteLock()
+        self.version = 0
+        self.changes: 'OrderedDict[str, int]' = OrderedDict()
+        self.changed = threading.Condition()
+        if result_dir is None:
+            # 程序內任務在重啟後即消失，預設的結果目錄也隨程序結束清除
+            result_dir = os.path.join(tempfile.gettempdir(), 'audio-processor-results', str(os.getpid()))
+            atexit.register(shutil.rmtree, result_dir, True)
+        self.results = DiskResultStore(result_dir)
+
+    def _index(self, job_id: str, old_status: Optional[str], new_status: Optional[str]):
+        """移動狀態索引 (需持有寫入鎖)"""
+        if old_status == new_status:
+            return
+        if old_status is not None:
+            self.status_index.get(old_status, set()).discard(job_id)
+        if new_status is not None:
+            self.status_index.setdefault(new_status, set()).add(job_id)
+
+    def _bump_version(self, job_id: str) -> int:
+        """遞增版本號並記錄任務的變化順序 (需持有寫入鎖)"""
+        self.version += 1
+        self.changes[job_id] = self.version
+        self.changes.move_to_end(job_id)
+        return self.version
+
+    def _notify_change(self):
+        with self.changed:
+            self.changed.notify_all()
+
+    def create(self, job_data: Dict[str, Any]):
+        job_data = self._store_result(job_data['id'], job_data)
+        with self.lock.write_lock():
+            old = self.jobs.get(job_data['id'])
+            record = JobRecord(job_data)
+            record.version = self._bump_version(record.id)
+            self.jobs[record.id] = record
+            self._index(record.id, old.status if old else None, record.status)
+        self._notify_change()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock.read_lock():
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def get_many(self, job_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        with self.lock.read_lock():
+            return {job_id: self.jobs[job_id].to_dict() for job_id in job_ids if job_id in self.jobs}
+
+    def update(self, job_id: str, **fields) -> bool:
+        fields.setdefault('updated_at', datetime.now().isoformat())
+        with self.lock.read_lock():
+            if job_id not in self.jobs:
+                return False
+        fields = self._store_result(job_id, fields)
+        with self.lock.write_lock():
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            old_status = job.status
+            job.update(fields)
+            job.version = self._bump_version(job_id)
+            self._index(job_id, old_status, job.status)
+        self._notify_change()
+        return True
+
+    def delete(self, job_id: str):
+        with self.lock.write_lock():
+            job = self.jobs.pop(job_id, None)
+            if job is not None:
+                self._index(job_id, job.status, None)
+                self._drop_finished_group((job.extra or {}).get('group_id'))
+            self.changes.pop(job_id, None)
+            self.cancelled_jobs.discard(job_id)
+        self.results.delete(job_id)
+
+    def exists(self, job_id: str) -> bool:
+        with self.lock.read_lock():
+            return job_id in self.jobs
+
+    def _matching_ids(self, statuses: Optional[Iterable[str]]) -> Iterable[str]:
+        """符合狀態的任務 ID (需持有讀取鎖)"""
+        if statuses is None:
+            return self.jobs.keys()
+        return [job_id for status in set(statuses) for job_id in self.status_index.get(status, ())]
+
+    def list_jobs(self, statuses: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        with self.lock.read_lock():
+            return [self.jobs[job_id].to_dict() for job_id in self._matching_ids(statuses)]
+
+    def _sort_keys(self, statuses: Optional[Iterable[str]] = None) -> List[Tuple[str, str]]:
+        with self.lock.read_lock():
+            return [(self.jobs[job_id].created_at or '', job_id) for job_id in self._matching_ids(statuses)]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self.lock.read_lock():
+            return {status: len(job_ids) for status, job_ids in self.status_index.items()}
+
+    def job_ids(self) -> List[str]:
+        with self.lock.read_lock():
+            return list(self.jobs.keys())
+
+    def mark_cancelled(self, job_id: str):
+        with self.lock.write_lock():
+            self.cancelled_jobs.add(job_id)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        return job_id in self.cancelled_jobs
+
+    def reserve_key(self, key: str, job_id: str, ttl_seconds: int) -> Optional[str]:
+        now = time.time()
+        with self.lock.write_lock():
+            current = self.keys.get(key)
+            if current and current[1] > now:
+                return current[0]
+            self.keys[key] = (job_id, now + ttl_seconds)
+            return None
+
+    def set_key(self, key: str, job_id: str, ttl_seconds: int):
+        with self.lock.write_lock():
+            self.keys[key] = (job_id, time.time() + ttl_seconds)
+
+    def evict(self, max_age_seconds: float = 0, max_count: int = 0) -> int:
+        """除了淘汰已結束的任務外，也清除已到期的冪等鍵與任務指紋"""
+        evicted = super().evict(max_age_seconds, max_count)
+        now = time.time()
+        with self.lock.write_lock():
+            for key in [key for key, (_, expires_at) in self.keys.items() if expires_at <= now]:
+                del self.keys[key]
+        return evicted
+
+    def _drop_finished_group(self, group_id: Optional[str]):
+        """群組內的任務都已刪除時一併移除群組 (需持有寫入鎖)"""
+        group = self.groups.get(group_id) if group_id else None
+        if group and not any(job_id in self.jobs for job_id in group.get('job_ids') or []):
+            del self.groups[group_id]
+
+    def create_group(self, group_data: Dict[str, Any]):
+        with self.lock.write_lock():
+            self.groups[group_data['id']] = dict(group_data)
+
+    def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock.read_lock():
+            group = self.groups.get(group_id)
+            return dict(group) if group else None
+
+    def update_group(self, group_id: str, **fields) -> bool:
+        with self.lock.write_lock():
+            if group_id not in self.groups:
+                return False
+            self.groups[group_id].update(fields)
+            return True
+
+    def current_version(self) -> int:
+        return self.version
+
+    def changes_since(self, version: int) -> List[Dict[str, Any]]:
+        with self.lock.read_lock():
+            changed = []
+            for job_id in reversed(self.changes):
+                if self.changes[job_id] <= version:
+                    break
+                changed.append(self.jobs[job_id].to_dict())
+            changed.reverse()
+            return changed
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+        return self.version
+
+
+class RedisJobStore(JobStore):
+    """以 Redis 儲存任務，供多個 worker 程序共享
+
+    - 每個任務一個 hash: job:<id>，欄位值以 JSON 編碼，設定 TTL
+    - 每個狀態一個索引 sorted set: jobs:by-status:<status>，score 為建立時間 (epoch 秒)；
+      建立任務與定期淘汰時清除 hash 已過期的 ID，計數不會隨過期任務無限增加
+    - 狀態更新以 Lua script 一次往返完成 (更新欄位、移動狀態索引、遞增版本號、刷新 TTL)
+    - 版本號計數器 jobs:version，各任務最新版本號記錄於 sorted set: jobs:versions；
+      每個程序只有一個執行緒輪詢版本號計數器，再通知所有等待變化的連線
+    - 任務群組一個 hash: jobgroup:<id>，與任務相同的 TTL
+    - 冪等鍵與任務指紋: jobkey:<key> -> job_id (SET NX，帶 TTL)
+    """
+
+    KEY_PREFIX = 'job:'
+    GROUP_PREFIX = 'jobgroup:'
+    RESERVED_PREFIX = 'jobkey:'
+    STATUS_PREFIX = 'jobs:by-status:'
+    # 舊版以 set 儲存的狀態索引，啟動時轉換為 sorted set
+    LEGACY_STATUS_PREFIX = 'jobs:status:'
+    # 每次清除過期索引時每個狀態最多檢查的 ID 數
+    PRUNE_BATCH = 500
+    CANCELLED_KEY = 'jobs:cancelled'
+    VERSION_KEY = 'jobs:version'
+    VERSIONS_KEY = 'jobs:versions'
+
+    # KEYS[1]=任務 hash, KEYS[2]=狀態索引前綴, KEYS[3]=版本號計數器, KEYS[4]=任務版本 sorted set
+    # ARGV[1]=job_id, ARGV[2]=新狀態 ('' 表示不變), ARGV[3]=TTL 秒數, ARGV[4..]=欄位/值
+    UPDATE_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+    if ARGV[2] ~= '' then
+        local old = redis.call('HGET', KEYS[1], 'status')
+        local score = 0
+        if old then
+            local old_key = KEYS[2] .. cjson.decode(old)
+            score = redis.call('ZSCORE', old_key, ARGV[1]) or 0
+            redis.call('ZREM', old_key, ARGV[1])
+        end
+        redis.call('ZADD', KEYS[2] .. ARGV[2], score, ARGV[1])
+    end
+    local version = redis.call('INCR', KEYS[3])
+    redis.call('HSET', KEYS[1], 'version', version, unpack(ARGV, 4))
+    redis.call('ZADD', KEYS[4], version, ARGV[1])
+    if tonumber(ARGV[3]) > 0 then redis.call('EXPIRE', KEYS[1], ARGV[3]) end
+    return version
+    """
+
+    # KEYS=各狀態索引；ARGV[1]=建立時間上限 (早於此時間建立的任務才可能已過期), ARGV[2]=任務 hash 前綴, ARGV[3]=每個狀態最多檢查的 ID 數
+    PRUNE_SCRIPT = """
+    local removed = 0
+    for _, key in ipairs(KEYS) do
+        local ids = redis.call('ZRANGEBYSCORE', key, '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+        for _, id in ipairs(ids) do
+            if redis.call('EXISTS', ARGV[2] .. id) == 0 then
+                redis.call('ZREM', key, id)
+                removed = removed + 1
+            end
+        end
+    end
+    return removed
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl_seconds: int = 7 * 24 * 3600,
+                 version_poll_interval: float = 0.5):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        # 其他程序的更新無法直接通知，有連線等待變化時由共用的輪詢執行緒以此間隔查詢版本號計數器
+        self.version_poll_interval = version_poll_interval
+        self.version_changed = threading.Condition()
+        self.latest_version = 0
+        self.version_waiters = 0
+        self.version_poller: Optional[threading.Thread] = None
+        self.results = RedisResultStore(redis_client, ttl_seconds)
+        self._update_script = self.redis.register_script(self.UPDATE_SCRIPT)
+        self._prune_script = self.redis.register_script(self.PRUNE_SCRIPT)
+        self._migrate_legacy_index()
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.KEY_PREFIX}{job_id}"
+
+    def _status_key(self, status: str) -> str:
+        return f"{self.STATUS_PREFIX}{status}"
+
+    @staticmethod
+    def _created_score(created_at: Optional[str]) -> float:
+        """狀態索引的 score：建立時間 (epoch 秒)"""
+        try:
+            return datetime.fromisoformat(created_at).timestamp()
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _migrate_legacy_index(self):
+        """將舊版的 set 狀態索引轉換為以建立時間為 score 的 sorted set"""
+        for status in JOB_STATUS.values():
+            legacy_key = f"{self.LEGACY_STATUS_PREFIX}{status}"
+            if self.redis.type(legacy_key) != 'set':
+                continue
+            job_ids = list(self.redis.smembers(legacy_key))
+            pipe = self.redis.pipeline(transaction=False)
+            for job_id in job_ids:
+                pipe.hget(self._key(job_id), 'created_at')
+            scores = {job_id: self._created_score(json.loads(raw))
+                      for job_id, raw in zip(job_ids, pipe.execute()) if raw}
+            pipe = self.redis.pipeline(transaction=True)
+            if scores:
+                pipe.zadd(self._status_key(status), scores)
+            pipe.delete(legacy_key)
+            pipe.execute()
+            logging.info(f"🔄 已轉換狀態索引 {status} ({len(scores)} 個任務)")
+
+    def prune_index(self) -> int:
+        """從狀態索引移除 hash 已因 TTL 過期的任務，回傳移除數量"""
+        if self.ttl_seconds <= 0:
+            return 0
+        return int(self._prune_script(
+            keys=[self._status_key(status) for status in JOB_STATUS.values()],
+            args=[time.time() - self.ttl_seconds, self.KEY_PREFIX, self.PRUNE_BATCH]
+        ))
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        return {key: json.dumps(value, ensure_ascii=False) for key, value in fields.items()}
+
+    @staticmethod
+    def _decode(raw: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        if not raw:
+            return None
+        return {key: json.loads(value) for key, value in raw.items()}
+
+    def create(self, job_data: Dict[str, Any]):
+        job_id = job_data['id']
+        job_data = self._store_result(job_id, job_data)
+        version = self.redis.incr(self.VERSION_KEY)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(self._key(job_id), mapping=self._encode({**job_data, 'version': version}))
+        if self.ttl_seconds > 0:
+            pipe.expire(self._key(job_id), self.ttl_seconds)
+        pipe.zadd(self._status_key(job_data['status']), {job_id: self._created_score(job_data.get('created_at'))})
+        pipe.zadd(self.VERSIONS_KEY, {job_id: version})
+        pipe.execute()
+        self.prune_index()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._decode(self.redis.hgetall(self._key(job_id)))
+
+    def update(self, job_id: str, **fields) -> bool:
+        fields.setdefault('updated_at', datetime.now().isoformat())
+        fields = self._store_result(job_id, fields)
+        args = [job_id, fields.get('status', ''), self.ttl_seconds]
+        for key, value in self._encode(fields).items():
+            args.extend([key, value])
+        return bool(self._update_script(
+            keys=[self._key(job_id), self.STATUS_PREFIX, self.VERSION_KEY, self.VERSIONS_KEY], args=args
+        ))
+
+    def delete(self, job_id: str):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(self._key(job_id))
+        for status in JOB_STATUS.values():
+            pipe.zrem(self._status_key(status), job_id)
+        pipe.srem(self.CANCELLED_KEY, job_id)
+        pipe.zrem(self.VERSIONS_KEY, job_id)
+        pipe.delete(RedisResultStore._key(job_id))
+        pipe.execute()
+
+    def exists(self, job_id: str) -> bool:
+        return bool(self.redis.exists(self._key(job_id)))
+
+    def _get_many(self, job_ids: List[str], snapshot: bool = False) -> List[Dict[str, Any]]:
+        # snapshot=True 時以 MULTI/EXEC 執行，所有任務讀取自同一個時間點
+        pipe = self.redis.pipeline(transaction=snapshot)
+        for job_id in job_ids:
+            pipe.hgetall(self._key(job_id))
+        return [self._decode(raw) for raw in pipe.execute()]
+
+    def get_many(self, job_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        job_ids = list(dict.fromkeys(job_ids))
+        if not job_ids:
+            return {}
+        return {job_id: job for job_id, job in zip(job_ids, self._get_many(job_ids, snapshot=True)) if job}
+
+    def list_page(self, statuses: Optional[Iterable[str]] = None, cursor: Optional[str] = None,
+                  limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """依建立時間由新到舊分頁列出任務
+
+        直接從各狀態的 sorted set 以 ZREVRANGEBYSCORE 讀取游標之後的 limit + 1 筆再合併，
+        每頁的成本只與頁面大小 (與狀態數) 有關，不需讀取所有任務。
+        """
+        statuses = list(dict.fromkeys(statuses)) if statuses is not None else list(JOB_STATUS.values())
+        after = decode_cursor(cursor) if cursor else None
+        max_score = self._created_score(after[0]) if after else None
+
+        pipe = self.redis.pipeline(transaction=False)
+        for status in statuses:
+            key = self._status_key(status)
+            if after:
+                # 與游標同一時間建立的任務另外讀取，依 ID 判斷是否在游標之後
+                pipe.zrevrangebyscore(key, max_score, max_score, withscores=True)
+                pipe.zrevrangebyscore(key, f"({max_score}", '-inf', start=0, num=limit + 1, withscores=True)
+            else:
+                pipe.zrevrangebyscore(key, '+inf', '-inf', start=0, num=limit + 1, withscores=True)
+        results = pipe.execute()
+
+        candidates = []
+        for index, status in enumerate(statuses):
+            if after:
+                ties, rest = results[2 * index], results[2 * index + 1]
+                members = [(job_id, score) for job_id, score in ties if job_id < after[1]] + rest
+            else:
+                members = results[index]
+            candidates.extend((score, job_id, status) for job_id, score in members)
+        candidates.sort(reverse=True)
+        page = candidates[:limit]
+
+        jobs_by_id = self.get_many([job_id for _, job_id, _ in page])
+        expired = [(status, job_id) for _, job_id, status in page if job_id not in jobs_by_id]
+        if expired:
+            # 任務已因 TTL 過期，順便清除索引
+            pipe = self.redis.pipeline(transaction=False)
+            for status, job_id in expired:
+                pipe.zrem(self._status_key(status), job_id)
+            pipe.execute()
+
+        next_cursor = None
+        if len(candidates) > limit:
+            last_score, last_id, _ = page[-1]
+            last_job = jobs_by_id.get(last_id)
+            created_at = last_job.get('created_at') if last_job else None
+            next_cursor = encode_cursor(created_at or datetime.fromtimestamp(last_score).isoformat(), last_id)
+        return [jobs_by_id[job_id] for _, job_id, _ in page if job_id in jobs_by_id], next_cursor
+
+    def list_jobs(self, statuses: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        statuses = list(statuses) if statuses is not None else list(JOB_STATUS.values())
+        pipe = self.redis.pipeline(transaction=False)
+        for status in statuses:
+            pipe.zrange(self._status_key(status), 0, -1)
+        indexed = [(status, job_id) for status, members in zip(statuses, pipe.execute()) for job_id in members]
+
+        jobs = []
+        expired = []
+        for (status, job_id), job in zip(indexed, self._get_many([job_id for _, job_id in indexed])):
+            if job is None:
+                # 任務已因 TTL 過期，順便清除索引
+                expired.append((status, job_id))
+            else:
+                jobs.append(job)
+        if expired:
+            pipe = self.redis.pipeline(transaction=False)
+            for status, job_id in expired:
+                pipe.zrem(self._status_key(status), job_id)
+            pipe.execute()
+        return jobs
+
+    def count_by_status(self) -> Dict[str, int]:
+        statuses = list(JOB_STATUS.values())
+        pipe = self.redis.pipeline(transaction=False)
+        for status in statuses:
+            pipe.zcard(self._status_key(status))
+        return dict(zip(statuses, pipe.execute()))
+
+    def job_ids(self, statuses: Optional[Iterable[str]] = None) -> List[str]:
+        pipe = self.redis.pipeline(transaction=False)
+        for status in (statuses if statuses is not None else JOB_STATUS.values()):
+            pipe.zrange(self._status_key(status), 0, -1)
+        return [job_id for members in pipe.execute() for job_id in members]
+
+    def mark_cancelled(self, job_id: str):
+        self.redis.sadd(self.CANCELLED_KEY, job_id)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        return bool(self.redis.sismember(self.CANCELLED_KEY, job_id))
+
+    def reserve_key(self, key: str, job_id: str, ttl_seconds: int) -> Optional[str]:
+        redis_key = f"{self.RESERVED_PREFIX}{key}"
+        while True:
+            if self.redis.set(redis_key, job_id, nx=True, ex=ttl_seconds):
+                return None
+            current = self.redis.get(redis_key)
+            if current is not None:
+                return current
+            # key 剛好在兩次呼叫之間到期，重試
+
+    def set_key(self, key: str, job_id: str, ttl_seconds: int):
+        self.redis.set(f"{self.RESERVED_PREFIX}{key}", job_id, ex=ttl_seconds)
+
+    def create_group(self, group_data: Dict[str, Any]):
+        key = f"{self.GROUP_PREFIX}{group_data['id']}"
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping=self._encode(group_data))
+        if self.ttl_seconds > 0:
+            pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
+        return self._decode(self.redis.hgetall(f"{self.GROUP_PREFIX}{group_id}"))
+
+    def update_group(self, group_id: str, **fields) -> bool:
+        key = f"{self.GROUP_PREFIX}{group_id}"
+        if not self.redis.exists(key):
+            return False
+        self.redis.hset(key, mapping=self._encode(fields))
+        return True
+
+    def current_version(self) -> int:
+        return int(self.redis.get(self.VERSION_KEY) or 0)
+
+    def changes_since(self, version: int) -> List[Dict[str, Any]]:
+        job_ids = self.redis.zrangebyscore(self.VERSIONS_KEY, f"({version}", '+inf')
+        jobs = self.get_many(job_ids)
+        expired = [job_id for job_id in job_ids if job_id not in jobs]
+        if expired:
+            # 任務已因 TTL 過期，順便清除版本紀錄
+            self.redis.zrem(self.VERSIONS_KEY, *expired)
+        return [jobs[job_id] for job_id in job_ids if job_id in jobs]
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        with self.version_changed:
+            if self.version_poller is None:
+                # 沒有輪詢執行緒時先讀取一次，避免以過時的版本號判斷
+                self.latest_version = self.current_version()
+                self.version_poller = threading.Thread(target=self._poll_version, daemon=True,
+                                                       name='job-version-poller')
+                self.version_poller.start()
+            self.version_waiters += 1
+            try:
+                self.version_changed.wait_for(lambda: self.latest_version != version, timeout)
+                return self.latest_version
+            finally:
+                self.version_waiters -= 1
+
+    def _poll_version(self):
+        """共用的版本號輪詢執行緒：版本號改變時通知所有等待中的連線，沒有等待者時結束"""
+        while True:
+            time.sleep(self.version_poll_interval)
+            try:
+                current = self.current_version()
+            except redis.RedisError as e:
+                logging.warning(f"⚠️ 查詢任務版本號失敗: {e}")
+                current = None
+            with self.version_changed:
+                if current is not None and current != self.latest_version:
+                    self.latest_version = current
+                    self.version_changed.notify_all()
+                if self.version_waiters == 0:
+                    self.version_poller = None
+                    return
+
+    def evict(self, max_age_seconds: float = 0, max_count: int = 0) -> int:
+        """除了淘汰已結束的任務外，也清除已過期 (TTL) 任務遺留的狀態索引與取消旗標"""
+        self.prune_index()
+        evicted = super().evict(max_age_seconds, max_count)
+        cancelled = list(self.redis.smembers(self.CANCELLED_KEY))
+        if cancelled:
+            pipe = self.redis.pipeline(transaction=False)
+            for job_id in cancelled:
+                pipe.exists(self._key(job_id))
+            stale = [job_id for job_id, exists in zip(cancelled, pipe.execute()) if not exists]
+            if stale:
+                self.redis.srem(self.CANCELLED_KEY, *stale)
+        return evicted
+
+
+def create_redis_client() -> redis.Redis:
+    """依環境變數建立 Redis 連線 (與 CredentialManager 相同設定)"""
+    return redis.Redis(
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=int(os.getenv('REDIS_PORT', 6379)),
+        db=int(os.getenv('REDIS_DB', 0)),
+        decode_responses=True,
+        socket_connect_timeout=5,
+        socket_timeout=5
+    )
+
+
+def create_job_store() -> JobStore:
+    """依 JOB_STORE_BACKEND 建立任務儲存 (redis / local / auto)"""
+    backend = os.getenv('JOB_STORE_BACKEND', 'auto').lower()
+    result_dir = os.getenv('JOB_RESULT_DIR') or None
+    if backend == 'local':
+        logging.info("✅ 使用程序內任務儲存")
+        return LocalJobStore(result_dir)
+
+    try:
+        client = create_redis_client()
+        client.ping()
+        logging.info("✅ 使用 Redis 任務儲存")
+        return RedisJobStore(client, ttl_seconds=int(os.getenv('JOB_TTL_SECONDS', 7 * 24 * 3600)))
+    except Exception as e:
+        if backend == 'redis':
+            raise
+        logging.warning(f"⚠️ Redis 無法連線，改用程序內任務儲存 (多個 worker 之間不會共享任務): {e}")
+        return LocalJobStore(result_dir)
@@ -0,0 +1,194 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class MediaCache:
+    """以 Drive fileId + 版本 (md5Checksum / modifiedTime) 為鍵的本機媒體快取
+
+    - 超過容量上限時以 LRU 淘汰
+    - 寫入先落地為暫存檔再以 os.replace 原子性地放入快取
+    - 讀取端透過 hard link (或複製) 取得自己的檔案，淘汰不會影響正在使用的讀取端
+    - 快取目錄可由多個程序 (gunicorn workers、queue workers) 共用：查詢以磁碟上的檔案為準，
+      淘汰前重新掃描目錄，因此容量上限是整個快取目錄的上限；使用時間記錄在檔案的 mtime
+    """
+
+    # 暫存檔超過此秒數未更新才視為殘留 (其他程序可能仍在寫入)
+    TEMP_GRACE_SECONDS = 6 * 3600
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> 檔案大小，依最近使用排序
+        self.total_bytes = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bytes_saved': 0,
+            'bytes_written': 0,
+            'evictions': 0
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(file_id: str, md5_checksum: Optional[str] = None, modified_time: Optional[str] = None) -> Optional[str]:
+        """產生快取鍵；沒有任何版本資訊時不快取 (無法判斷內容是否變更)"""
+        version = md5_checksum or modified_time
+        if not file_id or not version:
+            return None
+        return hashlib.sha256(f"{file_id}:{version}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _scan(self, remove_stale_temp: bool = False):
+        """掃描快取目錄，依最後使用時間 (mtime) 重建 LRU 順序 (需持有 lock 或於初始化時呼叫)"""
+        found = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.startswith('.tmp-'):
+                if remove_stale_temp and now - stat.st_mtime > self.TEMP_GRACE_SECONDS:
+                    self.discard(path)
+                continue
+            if os.path.isfile(path):
+                found.append((stat.st_mtime, name, stat.st_size))
+        self.entries.clear()
+        self.total_bytes = 0
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    def _load_index(self):
+        """啟動時載入快取目錄並清除殘留的暫存檔"""
+        self._scan(remove_stale_temp=True)
+        if self.entries:
+            logging.info(f"✅ 媒體快取已載入 {len(self.entries)} 個檔案 ({self.total_bytes} bytes)")
+
+    def materialize(self, key: Optional[str], dest_path: str) -> bool:
+        """快取命中時將檔案放到 dest_path 並回傳 True"""
+        if not key or not self.enabled:
+            return False
+
+        path = self._path(key)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous
+            try:
+                # 以磁碟為準：其他程序寫入的檔案同樣命中，已被其他程序淘汰的檔案視為未命中
+                size = os.path.getsize(path)
+                self._link_or_copy(path, dest_path)
+            except FileNotFoundError:
+                self.stats['misses'] += 1
+                return False
+            self.entries[key] = size
+            self.total_bytes += size
+            self.stats['hits'] += 1
+            self.stats['bytes_saved'] += size
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        logging.info(f"✅ 媒體快取命中: {os.path.basename(dest_path)} ({size} bytes)")
+        return True
+
+    def new_temp_path(self) -> str:
+        """在快取目錄中建立暫存檔路徑 (與快取位於同一檔案系統，確保可原子性地 rename)"""
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.cache_dir)
+        os.close(fd)
+        return tmp_path
+
+    def commit(self, tmp_path: str, key: Optional[str]):
+        """將已寫完的暫存檔原子性地放入快取 (寫入快取失敗只記錄警告，不影響呼叫端)"""
+        if not key or not self.enabled:
+            self.discard(tmp_path)
+            return
+        try:
+            size = os.path.getsize(tmp_path)
+            if size > self.max_bytes:
+                self.discard(tmp_path)
+                return
+
+            with self.lock:
+                os.replace(tmp_path, self._path(key))
+                previous = self.entries.pop(key, None)
+                if previous is not None:
+                    self.total_bytes -= previous
+                self.entries[key] = size
+                self.total_bytes += size
+                self.stats['bytes_written'] += size
+                self._evict()
+        except OSError as e:
+            logging.warning(f"⚠️ 寫入媒體快取失敗: {e}")
+            self.discard(tmp_path)
+
+    def discard(self, tmp_path: str):
+        if not tmp_path:
+            return
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def put(self, src_path: str, key: Optional[str]):
+        """將已下載的檔案加入快取 (src_path 保持不變)"""
+        if not key or not self.enabled:
+            return
+        try:
+            tmp_path = self.new_temp_path()
+            os.remove(tmp_path)
+            self._link_or_copy(src_path, tmp_path)
+            self.commit(tmp_path, key)
+        except OSError as e:
+            logging.warning(f"⚠️ 寫入媒體快取失敗: {e}")
+
+    def _evict(self):
+        """淘汰最久未使用的檔案直到低於容量上限 (需持有 lock)
+
+        先重新掃描目錄，將其他程序寫入或淘汰的檔案一併計入。
+        """
+        self._scan()
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.stats['evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            logging.info(f"🧹 媒體快取淘汰: {key[:12]}... ({size} bytes)")
+
+    @staticmethod
+    def _link_or_copy(src: str, dest: str):
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['total_bytes'] = self.total_bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,134 @@
+import json
+import struct
+import logging
+import subprocess
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# 容器型的 MP4 box，需要往內層搜尋
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+def iter_mp4_boxes(data: bytes, offset: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """逐一列出 MP4 box，回傳 (類型, 內容起點, box 終點)"""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def parse_mp4_moov(moov: bytes) -> Dict[str, Any]:
+    """從完整的 moov box 解析時長、取樣率與聲道數"""
+    info: Dict[str, Any] = {}
+
+    def walk(start: int, end: int, in_audio_track: bool = False):
+        for box_type, body, box_end in iter_mp4_boxes(moov, start, end):
+            if box_type == b'mvhd':
+                version = moov[body]
+                if version == 1:
+                    timescale, duration = struct.unpack('>IQ', moov[body + 20:body + 32])
+                else:
+                    timescale, duration = struct.unpack('>II', moov[body + 12:body + 20])
+                if timescale:
+                    info['duration_seconds'] = duration / timescale
+            elif box_type == b'trak':
+                # 先確認此 track 是否為音訊
+                is_audio = moov.find(b'hdlr', body, box_end) != -1 and moov.find(b'soun', body, box_end) != -1
+                walk(body, box_end, is_audio)
+            elif box_type in MP4_CONTAINER_BOXES:
+                walk(body, box_end, in_audio_track)
+            elif box_type == b'stsd' and in_audio_track and 'sample_rate' not in info:
+                # version/flags(4) + entry_count(4)，接著是第一個 sample entry
+                for codec, entry, _ in iter_mp4_boxes(moov, body + 8, box_end):
+                    info['codec'] = codec.decode('latin-1').strip()
+                    info['channels'] = struct.unpack('>H', moov[entry + 16:entry + 18])[0]
+                    info['sample_rate'] = struct.unpack('>I', moov[entry + 24:entry + 28])[0] >> 16
+                    break
+
+    walk(0, len(moov))
+    return info
+
+
+class MediaProbe:
+    """只讀取檔案標頭 (HTTP Range) 來取得音訊時長、取樣率與聲道數
+
+    fetch_range(start, end) 需回傳 [start, end] 的位元組 (含 end)。
+    """
+
+    def __init__(self, fetch_range: Callable[[int, int], bytes], head_bytes: int = 256 * 1024):
+        self.fetch_range = fetch_range
+        self.head_bytes = head_bytes
+
+    def probe(self, size: Optional[int] = None) -> Dict[str, Any]:
+        head = self.fetch_range(0, self.head_bytes - 1 if not size else min(self.head_bytes, size) - 1)
+        if head[4:8] == b'ftyp':
+            info = self._probe_mp4(head, size)
+            if info.get('duration_seconds'):
+                info['source'] = 'mp4_header'
+                return info
+        info = self._probe_ffprobe(head, size)
+        info['source'] = 'ffprobe_header'
+        return info
+
+    def _probe_mp4(self, head: bytes, size: Optional[int]) -> Dict[str, Any]:
+        """MP4/M4A：moov 位於檔頭時直接解析，否則依前一個 box (通常是 mdat) 的大小跳到 moov 再以 Range 讀取"""
+        offset = 0
+        while size is None or offset + 8 <= size:
+            if offset + 16 <= len(head):
+                header = head[offset:offset + 16]
+            else:
+                header_end = offset + 15 if size is None else min(offset + 15, size - 1)
+                header = self.fetch_range(offset, header_end)
+            if len(header) < 8:
+                break
+            box_size, box_type = struct.unpack('>I4s', header[:8])
+            header_len = 8
+            if box_size == 1 and len(header) >= 16:
+                box_size = struct.unpack('>Q', header[8:16])[0]
+                header_len = 16
+            if box_size < header_len:
+                # size == 0 表示延伸到檔尾，之後不會再有 moov
+                break
+            if box_type == b'moov':
+                body, box_end = offset + header_len, offset + box_size
+                moov = head[body:box_end] if box_end <= len(head) else self.fetch_range(body, box_end - 1)
+                return parse_mp4_moov(moov)
+            offset += box_size
+        return {}
+
+    def _probe_ffprobe(self, head: bytes, size: Optional[int]) -> Dict[str, Any]:
+        """其他格式：以 ffprobe 讀取標頭，時長不可得時以檔案大小 ÷ 位元率估算"""
+        try:
+            result = subprocess.run(
+                ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", "-i", "pipe:0"],
+                input=head, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30
+            )
+            probe = json.loads(result.stdout or b'{}')
+        except (OSError, subprocess.TimeoutExpired, ValueError) as e:
+            logging.warning(f"⚠️ ffprobe 解析標頭失敗: {e}")
+            return {}
+
+        info: Dict[str, Any] = {}
+        audio = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'audio'), None)
+        if audio:
+            info['codec'] = audio.get('codec_name')
+            info['channels'] = audio.get('channels')
+            if audio.get('sample_rate'):
+                info['sample_rate'] = int(audio['sample_rate'])
+
+        bit_rate = (audio or {}).get('bit_rate') or probe.get('format', {}).get('bit_rate')
+        if size and bit_rate:
+            # 標頭只含部分資料，ffprobe 回報的時長不可靠，改以大小與位元率估算
+            info['duration_seconds'] = size * 8 / float(bit_rate)
+            info['duration_estimated'] = True
+        return info
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台
+    fcntl = None
+
+
+class RangeNotSupportedError(RuntimeError):
+    """伺服器不支援 HTTP Range 請求"""
+
+
+@contextmanager
+def partial_download_lock(dest_path: str) -> Iterator[str]:
+    """以 dest_path.lock 的 flock 獨佔 dest_path 的未完成分段與續傳紀錄 (跨執行緒與程序)
+
+    同一檔案同時有多個任務下載時，後到者會等待先前的下載結束，避免多方寫入同一個 .part 與續傳紀錄。
+    """
+    fd = os.open(f"{dest_path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield dest_path
+    finally:
+        # 關閉檔案即釋放 flock；lock 檔保留，刪除會讓等待中的程序鎖在已不存在的檔案上
+        os.close(fd)
+
+
+class RangedDownloader:
+    """以多個 HTTP Range 分段並行下載大型檔案，支援斷點續傳
+
+    session 可為 requests.Session 或 google.auth.transport.requests.AuthorizedSession，
+    因此也能直接對本機提供 Range 的 HTTP 伺服器進行測試。
+    """
+
+    def __init__(self, session: requests.Session, part_size: int = 8 * 1024 * 1024,
+                 concurrency: int = 4, max_retries: int = 5, timeout: float = 60):
+        self.session = session
+        self.part_size = part_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def get_size(self, url: str) -> int:
+        """以 bytes=0-0 的 Range 請求取得檔案大小"""
+        response = self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout)
+        try:
+            response.raise_for_status()
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code != 206 or '/' not in content_range:
+                raise RangeNotSupportedError(f"伺服器未回傳 Content-Range (狀態碼 {response.status_code})")
+            return int(content_range.rsplit('/', 1)[1])
+        finally:
+            response.close()
+
+    def _parts(self, total_size: int) -> List[Tuple[int, int]]:
+        return [(start, min(start + self.part_size, total_size) - 1)
+                for start in range(0, total_size, self.part_size)]
+
+    def _fetch_part(self, url: str, start: int, end: int) -> bytes:
+        """下載單一分段，失敗時以指數退避重試"""
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                response = self.session.get(url, headers={'Range': f'bytes={start}-{end}'}, timeout=self.timeout)
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise RangeNotSupportedError(f"分段請求未回傳 206 (狀態碼 {response.status_code})")
+                data = response.content
+                if len(data) != end - start + 1:
+                    raise IOError(f"分段長度不符: 預期 {end - start + 1}，實際 {len(data)}")
+                return data
+            except RangeNotSupportedError:
+                raise
+            except (requests.exceptions.RequestException, IOError) as e:
+                last_error = e
+                logging.warning(f"⚠️ 分段 {start}-{end} 下載失敗 (嘗試 {attempt + 1}/{self.max_retries}): {e}")
+                if attempt + 1 < self.max_retries:
+                    time.sleep(min(2 ** attempt, 30))
+        raise last_error
+
+    def _report(self, progress_callback, started_at: float, downloaded: int, total_size: int,
+                parts_done: int, parts_total: int):
+        if not progress_callback:
+            return
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        progress_callback({
+            'downloaded_bytes': downloaded,
+            'total_bytes': total_size,
+            'parts_done': parts_done,
+            'parts_total': parts_total,
+            'throughput_bps': int(downloaded / elapsed),
+            'elapsed_seconds': round(elapsed, 2)
+        })
+
+    def _state_path(self, dest_path: str) -> str:
+        return f"{dest_path}.parts.json"
+
+    def _load_state(self, dest_path: str, total_size: int, version: Optional[str] = None) -> set:
+        """讀取已完成分段的紀錄 (大小、分段設定或檔案版本不同時視為無效)"""
+        state_path = self._state_path(dest_path)
+        if not os.path.exists(state_path) or not os.path.exists(f"{dest_path}.part"):
+            return set()
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+            if state.get('version') != version:
+                # 同一檔案已被置換 (md5Checksum / modifiedTime 不同)，舊分段不可混用
+                logging.info("🔄 續傳紀錄的檔案版本不符，將重新下載")
+            elif state.get('total_size') == total_size and state.get('part_size') == self.part_size:
+                return set(state.get('completed', []))
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ 無法讀取續傳紀錄，將重新下載: {e}")
+        return set()
+
+    def _save_state(self, dest_path: str, total_size: int, completed: set, version: Optional[str] = None):
+        state_path = self._state_path(dest_path)
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'total_size': total_size, 'part_size': self.part_size, 'version': version,
+                       'completed': sorted(completed)}, f)
+        os.replace(tmp_path, state_path)
+
+    def _open_partial(self, dest_path: str, total_size: int, parts: List[Tuple[int, int]],
+                      version: Optional[str]) -> Tuple[str, set]:
+        """準備 dest_path.part (預先配置大小，各分段直接寫入對應偏移量)，回傳 (路徑, 已完成的分段)"""
+        part_path = f"{dest_path}.part"
+        completed = self._load_state(dest_path, total_size, version)
+        if completed:
+            logging.info(f"🔄 從續傳紀錄恢復: 已完成 {len(completed)}/{len(parts)} 個分段")
+        with open(part_path, 'ab') as f:
+            f.truncate(total_size)
+        return part_path, completed
+
+    def discard_partial(self, dest_path: str):
+        """刪除 dest_path 的未完成分段與續傳紀錄"""
+        for path in (f"{dest_path}.part", self._state_path(dest_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def download(self, url: str, dest_path: str, total_size: Optional[int] = None,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 version: Optional[str] = None) -> str:
+        """並行下載至 dest_path；中斷後再次呼叫會從最後完成的分段續傳
+
+        version 為檔案版本 (如 md5Checksum)，與續傳紀錄不同時捨棄已下載的分段。
+        """
+        if total_size is None:
+            total_size = self.get_size(url)
+
+        parts = self._parts(total_size)
+        part_path, completed = self._open_partial(dest_path, total_size, parts, version)
+
+        state_lock = threading.Lock()
+        downloaded = sum(parts[i][1] - parts[i][0] + 1 for i in completed)
+        started_at = time.monotonic()
+        fd = os.open(part_path, os.O_RDWR)
+        try:
+            def fetch(index: int) -> int:
+                start, end = parts[index]
+                data = self._fetch_part(url, start, end)
+                os.pwrite(fd, data, start)
+                return index
+
+            pending = [i for i in range(len(parts)) if i not in completed]
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = [pool.submit(fetch, i) for i in pending]
+                try:
+                    for future in as_completed(futures):
+                        index = future.result()
+                        start, end = parts[index]
+                        with state_lock:
+                            completed.add(index)
+                            downloaded += end - start + 1
+                            self._save_state(dest_path, total_size, completed, version)
+                        self._report(progress_callback, started_at, downloaded, total_size, len(completed), len(parts))
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            os.close(fd)
+
+        os.replace(part_path, dest_path)
+        os.remove(self._state_path(dest_path))
+        logging.info(f"✅ 分段下載完成: {os.path.basename(dest_path)} ({total_size} bytes, {len(parts)} 個分段)")
+        return dest_path
+
+    def download_to_sink(self, url: str, sink, total_size: Optional[int] = None,
+                         progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         resume_path: Optional[str] = None, version: Optional[str] = None):
+        """並行下載並依序寫入 sink (需提供 write 方法)
+
+        同時在途的分段數量限制為 concurrency + 1，以控制記憶體用量。
+        指定 resume_path 時，已下載的分段同時寫入 resume_path.part 並記錄於續傳紀錄 (與 download 相同格式)：
+        失敗後再次呼叫時，已完成的分段直接從磁碟讀出餵給 sink，只下載其餘分段；
+        改用 download(resume_path) 也能沿用這些分段。全部完成後刪除暫存分段。
+        """
+        if total_size is None:
+            total_size = self.get_size(url)
+
+        parts = self._parts(total_size)
+        completed: set = set()
+        fd = None
+        if resume_path:
+            part_path, completed = self._open_partial(resume_path, total_size, parts, version)
+            fd = os.open(part_path, os.O_RDWR)
+        window = self.concurrency + 1
+        downloaded = 0
+        started_at = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = {}
+                next_to_submit = 0
+                try:
+                    for index in range(len(parts)):
+                        while next_to_submit < len(parts) and next_to_submit < index + window:
+                            if next_to_submit not in completed:
+                                futures[next_to_submit] = pool.submit(self._fetch_part, url, *parts[next_to_submit])
+                            next_to_submit += 1
+                        start, end = parts[index]
+                        if index in completed:
+                            data = os.pread(fd, end - start + 1, start)
+                        else:
+                            data = futures.pop(index).result()
+                            if fd is not None:
+                                os.pwrite(fd, data, start)
+                                completed.add(index)
+                                self._save_state(resume_path, total_size, completed, version)
+                        sink.write(data)
+                        downloaded += len(data)
+                        self._report(progress_callback, started_at, downloaded, total_size, index + 1, len(parts))
+                except Exception:
+                    for future in futures.values():
+                        future.cancel()
+                    raise
+        finally:
+            if fd is not None:
+                os.close(fd)
+        if resume_path:
+            self.discard_partial(resume_path)
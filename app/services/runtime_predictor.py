@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台
+    fcntl = None
+
+# 任務處理階段 (依執行順序)
+STAGES = ('download', 'transcription', 'analysis', 'publish')
+
+
+class StageStats:
+    """單一階段的線性迴歸累計量：耗時 = intercept + slope × 音檔秒數"""
+
+    FIELDS = ('n', 'sx', 'sy', 'sxx', 'sxy')
+
+    def __init__(self, data: Optional[Dict[str, float]] = None):
+        data = data or {}
+        for field in self.FIELDS:
+            setattr(self, field, float(data.get(field, 0)))
+
+    def add(self, x: float, y: float):
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+
+    def fit(self) -> Optional[Tuple[float, float]]:
+        """最小平方法求 (intercept, slope)；樣本不足或音檔長度幾乎相同時只估平均耗時 (斜率為 0)"""
+        if self.n <= 0:
+            return None
+        variance = self.n * self.sxx - self.sx * self.sx
+        if self.n < 2 or variance <= 1e-9 * max(1.0, self.n * self.sxx):
+            return self.sy / self.n, 0.0
+        slope = max(0.0, (self.n * self.sxy - self.sx * self.sy) / variance)
+        intercept = max(0.0, (self.sy - slope * self.sx) / self.n)
+        return intercept, slope
+
+    def to_dict(self) -> Dict[str, float]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class FileRuntimeBackend:
+    """將迴歸累計量存放在本機 JSON 檔 (同一主機的多個程序可共用)
+
+    多個程序 (gunicorn workers、queue worker) 寫入同一個檔案時，以 <path>.lock 的 flock 鎖定後
+    重新讀取檔案、加入新樣本再寫回，不會覆蓋其他程序學到的統計。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def add(self, keys, x: float, y: float):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.lock, open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            data = self._read()
+            for key in keys:
+                stats = StageStats(data.get(key))
+                stats.add(x, y)
+                data[key] = stats.to_dict()
+            # 暫存檔名帶程序 ID，避免多個程序同時寫入同一個暫存檔
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def load(self) -> Dict[str, Dict[str, float]]:
+        # 檔案以 os.replace 原子性地替換，讀取時不需鎖定
+        return self._read()
+
+
+class RedisRuntimeBackend:
+    """將迴歸累計量存放在 Redis (runtime:stats hash)，多台 worker 共用同一份模型；以 HINCRBYFLOAT 累加避免競爭"""
+
+    STATS_KEY = 'runtime:stats'
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    def add(self, keys, x: float, y: float):
+        increments = {'n': 1, 'sx': x, 'sy': y, 'sxx': x * x, 'sxy': x * y}
+        pipe = self.redis.pipeline(transaction=True)
+        for key in keys:
+            for field, value in increments.items():
+                pipe.hincrbyfloat(self.STATS_KEY, f"{key}|{field}", value)
+        pipe.execute()
+
+    def load(self) -> Dict[str, Dict[str, float]]:
+        data: Dict[str, Dict[str, float]] = {}
+        for name, value in self.redis.hgetall(self.STATS_KEY).items():
+            key, field = name.rsplit('|', 1)
+            data.setdefault(key, {})[field] = float(value)
+        return data
+
+
+class RuntimePredictor:
+    """依實際執行紀錄學習各處理階段的耗時 (對音檔秒數的線性迴歸)
+
+    模型依 (階段, 模型, 引擎, 主機) 分組；該主機樣本不足時改用所有主機合併的模型，
+    再不足時使用 priors 提供的預設值 (intercept, slope)。
+    """
+
+    def __init__(self, backend, priors: Dict[str, Tuple[float, float]], context: Dict[str, str],
+                 min_samples: int = 3, refresh_interval: float = 60):
+        self.backend = backend
+        self.priors = priors
+        self.context = context
+        self.min_samples = min_samples
+        self.refresh_interval = refresh_interval
+        self._cache: Dict[str, Dict[str, float]] = {}
+        self._cache_at = 0.0
+
+    def _keys(self, stage: str) -> Tuple[str, str]:
+        """(此主機的分組 key, 所有主機合併的分組 key)"""
+        base = f"{stage}|{self.context.get('model', '')}|{self.context.get('engine', '')}"
+        return f"{base}|{self.context.get('host', '')}", f"{base}|*"
+
+    def record(self, stage: str, audio_seconds: Optional[float], duration: float):
+        """記錄一次階段耗時"""
+        try:
+            self.backend.add(self._keys(stage), float(audio_seconds or 0), float(duration))
+            self._cache_at = 0.0
+        except Exception as e:
+            logging.warning(f"⚠️ 記錄階段耗時失敗 ({stage}): {e}")
+
+    def _stats(self) -> Dict[str, Dict[str, float]]:
+        if time.time() - self._cache_at >= self.refresh_interval:
+            try:
+                self._cache = self.backend.load()
+            except Exception as e:
+                logging.warning(f"⚠️ 讀取耗時模型失敗: {e}")
+            self._cache_at = time.time()
+        return self._cache
+
+    def coefficients(self, stage: str) -> Tuple[Tuple[float, float], str]:
+        """回傳 ((intercept, slope), 來源)；來源為 host / global / prior"""
+        stats = self._stats()
+        for key, source in zip(self._keys(stage), ('host', 'global')):
+            stage_stats = StageStats(stats.get(key))
+            if stage_stats.n >= self.min_samples:
+                return stage_stats.fit(), source
+        return self.priors[stage], 'prior'
+
+    def predict(self, audio_seconds: Optional[float]) -> Dict[str, Any]:
+        """預測各階段與總耗時 (秒)"""
+        audio_seconds = audio_seconds or 0
+        stages = {}
+        sources = {}
+        for stage in STAGES:
+            (intercept, slope), source = self.coefficients(stage)
+            stages[stage] = round(intercept + slope * audio_seconds, 1)
+            sources[stage] = source
+        return {
+            'stages': stages,
+            'sources': sources,
+            'total_seconds': round(sum(stages.values()), 1)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        result = {}
+        for stage in STAGES:
+            (intercept, slope), source = self.coefficients(stage)
+            result[stage] = {'intercept': round(intercept, 2), 'slope': round(slope, 4), 'source': source}
+        return {'context': self.context, 'stages': result}
+
+
+def estimate_progress(stage_plan: Dict[str, float], stage: Optional[str], stage_elapsed: float) -> Tuple[float, float]:
+    """依各階段預測耗時與目前階段已經過的秒數，估算 (時間進度 0-100, 剩餘秒數)
+
+    目前階段的經過時間超過預測時視為接近完成 (最多 95%)，剩餘秒數只計算之後的階段。
+    """
+    total = sum(stage_plan.values())
+    if total <= 0 or stage not in stage_plan:
+        return 0.0, total
+    index = STAGES.index(stage) if stage in STAGES else 0
+    done = sum(stage_plan.get(s, 0) for s in STAGES[:index])
+    current = stage_plan[stage]
+    in_stage = min(stage_elapsed, current * 0.95) if current > 0 else 0
+    progress = (done + in_stage) / total * 100
+    remaining = (total - done - current) + max(0.0, current - stage_elapsed)
+    return round(min(progress, 99.0), 1), round(remaining, 1)
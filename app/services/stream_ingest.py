@@ -0,0 +1,166 @@
+import os
+import struct
+import logging
+import threading
+import subprocess
+from typing import Optional
+
+import soundfile as sf
+
+
+def is_pipe_decodable(head: bytes) -> bool:
+    """判斷檔案開頭是否可直接由 ffmpeg 從 stdin 解碼
+
+    MP4/M4A 若 moov box 位於 mdat 之後 (多數手機錄音檔)，ffmpeg 無法在不可 seek 的管線上解碼，
+    此時必須先落地成檔案。其他容器格式 (mp3, wav, ogg, flac...) 皆可串流解碼。
+    """
+    if len(head) < 8 or head[4:8] != b'ftyp':
+        return True
+
+    offset = 0
+    while offset + 8 <= len(head):
+        box_size, box_type = struct.unpack('>I4s', head[offset:offset + 8])
+        if box_type == b'moov':
+            return True
+        if box_type == b'mdat':
+            return False
+        if box_size == 1:
+            # 64-bit 長度
+            if offset + 16 > len(head):
+                break
+            box_size = struct.unpack('>Q', head[offset + 8:offset + 16])[0]
+        if box_size < 8:
+            break
+        offset += box_size
+
+    # 第一個區塊內找不到 moov，保守地視為不可串流
+    return False
+
+
+class StreamingDecoder:
+    """將下載中的位元組餵入 ffmpeg stdin，並把 stdout 的 PCM 即時寫入 WAV"""
+
+    def __init__(self, output_path: str, sample_rate: int = 16000, read_size: int = 64 * 1024):
+        self.output_path = output_path
+        self.sample_rate = sample_rate
+        self.read_size = read_size
+        self.process = None
+        self.bytes_in = 0
+        self.bytes_decoded = 0
+        self._reader = None
+        self._stderr_reader = None
+        self._stderr = b""
+        self._reader_error = None
+
+    def start(self):
+        """啟動 ffmpeg 與 PCM 讀取執行緒"""
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-i", "pipe:0",       # 從 stdin 讀取
+            "-f", "s16le",        # 原始 PCM 輸出
+            "-ar", str(self.sample_rate),
+            "-ac", "1",
+            "-c:a", "pcm_s16le",
+            "pipe:1"
+        ]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._reader = threading.Thread(target=self._read_pcm, daemon=True)
+        self._stderr_reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._reader.start()
+        self._stderr_reader.start()
+
+    def _read_pcm(self):
+        try:
+            with sf.SoundFile(self.output_path, mode='w', samplerate=self.sample_rate,
+                              channels=1, subtype='PCM_16', format='WAV') as wav:
+                while True:
+                    data = self.process.stdout.read(self.read_size)
+                    if not data:
+                        break
+                    # 確保以完整樣本寫入 (每樣本 2 bytes)
+                    if len(data) % 2:
+                        data += self.process.stdout.read(1)
+                    wav.buffer_write(data, dtype='int16')
+                    self.bytes_decoded += len(data)
+        except Exception as e:
+            self._reader_error = e
+
+    def _read_stderr(self):
+        self._stderr = self.process.stderr.read()
+
+    def write(self, data: bytes) -> int:
+        """寫入一段下載的資料到 ffmpeg"""
+        self.process.stdin.write(data)
+        self.bytes_in += len(data)
+        return len(data)
+
+    def finish(self) -> str:
+        """結束輸入並等待解碼完成，回傳 WAV 路徑"""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        return_code = self.process.wait()
+        self._reader.join()
+        self._stderr_reader.join()
+
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg 串流解碼失敗 (exit {return_code}): {self._stderr.decode(errors='ignore').strip()}")
+        if self._reader_error:
+            raise self._reader_error
+        if self.bytes_decoded == 0:
+            raise RuntimeError("ffmpeg 串流解碼沒有輸出任何音訊")
+        return self.output_path
+
+    def abort(self):
+        """中止解碼並清理輸出"""
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        for thread in (self._reader, self._stderr_reader):
+            if thread:
+                thread.join(timeout=5)
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+
+class StreamingIngestSink:
+    """MediaIoBaseDownload 的寫入端：依第一個區塊決定串流解碼或先落地成檔案
+
+    串流模式下可另外提供 tee_path，將原始位元組同步寫入 (例如媒體快取的暫存檔)。
+    """
+
+    def __init__(self, decoder: StreamingDecoder, spool_path: str, tee_path: Optional[str] = None):
+        self.decoder = decoder
+        self.spool_path = spool_path
+        self.tee_path = tee_path
+        self.mode: Optional[str] = None  # 'stream' 或 'spool'
+        self._spool_file = None
+        self._tee_file = None
+
+    def write(self, data: bytes) -> int:
+        if self.mode is None:
+            if is_pipe_decodable(data):
+                self.mode = 'stream'
+                self.decoder.start()
+                if self.tee_path:
+                    self._tee_file = open(self.tee_path, 'wb')
+            else:
+                self.mode = 'spool'
+                logging.info("- 檔案無法串流解碼 (moov 位於檔尾)，改為先寫入暫存檔")
+                self._spool_file = open(self.spool_path, 'wb')
+
+        if self.mode == 'stream':
+            if self._tee_file:
+                self._tee_file.write(data)
+            return self.decoder.write(data)
+        return self._spool_file.write(data)
+
+    def close(self):
+        for f in (self._spool_file, self._tee_file):
+            if f:
+                f.close()
+        self._spool_file = None
+        self._tee_file = None
@@ -0,0 +1,308 @@
+import os
+import json
+import shutil
+import uuid
+import socket
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台
+    fcntl = None
+
+
+class WorkspaceWaitCancelled(Exception):
+    """等待磁碟空間期間任務被取消"""
+
+
+class JobWorkspace:
+    """單一任務的工作目錄樹"""
+
+    def __init__(self, job_id: str, path: str, reserved_bytes: int):
+        self.job_id = job_id
+        self.path = path
+        self.reserved_bytes = reserved_bytes
+        self.used_bytes = 0
+        self.prefetch = False
+
+    def subdir(self, name: str) -> str:
+        """取得 (並建立) 工作目錄下的子目錄"""
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def measure(self) -> int:
+        """計算目前工作目錄實際使用的位元組數"""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        self.used_bytes = total
+        return total
+
+
+class WorkspaceManager:
+    """為每個任務配置獨立工作目錄，並以全域磁碟預算控制任務的開始時機
+
+    每個程序使用 <root>/<hostname>-<pid>-<啟動時間> 作為自己的根目錄；啟動時會清除同一主機上
+    已結束程序遺留的目錄，確保重新啟動後不會殘留暫存檔。加上啟動時間是因為容器重新啟動後
+    程序常拿到與先前相同的 PID，只比對 PID 會把已結束程序的目錄誤認為仍在使用。
+
+    磁碟預算由共用同一個 root 的所有程序 (gunicorn workers、queue workers) 共同計算：
+    各程序的保留量記錄在 <root>/.reservations.json，以 flock 鎖定後讀寫。
+
+    預先下載 (prefetch) 的任務另受 prefetch_budget_bytes 與可用記憶體下限限制 (每個程序各自計算)，
+    進入轉錄階段後呼叫 promote() 即不再計入預先下載的預算。
+    """
+
+    LEDGER_NAME = '.reservations.json'
+
+    def __init__(self, root: Optional[str] = None, budget_bytes: int = 20 * 1024 * 1024 * 1024,
+                 use_tmpfs: bool = False, prefetch_budget_bytes: int = 0,
+                 prefetch_min_available_memory: int = 0):
+        if use_tmpfs and os.path.isdir('/dev/shm'):
+            root = '/dev/shm/audio-processor-workspaces'
+        self.root = root or os.path.join(tempfile.gettempdir(), 'audio-processor-workspaces')
+        self.budget_bytes = budget_bytes
+        self.hostname = socket.gethostname()
+        start_time = self._process_start_time(os.getpid()) or uuid.uuid4().hex[:12]
+        self.process_root = os.path.join(self.root, f"{self.hostname}-{os.getpid()}-{start_time}")
+        self.process_key = os.path.basename(self.process_root)
+        self.ledger_path = os.path.join(self.root, self.LEDGER_NAME)
+        self.workspaces: Dict[str, JobWorkspace] = {}
+        self.reserved_bytes = 0
+        self.shared_reserved_bytes = 0
+        self.prefetch_budget_bytes = prefetch_budget_bytes
+        self.prefetch_min_available_memory = prefetch_min_available_memory
+        self.prefetch_reserved_bytes = 0
+        self.condition = threading.Condition()
+
+        shutil.rmtree(self.process_root, ignore_errors=True)
+        os.makedirs(self.process_root)
+        self.cleanup_stale()
+
+    def cleanup_stale(self):
+        """清除同一主機上已不存在之程序遺留的工作目錄"""
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path == self.process_root or not os.path.isdir(path) or not self._is_dead_process(name):
+                continue
+            logging.info(f"🧹 清除遺留的工作目錄: {path}")
+            shutil.rmtree(path, ignore_errors=True)
+        self._publish()
+
+    def _is_dead_process(self, process_key: str) -> bool:
+        """<hostname>-<pid>[-<啟動時間>] 是否為本機上已結束的程序 (其他主機的程序無法判斷，視為仍在執行)
+
+        PID 仍存在但啟動時間不同 (PID 已被重用)，或與本程序 PID 相同卻不是本程序時，也視為已結束。
+        """
+        prefix = f"{self.hostname}-"
+        if process_key == self.process_key or not process_key.startswith(prefix):
+            return False
+        pid_text, _, start_time = process_key[len(prefix):].partition('-')
+        try:
+            pid = int(pid_text)
+        except ValueError:
+            return False
+        if pid == os.getpid():
+            return True
+        if not self._pid_alive(pid):
+            return True
+        current = self._process_start_time(pid)
+        return start_time.isdigit() and current is not None and current != start_time
+
+    @contextmanager
+    def _ledger(self) -> Iterator[Dict[str, int]]:
+        """鎖定並讀取共用的保留量帳本 ({程序: 保留位元組數})，離開時寫回"""
+        fd = os.open(self.ledger_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                try:
+                    ledger = json.loads(f.read() or '{}')
+                except ValueError:
+                    ledger = {}
+                # 移除已結束程序的保留量
+                for process_key in [k for k in ledger if k != self.process_key and self._is_dead_process(k)]:
+                    del ledger[process_key]
+                yield ledger
+                if self.reserved_bytes > 0:
+                    ledger[self.process_key] = self.reserved_bytes
+                else:
+                    ledger.pop(self.process_key, None)
+                self.shared_reserved_bytes = sum(ledger.values())
+                f.seek(0)
+                f.truncate()
+                json.dump(ledger, f)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _publish(self):
+        """將本程序目前的保留量寫入共用帳本"""
+        try:
+            with self._ledger():
+                pass
+        except OSError as e:
+            logging.warning(f"⚠️ 更新工作目錄保留量帳本失敗: {e}")
+
+    @staticmethod
+    def _process_start_time(pid: int) -> Optional[str]:
+        """程序的啟動時間 (/proc/<pid>/stat 第 22 欄，開機後的 clock ticks)，無法取得時回傳 None"""
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                # 程序名稱可能含空白，從最後一個 ')' 之後開始算 (第 3 欄起)
+                return f.read().rsplit(')', 1)[1].split()[19]
+        except (OSError, IndexError):
+            return None
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def available_memory() -> Optional[int]:
+        """讀取 /proc/meminfo 的 MemAvailable (位元組)，無法取得時回傳 None"""
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def _must_wait(self, reserve_bytes: int, prefetch: bool, other_reserved_bytes: int = 0) -> bool:
+        reserved = self.reserved_bytes + other_reserved_bytes
+        if ((self.workspaces or other_reserved_bytes > 0) and self.budget_bytes > 0
+                and reserved + reserve_bytes > self.budget_bytes):
+            return True
+        if not prefetch:
+            return False
+        if (self.prefetch_budget_bytes > 0 and self.prefetch_reserved_bytes > 0
+                and self.prefetch_reserved_bytes + reserve_bytes > self.prefetch_budget_bytes):
+            return True
+        if self.prefetch_min_available_memory > 0:
+            available = self.available_memory()
+            if available is not None and available < self.prefetch_min_available_memory:
+                return True
+        return False
+
+    def allocate(self, job_id: str, reserve_bytes: int,
+                 cancel_check: Optional[Callable[[], bool]] = None,
+                 on_wait: Optional[Callable[[], None]] = None,
+                 prefetch: bool = False) -> JobWorkspace:
+        """為任務配置工作目錄；預算不足時阻塞等待，直到其他任務釋放空間
+
+        若目前沒有其他任務 (包含其他程序的任務) 佔用預算，即使預估大小超過預算也會放行，避免永遠無法開始。
+        prefetch=True 時另需符合預先下載的磁碟預算與可用記憶體下限。
+        其他程序釋放的空間以每秒重新讀取帳本的方式得知。
+        """
+        reserve_bytes = max(0, int(reserve_bytes))
+        waited = False
+        with self.condition:
+            while True:
+                # 檢查與保留在同一個檔案鎖內完成，多個程序不會同時通過預算檢查
+                with self._ledger() as ledger:
+                    others = sum(v for k, v in ledger.items() if k != self.process_key)
+                    if not self._must_wait(reserve_bytes, prefetch, others):
+                        path = os.path.join(self.process_root, job_id)
+                        os.makedirs(path, exist_ok=True)
+                        workspace = JobWorkspace(job_id, path, reserve_bytes)
+                        workspace.prefetch = prefetch
+                        self.workspaces[job_id] = workspace
+                        self.reserved_bytes += reserve_bytes
+                        if prefetch:
+                            self.prefetch_reserved_bytes += reserve_bytes
+                        break
+                if cancel_check and cancel_check():
+                    raise WorkspaceWaitCancelled(job_id)
+                if not waited:
+                    waited = True
+                    logging.info(f"[Job {job_id}] ⏳ {'預先下載' if prefetch else '磁碟'}預算不足 (所有程序已保留 {self.reserved_bytes + others}/{self.budget_bytes} bytes)，等待其他任務釋放空間")
+                    if on_wait:
+                        on_wait()
+                self.condition.wait(timeout=1)
+
+        logging.info(f"[Job {job_id}] 📁 已配置工作目錄 (保留 {reserve_bytes} bytes)")
+        return workspace
+
+    def track(self, job_id: str) -> int:
+        """重新計算任務實際使用量；超出保留量時擴大保留量，讓預算反映真實用量"""
+        with self.condition:
+            workspace = self.workspaces.get(job_id)
+        if not workspace:
+            return 0
+        used = workspace.measure()
+        with self.condition:
+            if used > workspace.reserved_bytes and job_id in self.workspaces:
+                self.reserved_bytes += used - workspace.reserved_bytes
+                if workspace.prefetch:
+                    self.prefetch_reserved_bytes += used - workspace.reserved_bytes
+                workspace.reserved_bytes = used
+                self._publish()
+        return used
+
+    def promote(self, job_id: str):
+        """預先下載的任務進入轉錄階段，不再計入預先下載的預算"""
+        with self.condition:
+            workspace = self.workspaces.get(job_id)
+            if workspace and workspace.prefetch:
+                workspace.prefetch = False
+                self.prefetch_reserved_bytes -= workspace.reserved_bytes
+                self.condition.notify_all()
+
+    def release(self, job_id: str):
+        """刪除任務工作目錄並歸還預算 (任務完成、失敗或取消時皆需呼叫)"""
+        with self.condition:
+            workspace = self.workspaces.pop(job_id, None)
+            if workspace:
+                self.reserved_bytes -= workspace.reserved_bytes
+                if workspace.prefetch:
+                    self.prefetch_reserved_bytes -= workspace.reserved_bytes
+                self._publish()
+            self.condition.notify_all()
+        if workspace and os.path.exists(workspace.path):
+            shutil.rmtree(workspace.path, ignore_errors=True)
+            logging.info(f"[Job {job_id}] 🧹 已清理工作目錄")
+
+    def release_all(self):
+        """程序結束時清理本程序的所有工作目錄"""
+        with self.condition:
+            job_ids = list(self.workspaces.keys())
+        for job_id in job_ids:
+            self.release(job_id)
+        self._publish()
+        shutil.rmtree(self.process_root, ignore_errors=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.condition:
+            workspaces = list(self.workspaces.values())
+            reserved = self.reserved_bytes
+            shared_reserved = self.shared_reserved_bytes
+            prefetch_reserved = self.prefetch_reserved_bytes
+        return {
+            'root': self.process_root,
+            'active_workspaces': len(workspaces),
+            'prefetch_workspaces': sum(1 for w in workspaces if w.prefetch),
+            'reserved_bytes': reserved,
+            'shared_reserved_bytes': shared_reserved,
+            'prefetch_reserved_bytes': prefetch_reserved,
+            'used_bytes': sum(w.used_bytes for w in workspaces),
+            'budget_bytes': self.budget_bytes,
+            'prefetch_budget_bytes': self.prefetch_budget_bytes
+        }
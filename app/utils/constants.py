@@ -6,4 +6,13 @@ JOB_STATUS = {
     'COMPLETED': 'completed',    # 處理完成
     'FAILED': 'failed',        # 處理失敗
     'CANCELLED': 'cancelled'    # 已取消
-}
\ No newline at end of file
+}
+
+# 轉錄模式定義
+TRANSCRIPTION_MODE = {
+    'WHISPER_FIRST': 'whisper_first',  # 先整段轉錄，再將段落對齊說話人
+    'DIARIZE_FIRST': 'diarize_first'   # 先說話人分離，再批次轉錄各段發言
+}
+
+# 已處理過的音檔會被重新命名為 "[YYYY-MM-DD] 標題.m4a"，批次送出時據此略過
+PROCESSED_FILENAME_PATTERN = r'^\[\d{4}-\d{2}-\d{2}\] '
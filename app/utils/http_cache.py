@@ -0,0 +1,64 @@
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from flask import Response, request
+
+# 回應內容小於此位元組數時不壓縮 (壓縮的額外開銷大於節省的流量)
+GZIP_MIN_BYTES = 1024
+
+
+def accepts_gzip() -> bool:
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def is_not_modified(etag: Optional[str]) -> bool:
+    """客戶端的 If-None-Match 是否與目前的 ETag 相符"""
+    return bool(etag) and request.if_none_match.contains_weak(etag)
+
+
+def not_modified_response(etag: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def json_response(payload: Dict[str, Any], etag: Optional[str] = None) -> Response:
+    """JSON 回應：帶 ETag 時客戶端 If-None-Match 相符即回 304；內容較大且客戶端接受時以 gzip 壓縮"""
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    response = Response(body, mimetype='application/json')
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    if len(body) >= GZIP_MIN_BYTES and accepts_gzip():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        response.set_data(compressor.compress(body) + compressor.flush())
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def gzip_stream(chunks: Iterable[str]) -> Iterator[bytes]:
+    """逐段以 gzip 壓縮串流內容，每段都 flush，讓客戶端能立即解壓並處理已收到的部分"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_response(chunks: Iterable[str], mimetype: str, etag: Optional[str] = None) -> Response:
+    """串流回應 (客戶端接受時以 gzip 壓縮)"""
+    headers = {'Cache-Control': 'private, no-cache' if etag else 'no-cache', 'X-Accel-Buffering': 'no',
+               'Vary': 'Accept-Encoding'}
+    if accepts_gzip():
+        headers['Content-Encoding'] = 'gzip'
+        chunks = gzip_stream(chunks)
+    response = Response(chunks, mimetype=mimetype, headers=headers)
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
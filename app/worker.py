@@ -0,0 +1,221 @@
+"""獨立的任務 worker：從 Redis 佇列領取任務並處理
+
+使用方式: python -m app.worker [--concurrency N]
+可在多台主機上同時執行，只需連到同一個 Redis (REDIS_HOST / REDIS_PORT / REDIS_DB)。
+"""
+import os
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Dict
+
+from app.services.audio_processor import AudioProcessor
+from app.services.job_queue import RedisJobQueue
+from app.services.job_store import RedisJobStore
+from app.utils.constants import JOB_STATUS
+
+
+class JobWorker:
+    """領取佇列中的任務並交給 AudioProcessor 執行，同時維持心跳與回收逾時任務"""
+
+    def __init__(self, processor: AudioProcessor, queue: RedisJobQueue, concurrency: int = 1,
+                 poll_interval: float = 1.0, heartbeat_interval: float = 15.0, prefetch_depth: int = 0):
+        self.processor = processor
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        # 運算名額滿時可多領取的任務數 (先行下載與轉檔)
+        self.prefetch_depth = max(0, prefetch_depth)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = RedisJobQueue.new_worker_id()
+        # 持有中的任務 (含已離開 CPU 階段、仍在上傳 Notion 等的任務)；compute 為尚未離開 CPU 階段者
+        self.running: Dict[str, Future] = {}
+        self.compute = set()
+        self.running_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.exited = threading.Event()
+        self.slot_freed = threading.Event()
+        # 轉錄名額與 worker 的並行數一致 (預先領取的任務須等名額空出才開始轉錄)
+        self.processor.asr_slots.set_capacity(self.concurrency)
+
+    def stop(self, *_):
+        """停止領取新任務，等待進行中的任務結束"""
+        if not self.stop_event.is_set():
+            logging.info(f"🔄 Worker {self.worker_id} 收到停止訊號，等待進行中的任務完成...")
+            self.stop_event.set()
+            self.slot_freed.set()
+
+    def set_concurrency(self, concurrency: int):
+        """調整並行數 (由自動調整並行數的控制器呼叫)，並透過心跳讓排程與准入控制得知新的總並行數"""
+        with self.running_lock:
+            self.concurrency = max(1, concurrency)
+        self.processor.asr_slots.set_capacity(self.concurrency)
+        self.slot_freed.set()
+
+    def get_load(self) -> Dict[str, Any]:
+        """目前的並行數、運算中的任務數，以及共享佇列中等待的任務數與平均音檔秒數"""
+        with self.running_lock:
+            running = len(self.compute)
+            concurrency = self.concurrency
+        backlog = self.queue.get_backlog(self.processor.scheduling_policy)
+        return {
+            'concurrency': concurrency,
+            'running': running,
+            'pending': backlog['jobs'],
+            'next_audio_seconds': backlog['audio_seconds'] / backlog['jobs'] if backlog['jobs'] else 0
+        }
+
+    def run(self):
+        logging.info(f"🚀 Worker {self.worker_id} 啟動 (並行數: {self.concurrency})")
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        self._heartbeat()
+        if self.processor.concurrency_controller:
+            self.processor.concurrency_controller.start(self.get_load, self.set_concurrency)
+
+        try:
+            while not self.stop_event.is_set():
+                with self.running_lock:
+                    has_slot = len(self.compute) < self.concurrency + self.prefetch_depth
+                    prefetch = len(self.compute) >= self.concurrency
+                if not has_slot:
+                    self.slot_freed.wait(timeout=self.poll_interval)
+                    self.slot_freed.clear()
+                    continue
+
+                try:
+                    claimed = self.queue.claim(self.worker_id, self.processor.scheduling_policy)
+                except Exception as e:
+                    logging.error(f"❌ 領取任務失敗: {e}")
+                    self.stop_event.wait(self.poll_interval * 5)
+                    continue
+
+                if not claimed:
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                self._start_job(claimed['job_id'], claimed['attempts'], prefetch)
+
+            # 等待進行中的任務結束 (心跳持續，避免任務被其他 worker 重複領取)
+            with self.running_lock:
+                futures = list(self.running.values())
+            wait(futures)
+        finally:
+            self.exited.set()
+            if self.processor.concurrency_controller:
+                self.processor.concurrency_controller.stop()
+            self.queue.unregister_worker(self.worker_id)
+            self.processor.shutdown_executor()
+            logging.info(f"✅ Worker {self.worker_id} 已停止")
+
+    def _start_job(self, job_id: str, attempts: int, prefetch: bool = False):
+        job = self.processor.job_store.get(job_id)
+        if not job:
+            logging.warning(f"[Job {job_id}] ⚠️ 任務資料不存在 (可能已過期)，略過")
+            self.queue.ack(self.worker_id, job_id)
+            return
+        if self.processor.job_store.is_cancelled(job_id):
+            self.processor._handle_job_cancellation(job_id)
+            self.queue.ack(self.worker_id, job_id)
+            return
+
+        logging.info(f"[Job {job_id}] 📤 Worker {self.worker_id} 領取任務 (第 {attempts} 次){' (預先下載)' if prefetch else ''}")
+        with self.running_lock:
+            self.compute.add(job_id)
+        cpu_released, future = self.processor.submit_job(
+            job_id, job['file_id'], job.get('attachment_file_ids'), prefetch=prefetch
+        )
+        with self.running_lock:
+            self.running[job_id] = future
+        cpu_released.add_done_callback(lambda _: self._release_slot(job_id))
+        future.add_done_callback(lambda _: self._finish_job(job_id))
+
+    def _release_slot(self, job_id: str):
+        """任務離開 CPU 階段，可以領取下一個任務"""
+        with self.running_lock:
+            self.compute.discard(job_id)
+        self.slot_freed.set()
+
+    def _finish_job(self, job_id: str):
+        with self.running_lock:
+            self.running.pop(job_id, None)
+            self.compute.discard(job_id)
+        try:
+            if not self.queue.ack(self.worker_id, job_id):
+                logging.warning(f"[Job {job_id}] ⚠️ 任務持有權已逾時並被重新排入佇列")
+        except Exception as e:
+            logging.error(f"[Job {job_id}] ❌ 釋放任務持有權失敗: {e}")
+        self.slot_freed.set()
+
+    def _heartbeat(self):
+        with self.running_lock:
+            job_ids = list(self.running.keys())
+        self.queue.heartbeat(self.worker_id, job_ids, {
+            'concurrency': self.concurrency,
+            'active': len(job_ids),
+            'stopping': self.stop_event.is_set()
+        })
+
+    def _heartbeat_loop(self):
+        while not self.exited.wait(self.heartbeat_interval):
+            try:
+                self._heartbeat()
+                self._reap_expired()
+            except Exception as e:
+                logging.error(f"❌ Worker 心跳失敗: {e}")
+
+    def _reap_expired(self):
+        """回收可見性逾時的任務 (worker 當機或卡住)，超過重試次數則標記為失敗"""
+        store = self.processor.job_store
+        for item in self.queue.requeue_expired():
+            job_id = item['job_id']
+            attempts = self.queue.get_attempts(job_id)
+            if store.is_cancelled(job_id):
+                self.queue.remove(job_id)
+                self.processor._handle_job_cancellation(job_id)
+            elif attempts >= self.processor.job_max_attempts:
+                self.queue.remove(job_id)
+                store.update(
+                    job_id,
+                    status=JOB_STATUS['FAILED'],
+                    progress=100,
+                    message=f'處理失敗: 工作程序已中斷 {attempts} 次',
+                    error=f"worker {item['worker_id'] or '未知'} 無回應，已達重試上限"
+                )
+                logging.error(f"[Job {job_id}] ❌ 已達重試上限 ({attempts})，標記為失敗")
+            else:
+                store.update(job_id, status=JOB_STATUS['PENDING'], progress=0,
+                             message='工作程序無回應，任務已重新排入佇列')
+                logging.warning(f"[Job {job_id}] 🔄 Worker {item['worker_id'] or '未知'} 無回應，任務已重新排入佇列")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音訊處理任務 worker")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", 1)),
+                        help="同時處理的任務數")
+    args = parser.parse_args()
+
+    # 不在本機排程器上啟動並行數控制器，由 JobWorker.run 對 worker 自己的並行數啟動
+    processor = AudioProcessor(max_workers=args.concurrency, run_local_scheduler=False)
+    if not isinstance(processor.job_store, RedisJobStore):
+        raise SystemExit("❌ Worker 需要 Redis 任務儲存，請確認 REDIS_HOST 設定且 JOB_STORE_BACKEND 不是 local")
+
+    queue = processor.job_queue or RedisJobQueue(
+        processor.job_store.redis,
+        visibility_timeout=int(os.getenv("JOB_VISIBILITY_TIMEOUT", 120))
+    )
+    worker = JobWorker(
+        processor,
+        queue,
+        concurrency=args.concurrency,
+        heartbeat_interval=float(os.getenv("WORKER_HEARTBEAT_INTERVAL", 15)),
+        prefetch_depth=processor.prefetch_jobs
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
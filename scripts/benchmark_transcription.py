@@ -0,0 +1,141 @@
+"""比較 whisper_first 與 diarize_first 兩種轉錄模式的吞吐量與說話人歸屬準確度
+
+用法:
+    python scripts/benchmark_transcription.py recording.m4a [--rttm reference.rttm] [--batch-size 8]
+
+- 吞吐量以 real-time factor (處理秒數 / 音檔秒數) 表示，越小越快。
+- purity: 每個輸出段落被其標註說話人 (依 Pyannote 結果) 覆蓋的時間比例，
+  用來衡量跨越說話人切換的段落造成的誤標。
+- 若提供人工標註的 RTTM，另外計算以時間加權的說話人歸屬準確度。
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whisper
+
+from app.services.audio_processor import AudioProcessor
+
+
+def load_rttm(path: str) -> List[Tuple[float, float, str]]:
+    """讀取 RTTM 檔案為 (start, end, speaker) 列表"""
+    turns = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 8 or parts[0] != 'SPEAKER':
+                continue
+            start, duration = float(parts[3]), float(parts[4])
+            turns.append((start, start + duration, parts[7]))
+    return turns
+
+
+def overlap_by_speaker(start: float, end: float, turns: List[Tuple[float, float, str]]) -> Dict[str, float]:
+    """計算 [start, end] 區間與每位說話人的重疊秒數"""
+    overlaps = defaultdict(float)
+    for turn_start, turn_end, speaker in turns:
+        overlap = min(end, turn_end) - max(start, turn_start)
+        if overlap > 0:
+            overlaps[speaker] += overlap
+    return overlaps
+
+
+def attribution_purity(segments: List[Dict], turns: List[Tuple[float, float, str]]) -> float:
+    """段落被其標註說話人覆蓋的時間比例 (以段落長度加權)"""
+    covered = total = 0.0
+    for seg in segments:
+        duration = seg["end"] - seg["start"]
+        if duration <= 0:
+            continue
+        covered += min(duration, overlap_by_speaker(seg["start"], seg["end"], turns).get(seg["speaker"], 0.0))
+        total += duration
+    return covered / total if total else 0.0
+
+
+def attribution_accuracy(segments: List[Dict], reference: List[Tuple[float, float, str]]) -> float:
+    """以 RTTM 為基準的說話人歸屬準確度 (假說標籤以最大重疊貪婪對應到參考標籤)"""
+    cooccurrence = defaultdict(lambda: defaultdict(float))
+    for seg in segments:
+        for ref_speaker, overlap in overlap_by_speaker(seg["start"], seg["end"], reference).items():
+            cooccurrence[seg["speaker"]][ref_speaker] += overlap
+    
+    mapping = {}
+    pairs = sorted(
+        ((overlap, hyp, ref) for hyp, refs in cooccurrence.items() for ref, overlap in refs.items()),
+        reverse=True
+    )
+    used_refs = set()
+    for _, hyp, ref in pairs:
+        if hyp not in mapping and ref not in used_refs:
+            mapping[hyp] = ref
+            used_refs.add(ref)
+    
+    correct = total = 0.0
+    for seg in segments:
+        overlaps = overlap_by_speaker(seg["start"], seg["end"], reference)
+        total += sum(overlaps.values())
+        correct += overlaps.get(mapping.get(seg["speaker"]), 0.0)
+    return correct / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="轉錄模式基準測試")
+    parser.add_argument("audio", help="要測試的音檔")
+    parser.add_argument("--rttm", help="人工標註的 RTTM 參考檔 (可選)")
+    parser.add_argument("--batch-size", type=int, default=None, help="diarize_first 模式的批次大小")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    processor = AudioProcessor(max_workers=1)
+    processor.load_models()
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        # 複製輸入檔案，避免轉檔流程刪除原始檔案
+        audio_path = shutil.copy(args.audio, work_dir)
+        if not audio_path.lower().endswith('.wav'):
+            audio_path = processor.convert_to_wav(audio_path)
+        audio_seconds = len(whisper.load_audio(audio_path)) / whisper.audio.SAMPLE_RATE
+        
+        start = time.perf_counter()
+        diarization = processor.run_diarization(audio_path)
+        diarization_seconds = time.perf_counter() - start
+        turns = [(turn.start, turn.end, speaker) for turn, _, speaker in diarization.itertracks(yield_label=True)]
+        
+        start = time.perf_counter()
+        asr_result = processor.transcribe_full(audio_path)
+        whisper_first_segments, _ = processor.assign_speakers_to_segments(asr_result["segments"], diarization)
+        whisper_first_seconds = time.perf_counter() - start + diarization_seconds
+        
+        start = time.perf_counter()
+        utterances = processor.merge_speaker_turns(diarization)
+        diarize_first_segments = processor.transcribe_utterances(audio_path, utterances, batch_size=args.batch_size)
+        diarize_first_seconds = time.perf_counter() - start + diarization_seconds
+        
+        reference = load_rttm(args.rttm) if args.rttm else None
+        
+        print(f"\n音檔長度: {audio_seconds:.1f}s (說話人分離 {diarization_seconds:.1f}s)")
+        print(f"{'模式':<16}{'耗時(s)':>10}{'RTF':>8}{'段落數':>8}{'purity':>9}{'accuracy':>10}")
+        for name, seconds, segments in (
+            ("whisper_first", whisper_first_seconds, whisper_first_segments),
+            ("diarize_first", diarize_first_seconds, diarize_first_segments),
+        ):
+            accuracy = f"{attribution_accuracy(segments, reference):.3f}" if reference else "-"
+            print(f"{name:<16}{seconds:>10.1f}{seconds / audio_seconds:>8.3f}{len(segments):>8}"
+                  f"{attribution_purity(segments, turns):>9.3f}{accuracy:>10}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        processor.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
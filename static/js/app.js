@@ -22,6 +22,10 @@ let taskManager = {
     tasks: {},
     updateTimer: null,
     updateInterval: 3000, // 增加到3秒，減少API請求頻率
+    // 推送模式：優先使用 SSE，其次長輪詢，最後才是定時輪詢
+    eventSource: null,
+    longPollController: null,
+    jobsVersion: 0,
     estimatedTimes: {
         'pending': 0,
         'downloading': 30,
@@ -576,6 +580,55 @@ async function loadDriveFiles() {
     ]);
 }
 
+/**
+ * 以 NDJSON 串流讀取 Drive 檔案列表，每收到一批檔案就呼叫 onFiles (第一頁不必等整個列表完成)
+ * 回傳檔案總數
+ */
+async function streamDriveFiles(queryParams, onFiles, errorLabel) {
+    queryParams.set('stream', 'ndjson');
+    const response = await fetch(`${API_BASE_URL}/api/drive/files?${queryParams.toString()}`, {
+        headers: { 'Accept': 'application/x-ndjson' }
+    });
+    
+    if (!response.ok) {
+        if (response.status === 401) {
+            throw new Error(`401 Unauthorized: Failed to load ${errorLabel}. Session may be invalid.`);
+        }
+        throw new Error(`HTTP error ${response.status}: Failed to load ${errorLabel}.`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let count = 0;
+    
+    const handleLines = (lines) => {
+        const files = [];
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const item = JSON.parse(line);
+            if (item.error) throw new Error(item.error);
+            if (item.done) continue;
+            files.push(item);
+        }
+        if (files.length > 0) {
+            count += files.length;
+            onFiles(files);
+        }
+    };
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        handleLines(lines);
+    }
+    handleLines([buffer + decoder.decode()]);
+    return count;
+}
+
 // 載入音訊檔案列表
 async function loadAudioFiles() {
     const fileList = document.getElementById('file-list');
@@ -606,24 +659,17 @@ async function loadAudioFiles() {
             queryParams.append('recordingsFolderName', RECORDINGS_FOLDER);
         }
         
-        const response = await fetch(`${API_BASE_URL}/api/drive/files?${queryParams.toString()}`);
-        
-        if (!response.ok) {
-            if (response.status === 401) {
-                throw new Error(`401 Unauthorized: Failed to load audio files. Session may be invalid.`);
+        // 邊接收邊顯示 (收到第一批檔案時移除載入提示)
+        const audioCount = await streamDriveFiles(queryParams, (files) => {
+            if (elements.fileList.querySelector('.spinner-border')) {
+                elements.fileList.innerHTML = '';
             }
-            throw new Error(`HTTP error ${response.status}: Failed to load audio files.`);
-        }
-        
-        const data = await response.json();
+            files.filter(file => isAudioFile(file.mimeType)).forEach(appendAudioFileOption);
+        }, 'audio files');
         
-        // 過濾音訊檔案
-        let audioFiles = data.files.filter(file => isAudioFile(file.mimeType));
+        console.log("載入的音訊檔案數量:", audioCount);
         
-        console.log("載入的音訊檔案數量:", audioFiles.length);
-        
-        // 填充音訊文件列表
-        if (audioFiles.length === 0) {
+        if (audioCount === 0) {
             elements.fileList.innerHTML = `
                 <div class="alert alert-info">
                     <i class="bi bi-info-circle-fill me-2"></i>
@@ -631,37 +677,6 @@ async function loadAudioFiles() {
                         `未在 ${RECORDINGS_FOLDER} 資料夾中找到音訊檔案。請上傳音訊檔案到此資料夾。` : 
                         '未找到音訊檔案。請上傳音訊檔案到您的 Google Drive.'}
                 </div>`;
-        } else {
-            elements.fileList.innerHTML = '';
-            audioFiles.forEach(file => {
-                const option = document.createElement('div');
-                option.className = 'file-option';
-                option.innerHTML = `
-                    <input type="radio" name="audioFile" 
-                           id="file-${file.id}" value="${file.id}" data-filename="${file.name}">
-                    <div class="file-icon">
-                        <i class="bi bi-file-earmark-music"></i>
-                    </div>
-                    <div class="file-details">
-                        <div class="file-name">${file.name}</div>
-                        <div class="file-size">${formatFileSize(file.size)}</div>
-                    </div>
-                `;
-                // 點擊整個區域時選中
-                option.addEventListener('click', function() {
-                    const input = this.querySelector('input');
-                    input.checked = true;
-                    
-                    // 移除其他選擇項的選中樣式
-                    document.querySelectorAll('.file-option').forEach(el => {
-                        el.classList.remove('selected');
-                    });
-                    
-                    // 添加選中樣式
-                    this.classList.add('selected');
-                });
-                elements.fileList.appendChild(option);
-            });
         }
     } catch (error) {
         console.error('載入音訊檔案失敗:', error);
@@ -681,6 +696,37 @@ async function loadAudioFiles() {
     }
 }
 
+// 在音訊檔案列表加入一個選項
+function appendAudioFileOption(file) {
+    const option = document.createElement('div');
+    option.className = 'file-option';
+    option.innerHTML = `
+        <input type="radio" name="audioFile" 
+               id="file-${file.id}" value="${file.id}" data-filename="${file.name}">
+        <div class="file-icon">
+            <i class="bi bi-file-earmark-music"></i>
+        </div>
+        <div class="file-details">
+            <div class="file-name">${file.name}</div>
+            <div class="file-size">${formatFileSize(file.size)}</div>
+        </div>
+    `;
+    // 點擊整個區域時選中
+    option.addEventListener('click', function() {
+        const input = this.querySelector('input');
+        input.checked = true;
+        
+        // 移除其他選擇項的選中樣式
+        document.querySelectorAll('.file-option').forEach(el => {
+            el.classList.remove('selected');
+        });
+        
+        // 添加選中樣式
+        this.classList.add('selected');
+    });
+    elements.fileList.appendChild(option);
+}
+
 // 載入 PDF 檔案列表
 async function loadPdfFiles() {
     const attachmentList = document.getElementById('attachment-list');
@@ -711,24 +757,19 @@ async function loadPdfFiles() {
             queryParams.append('pdfFolderName', DOCUMENTS_FOLDER);
         }
         
-        const response = await fetch(`${API_BASE_URL}/api/drive/files?${queryParams.toString()}`);
-        
-        if (!response.ok) {
-            if (response.status === 401) {
-                throw new Error(`401 Unauthorized: Failed to load PDF files. Session may be invalid.`);
+        // 邊接收邊顯示 (收到第一批檔案時移除載入提示並加入「無附件」選項)
+        const pdfCount = await streamDriveFiles(queryParams, (files) => {
+            if (elements.attachmentList.querySelector('.spinner-border')) {
+                elements.attachmentList.innerHTML = '';
+                appendNoAttachmentOption();
             }
-            throw new Error(`HTTP error ${response.status}: Failed to load PDF files.`);
-        }
-        
-        const data = await response.json();
+            files.filter(file => file.mimeType === 'application/pdf').forEach(appendPdfFileOption);
+        }, 'PDF files');
         
-        // 過濾 PDF 檔案
-        let pdfFiles = data.files.filter(file => file.mimeType === 'application/pdf');
-        
-        console.log("載入的 PDF 檔案數量:", pdfFiles.length);
+        console.log("載入的 PDF 檔案數量:", pdfCount);
         
         // 填充附件文件列表
-        if (pdfFiles.length === 0) {
+        if (pdfCount === 0) {
             elements.attachmentList.innerHTML = `
                 <div class="alert alert-info">
                     <i class="bi bi-info-circle-fill me-2" style="font-size: 1.5rem;"></i>
@@ -736,80 +777,6 @@ async function loadPdfFiles() {
                         `未在 ${DOCUMENTS_FOLDER} 資料夾中找到 PDF 檔案。附件是選用的。` : 
                         '未找到 PDF 檔案。附件是選用的。'}
                 </div>`;
-        } else {
-            elements.attachmentList.innerHTML = '';
-            // 添加"無附件"選項
-            const noneOption = document.createElement('div');
-            noneOption.className = 'attachment-option none-option selected'; // Default selected
-            noneOption.innerHTML = `
-                <input type="checkbox" id="attachment-none" value="" data-none="true" checked>
-                <div class="file-icon">
-                    <i class="bi bi-slash-circle"></i>
-                </div>
-                <div class="file-details">
-                    <div class="file-name">無附件</div>
-                    <div class="file-size">不選擇附件檔案</div>
-                </div>
-            `;
-            
-            noneOption.addEventListener('click', function() {
-                const input = this.querySelector('input');
-                input.checked = true; // Clicking "None" always selects it
-                this.classList.add('selected');
-                
-                // 取消所有其他附件的選擇
-                document.querySelectorAll('.attachment-option:not(.none-option)').forEach(el => {
-                    el.classList.remove('selected');
-                    el.querySelector('input').checked = false;
-                });
-            });
-            elements.attachmentList.appendChild(noneOption);
-            
-            // 添加PDF檔案
-            pdfFiles.forEach(file => {
-                const option = document.createElement('div');
-                option.className = 'attachment-option';
-                option.innerHTML = `
-                    <input type="checkbox" 
-                           id="attachment-${file.id}" value="${file.id}" data-filename="${file.name}">
-                    <div class="file-icon">
-                        <i class="bi bi-file-earmark-pdf"></i>
-                    </div>
-                    <div class="file-details">
-                        <div class="file-name">${file.name}</div>
-                        <div class="file-size">${formatFileSize(file.size)}</div>
-                    </div>
-                `;
-                
-                option.addEventListener('click', function() {
-                    const input = this.querySelector('input');
-                    input.checked = !input.checked; // Toggle current PDF's checked state
-                    
-                    if (input.checked) {
-                        this.classList.add('selected');
-                        // 選中了一個PDF附件，取消"無附件"的選擇
-                        const noneOptionEl = document.querySelector('.attachment-option.none-option');
-                        if (noneOptionEl) {
-                            noneOptionEl.classList.remove('selected');
-                            noneOptionEl.querySelector('input').checked = false;
-                        }
-                    } else {
-                        this.classList.remove('selected');
-                        // 如果取消選中後沒有任何其他PDF被選中，則自動選中"無附件"
-                        const anyPdfSelected = Array.from(document.querySelectorAll('.attachment-option:not(.none-option) input[type="checkbox"]'))
-                            .some(el => el.checked);
-                        
-                        if (!anyPdfSelected) {
-                            const noneOptionEl = document.querySelector('.attachment-option.none-option');
-                            if (noneOptionEl) {
-                                noneOptionEl.classList.add('selected');
-                                noneOptionEl.querySelector('input').checked = true;
-                            }
-                        }
-                    }
-                });
-                elements.attachmentList.appendChild(option);
-            });
         }
     } catch (error) {
         console.error('載入 PDF 檔案失敗:', error);
@@ -829,6 +796,81 @@ async function loadPdfFiles() {
     }
 }
 
+// 在附件列表加入「無附件」選項 (預設選取)
+function appendNoAttachmentOption() {
+    const noneOption = document.createElement('div');
+    noneOption.className = 'attachment-option none-option selected'; // Default selected
+    noneOption.innerHTML = `
+        <input type="checkbox" id="attachment-none" value="" data-none="true" checked>
+        <div class="file-icon">
+            <i class="bi bi-slash-circle"></i>
+        </div>
+        <div class="file-details">
+            <div class="file-name">無附件</div>
+            <div class="file-size">不選擇附件檔案</div>
+        </div>
+    `;
+    
+    noneOption.addEventListener('click', function() {
+        const input = this.querySelector('input');
+        input.checked = true; // Clicking "None" always selects it
+        this.classList.add('selected');
+        
+        // 取消所有其他附件的選擇
+        document.querySelectorAll('.attachment-option:not(.none-option)').forEach(el => {
+            el.classList.remove('selected');
+            el.querySelector('input').checked = false;
+        });
+    });
+    elements.attachmentList.appendChild(noneOption);
+}
+
+// 在附件列表加入一個 PDF 選項
+function appendPdfFileOption(file) {
+    const option = document.createElement('div');
+    option.className = 'attachment-option';
+    option.innerHTML = `
+        <input type="checkbox" 
+               id="attachment-${file.id}" value="${file.id}" data-filename="${file.name}">
+        <div class="file-icon">
+            <i class="bi bi-file-earmark-pdf"></i>
+        </div>
+        <div class="file-details">
+            <div class="file-name">${file.name}</div>
+            <div class="file-size">${formatFileSize(file.size)}</div>
+        </div>
+    `;
+    
+    option.addEventListener('click', function() {
+        const input = this.querySelector('input');
+        input.checked = !input.checked; // Toggle current PDF's checked state
+        
+        if (input.checked) {
+            this.classList.add('selected');
+            // 選中了一個PDF附件，取消"無附件"的選擇
+            const noneOptionEl = document.querySelector('.attachment-option.none-option');
+            if (noneOptionEl) {
+                noneOptionEl.classList.remove('selected');
+                noneOptionEl.querySelector('input').checked = false;
+            }
+        } else {
+            this.classList.remove('selected');
+            // 如果取消選中後沒有任何其他PDF被選中，則自動選中"無附件"
+            const anyPdfSelected = Array.from(document.querySelectorAll('.attachment-option:not(.none-option) input[type="checkbox"]'))
+                .some(el => el.checked);
+            
+            if (!anyPdfSelected) {
+                const noneOptionEl = document.querySelector('.attachment-option.none-option');
+                if (noneOptionEl) {
+                    noneOptionEl.classList.add('selected');
+                    noneOptionEl.querySelector('input').checked = true;
+                }
+            }
+        }
+    });
+    elements.attachmentList.appendChild(option);
+}
+
 // ===== 任務管理器 核心功能 =====
 
 /**
@@ -886,7 +928,10 @@ async function createNewTask() {
         
         const data = await response.json();
         
-        if (data.success) {
+        if (data.success && data.deduplicated && taskManager.tasks[data.job_id]) {
+            // 相同的任務已在列表中 (伺服器沿用既有任務)
+            showSuccess(`相同的任務已存在，沿用任務 ${data.job_id.substring(0, 8)}...`);
+        } else if (data.success) {
             // 建立任務成功
             const newTask = {
                 id: data.job_id,
@@ -1338,7 +1383,7 @@ document.addEventListener('visibilitychange', () => {
         const activeTasks = Object.values(taskManager.tasks).filter(
             task => task.status === 'pending' || task.status === 'processing'
         );
-        if (activeTasks.length > 0 && !taskManager.updateTimer) {
+        if (activeTasks.length > 0 && !isTaskPollingActive()) {
             console.log(`頁面重新顯示，恢復 ${activeTasks.length} 個活躍任務的輪詢`);
             startTaskPolling();
         }
@@ -1483,47 +1528,218 @@ function refreshTasksUI() {
 // ===== 任務輪詢相關函數 =====
 
 /**
- * 開始任務狀態輪詢
+ * 取得進行中的任務
  */
-function startTaskPolling() {
-    // 如果已經在輪詢，先停止
-    if (taskManager.updateTimer) {
+function getActiveTasks() {
+    return Object.values(taskManager.tasks).filter(
+        task => task.status === 'pending' || task.status === 'processing'
+    );
+}
+
+/**
+ * 是否正在追蹤任務狀態 (SSE、長輪詢或定時輪詢)
+ */
+function isTaskPollingActive() {
+    return Boolean(taskManager.eventSource || taskManager.longPollController || taskManager.updateTimer);
+}
+
+/**
+ * 開始任務狀態追蹤：先取得一次完整狀態與版本號，之後只接收有變化的任務
+ */
+async function startTaskPolling() {
+    // 如果已經在追蹤，先停止 (關注的任務可能已改變)
+    if (isTaskPollingActive()) {
         stopTaskPolling();
     }
     
-    console.log('開始任務狀態輪詢...');
+    if (getActiveTasks().length === 0) {
+        return;
+    }
     
-    // 立即執行一次更新
-    updateTasksStatus();
+    console.log('開始任務狀態追蹤...');
+    
+    // 立即執行一次完整更新，並取得版本號
+    const supportsPush = await updateTasksStatus();
+    if (getActiveTasks().length === 0 || isTaskPollingActive()) {
+        return;
+    }
     
-    // 設置定時輪詢
+    if (supportsPush && window.EventSource) {
+        openTaskStream();
+    } else if (supportsPush) {
+        startLongPolling();
+    } else {
+        startIntervalPolling();
+    }
+}
+
+/**
+ * 定時輪詢 (伺服器不支援推送時的後備方案)
+ */
+function startIntervalPolling() {
+    console.log('使用定時輪詢追蹤任務狀態');
     taskManager.updateTimer = setInterval(() => {
         updateTasksStatus();
     }, taskManager.updateInterval);
 }
 
 /**
- * 停止任務狀態輪詢
+ * 組出關注任務的查詢參數
+ */
+function buildJobChangesQuery() {
+    const taskIds = getActiveTasks().map(task => task.id);
+    return `job_ids=${encodeURIComponent(taskIds.join(','))}&since_version=${taskManager.jobsVersion}`;
+}
+
+/**
+ * 以 Server-Sent Events 接收任務狀態變化
+ */
+function openTaskStream() {
+    console.log('使用 SSE 追蹤任務狀態');
+    const source = new EventSource(`${API_BASE_URL}/api/jobs/stream?${buildJobChangesQuery()}`);
+    taskManager.eventSource = source;
+    
+    const handleJobsEvent = (event) => {
+        // snapshot 表示伺服器的版本號已重新起算，直接採用新的版本號
+        taskManager.jobsVersion = event.type === 'snapshot'
+            ? Number(event.lastEventId) || 0
+            : Math.max(taskManager.jobsVersion, Number(event.lastEventId) || 0);
+        applyJobUpdates(JSON.parse(event.data));
+        if (getActiveTasks().length === 0) {
+            stopTaskPolling();
+        }
+    };
+    source.addEventListener('jobs', handleJobsEvent);
+    source.addEventListener('snapshot', handleJobsEvent);
+    
+    source.onerror = () => {
+        // 一般斷線時瀏覽器會自動重新連線 (並帶上 Last-Event-ID)；連線被拒絕時改用長輪詢
+        if (source.readyState === EventSource.CLOSED && taskManager.eventSource === source) {
+            console.log('SSE 連線無法建立，改用長輪詢');
+            taskManager.eventSource = null;
+            startLongPolling();
+        }
+    };
+}
+
+/**
+ * 長輪詢：伺服器在有任務變化 (或逾時) 時才回應
+ */
+async function startLongPolling() {
+    console.log('使用長輪詢追蹤任務狀態');
+    const controller = new AbortController();
+    taskManager.longPollController = controller;
+    
+    while (taskManager.longPollController === controller && getActiveTasks().length > 0) {
+        try {
+            const response = await fetch(
+                `${API_BASE_URL}/api/jobs/changes?${buildJobChangesQuery()}&timeout=25`,
+                { signal: controller.signal }
+            );
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            const data = await response.json();
+            if (data.success) {
+                taskManager.jobsVersion = data.reset
+                    ? data.version || 0
+                    : Math.max(taskManager.jobsVersion, data.version || 0);
+                applyJobUpdates(data.jobs || {});
+            }
+        } catch (error) {
+            if (controller.signal.aborted) {
+                return;
+            }
+            console.error('長輪詢任務狀態失敗:', error);
+            if (error.message.includes('401') || error.message.includes('404')) {
+                // 未登入或伺服器不支援長輪詢：改用定時輪詢
+                taskManager.longPollController = null;
+                if (error.message.includes('401')) {
+                    showUnauthenticatedUI();
+                } else {
+                    startIntervalPolling();
+                }
+                return;
+            }
+            await new Promise(resolve => setTimeout(resolve, taskManager.updateInterval));
+        }
+    }
+    
+    if (taskManager.longPollController === controller) {
+        taskManager.longPollController = null;
+    }
+}
+
+/**
+ * 停止任務狀態追蹤
  */
 function stopTaskPolling() {
+    if (taskManager.eventSource) {
+        taskManager.eventSource.close();
+        taskManager.eventSource = null;
+    }
+    if (taskManager.longPollController) {
+        taskManager.longPollController.abort();
+        taskManager.longPollController = null;
+    }
     if (taskManager.updateTimer) {
         clearInterval(taskManager.updateTimer);
         taskManager.updateTimer = null;
-        console.log('任務狀態輪詢已停止');
     }
+    console.log('任務狀態追蹤已停止');
 }
 
 /**
- * 更新任務狀態
+ * 套用伺服器回傳的任務狀態，回傳是否有任務發生變化
+ */
+function applyJobUpdates(jobs) {
+    let hasUpdates = false;
+    
+    Object.entries(jobs).forEach(([jobId, jobData]) => {
+        if (taskManager.tasks[jobId]) {
+            const oldStatus = taskManager.tasks[jobId].status;
+            const oldProgress = taskManager.tasks[jobId].progress;
+            
+            // 更新任務資料
+            updateTaskData(taskManager.tasks[jobId], jobData);
+            
+            // 檢查是否有變化
+            if (oldStatus !== taskManager.tasks[jobId].status || 
+                oldProgress !== taskManager.tasks[jobId].progress) {
+                hasUpdates = true;
+                console.log(`任務 ${jobId} 狀態更新: ${oldStatus} -> ${jobData.status}, 進度: ${oldProgress}% -> ${jobData.progress}%`);
+                
+                // 更新UI
+                updateTaskElementUI(jobId, taskManager.tasks[jobId]);
+                
+                // 如果任務完成，顯示通知
+                if (taskManager.tasks[jobId].status === 'completed' && oldStatus !== 'completed') {
+                    showSuccess(`任務完成：${taskManager.tasks[jobId].fileName}`);
+                } else if (taskManager.tasks[jobId].status === 'failed' && oldStatus !== 'failed') {
+                    showError(`任務失敗：${taskManager.tasks[jobId].fileName}`);
+                }
+            }
+        }
+    });
+    
+    if (hasUpdates) {
+        updateTaskCounts();
+        filterTasks();
+        // 立即保存更新後的任務狀態
+        saveCurrentTasks();
+    }
+    return hasUpdates;
+}
+
+/**
+ * 更新任務狀態 (批量查詢)，回傳伺服器是否支援推送 (回應中帶有版本號)
  */
 async function updateTasksStatus() {
-    const activeTasks = Object.values(taskManager.tasks).filter(
-        task => task.status === 'pending' || task.status === 'processing'
-    );
+    const activeTasks = getActiveTasks();
     
     if (activeTasks.length === 0) {
         stopTaskPolling();
-        return;
+        return false;
     }
     
     console.log(`正在更新 ${activeTasks.length} 個活躍任務的狀態...`);
@@ -1542,7 +1758,7 @@ async function updateTasksStatus() {
             if (response.status === 404) {
                 console.log('批量狀態端點不可用，使用單個查詢後備方案');
                 await updateTasksStatusFallback(activeTasks);
-                return;
+                return false;
             }
             throw new Error(`HTTP ${response.status}: ${response.statusText}`);
         }
@@ -1550,43 +1766,13 @@ async function updateTasksStatus() {
         const data = await response.json();
         
         if (data.success && data.jobs) {
-            let hasUpdates = false;
-            
-            Object.entries(data.jobs).forEach(([jobId, jobData]) => {
-                if (taskManager.tasks[jobId]) {
-                    const oldStatus = taskManager.tasks[jobId].status;
-                    const oldProgress = taskManager.tasks[jobId].progress;
-                    
-                    console.log(`任務 ${jobId} 狀態更新: ${oldStatus} -> ${jobData.status}, 進度: ${oldProgress}% -> ${jobData.progress}%`);
-                    
-                    // 更新任務資料
-                    updateTaskData(taskManager.tasks[jobId], jobData);
-                    
-                    // 檢查是否有變化
-                    if (oldStatus !== taskManager.tasks[jobId].status || 
-                        oldProgress !== taskManager.tasks[jobId].progress) {
-                        hasUpdates = true;
-                        
-                        // 更新UI
-                        updateTaskElementUI(jobId, taskManager.tasks[jobId]);
-                        
-                        // 如果任務完成，顯示通知
-                        if (taskManager.tasks[jobId].status === 'completed' && oldStatus !== 'completed') {
-                            showSuccess(`任務完成：${taskManager.tasks[jobId].fileName}`);
-                        } else if (taskManager.tasks[jobId].status === 'failed' && oldStatus !== 'failed') {
-                            showError(`任務失敗：${taskManager.tasks[jobId].fileName}`);
-                        }
-                    }
-                }
-            });
-            
-            if (hasUpdates) {
-                updateTaskCounts();
-                filterTasks();
-                // 立即保存更新後的任務狀態
-                saveCurrentTasks();
+            applyJobUpdates(data.jobs);
+            if (typeof data.version === 'number') {
+                taskManager.jobsVersion = data.version;
+                return true;
             }
         }
+        return false;
     } catch (error) {
         console.error('更新任務狀態失敗:', error);
         
@@ -1599,6 +1785,7 @@ async function updateTasksStatus() {
             console.log('嘗試使用單個任務查詢後備方案');
             await updateTasksStatusFallback(activeTasks);
         }
+        return false;
     }
 }
 
@@ -1727,8 +1914,10 @@ function updateTaskData(task, jobData) {
     task.message = jobData.message || task.message;
     task.updatedAt = new Date().toISOString();
     
-    // 更新預估完成時間
-    if (task.status === 'processing' && task.startTime) {
+    // 更新預估完成時間 (優先使用伺服器依各階段實測耗時估算的剩餘秒數)
+    if (task.status === 'processing' && typeof jobData.eta_seconds === 'number') {
+        task.estimatedCompletion = jobData.eta_seconds;
+    } else if (task.status === 'processing' && task.startTime) {
         const elapsed = (Date.now() - task.startTime) / 1000;
         const progressRate = task.progress / elapsed;
         const remainingProgress = 100 - task.progress;
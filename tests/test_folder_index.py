@@ -0,0 +1,91 @@
+from app.services.folder_index import FOLDER_MIME_TYPE, FolderIndex
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeDrive:
+    """只實作 FolderIndex 用到的 files()/changes() 呼叫：changes.list 依 pageToken 回傳預先準備的頁面"""
+
+    def __init__(self, folders=None, change_pages=None):
+        self.folders = folders or []
+        self.change_pages = change_pages or {}
+
+    def files(self):
+        return self
+
+    def changes(self):
+        return self
+
+    def get(self, fileId, fields):
+        return FakeRequest({'id': 'root-id', 'name': 'My Drive'})
+
+    def getStartPageToken(self):
+        return FakeRequest({'startPageToken': 't1'})
+
+    def list(self, pageToken=None, **kwargs):
+        if 'q' in kwargs:
+            return FakeRequest({'files': self.folders})
+        return FakeRequest(self.change_pages[pageToken])
+
+
+def folder_change(folder_id, name, parent):
+    return {'fileId': folder_id, 'file': {'id': folder_id, 'name': name, 'mimeType': FOLDER_MIME_TYPE,
+                                          'parents': [parent]}}
+
+
+def make_index():
+    return FolderIndex('root-id', 'My Drive', {
+        'rec': ('WearNote_Recordings', 'root-id'),
+        'docs': ('Documents', 'rec'),
+        'shared': ('Shared', 'someone-else')
+    }, page_token='t1')
+
+
+def test_path_walks_up_to_root_and_treats_unknown_parents_as_top_level():
+    index = make_index()
+    assert index.path('docs') == 'My Drive/WearNote_Recordings/Documents'
+    assert index.path('shared') == 'Shared'
+    assert index.path('missing') == ''
+    assert index.file_path(None) == 'root'
+    assert index.file_path(['docs']) == 'My Drive/WearNote_Recordings/Documents'
+
+
+def test_find_resolves_nested_names_from_root():
+    index = make_index()
+    assert index.find('WearNote_Recordings/Documents') == 'docs'
+    assert index.find('/WearNote_Recordings/') == 'rec'
+    assert index.find('WearNote_Recordings/Missing') is None
+
+
+def test_build_lists_folders():
+    drive = FakeDrive(folders=[{'id': 'rec', 'name': 'WearNote_Recordings', 'parents': ['root-id']}])
+    index = FolderIndex.build(drive)
+    assert index.page_token == 't1'
+    assert index.find('WearNote_Recordings') == 'rec'
+
+
+def test_apply_changes_renames_moves_and_removes_folders():
+    index = make_index()
+    assert index.path('docs') == 'My Drive/WearNote_Recordings/Documents'
+    drive = FakeDrive(change_pages={
+        't1': {'changes': [folder_change('rec', 'Recordings', 'root-id'),
+                           {'fileId': 'shared', 'removed': True}],
+               'nextPageToken': 't2'},
+        't2': {'changes': [folder_change('new', 'Archive', 'docs'),
+                           {'fileId': 'file-1', 'file': {'id': 'file-1', 'mimeType': 'audio/mp4'}}],
+               'newStartPageToken': 't3'}
+    })
+
+    assert index.apply_changes(drive) == 3
+    assert index.page_token == 't3'
+    # 改名後記住的路徑與名稱查詢都會重新計算
+    assert index.path('docs') == 'My Drive/Recordings/Documents'
+    assert index.find('Recordings/Documents/Archive') == 'new'
+    assert index.find('WearNote_Recordings') is None
+    assert index.path('shared') == ''
@@ -0,0 +1,49 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from app.utils.http_cache import json_response
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def test_json_response_sets_weak_etag(app):
+    with app.test_request_context('/'):
+        response = json_response({'files': []}, etag='v1')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == 'W/"v1"'
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert json.loads(response.get_data()) == {'files': []}
+
+
+def test_matching_if_none_match_returns_304(app):
+    for header in ('W/"v1"', '"v1"', '"other", W/"v1"'):
+        with app.test_request_context('/', headers={'If-None-Match': header}):
+            response = json_response({'files': []}, etag='v1')
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.headers['ETag'] == 'W/"v1"'
+
+
+def test_stale_if_none_match_returns_full_body(app):
+    with app.test_request_context('/', headers={'If-None-Match': 'W/"v0"'}):
+        response = json_response({'files': []}, etag='v1')
+    assert response.status_code == 200
+
+
+def test_large_bodies_are_gzipped_when_accepted(app):
+    payload = {'files': [{'id': str(i), 'name': f'file-{i}.m4a'} for i in range(100)]}
+    with app.test_request_context('/', headers={'Accept-Encoding': 'gzip, deflate'}):
+        response = json_response(payload)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert json.loads(gzip.decompress(response.get_data())) == payload
+
+    with app.test_request_context('/'):
+        response = json_response({'files': []})
+    assert 'Content-Encoding' not in response.headers
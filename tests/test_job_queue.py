@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from app.services.job_queue import RedisJobQueue
+from app.services.job_scheduler import SchedulingPolicy
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def queue():
+    return RedisJobQueue(fakeredis.FakeRedis(decode_responses=True), visibility_timeout=60)
+
+
+@pytest.fixture
+def policy():
+    return SchedulingPolicy(aging_factor=0, per_user_max_running=0)
+
+
+def entry(job_id: str, cost: float = 100, user_id: str = 'user', enqueued_at: float = None):
+    return {'job_id': job_id, 'user_id': user_id, 'cost_seconds': cost, 'audio_seconds': cost,
+            'enqueued_at': time.time() if enqueued_at is None else enqueued_at}
+
+
+def test_claim_follows_policy_and_counts_attempts(queue, policy):
+    queue.enqueue(entry('long', cost=500))
+    queue.enqueue(entry('short', cost=50))
+
+    claimed = queue.claim('worker-1', policy)
+    assert claimed['job_id'] == 'short'
+    assert claimed['attempts'] == 1
+    assert queue.get_stats()['inflight'] == 1
+    assert queue.claim('worker-2', policy)['job_id'] == 'long'
+    assert queue.claim('worker-2', policy) is None
+
+
+def test_ack_requires_lease_owner(queue, policy):
+    queue.enqueue(entry('job'))
+    queue.claim('worker-1', policy)
+
+    assert not queue.ack('worker-2', 'job')
+    assert queue.ack('worker-1', 'job')
+    stats = queue.get_stats()
+    assert (stats['queued'], stats['inflight']) == (0, 0)
+    assert queue.get_attempts('job') == 0
+
+
+def test_heartbeat_extends_only_own_leases(queue, policy):
+    queue.enqueue(entry('a'))
+    queue.enqueue(entry('b'))
+    queue.claim('worker-1', policy)
+    queue.claim('worker-2', policy)
+
+    assert queue.heartbeat('worker-1', ['a', 'b']) == 1
+    assert [w['worker_id'] for w in queue.list_workers()] == ['worker-1']
+
+
+def test_expired_lease_is_requeued_ahead_of_other_jobs(queue, policy):
+    queue.enqueue(entry('crashed', cost=500))
+    assert queue.claim('worker-1', policy)['job_id'] == 'crashed'
+    queue.enqueue(entry('short', cost=10))
+    # 模擬 worker 停止心跳：截止時間已過
+    queue.redis.zadd(RedisJobQueue.INFLIGHT_KEY, {'crashed': time.time() - 1})
+
+    assert queue.requeue_expired() == [{'job_id': 'crashed', 'worker_id': 'worker-1'}]
+    assert not queue.ack('worker-1', 'crashed')
+
+    reclaimed = queue.claim('worker-2', policy)
+    assert reclaimed['job_id'] == 'crashed'
+    assert reclaimed['attempts'] == 2
+
+
+def test_remove_pending_job(queue, policy):
+    queue.enqueue(entry('job'))
+    assert queue.remove('job')
+    assert not queue.remove('job')
+    assert queue.claim('worker-1', policy) is None
@@ -0,0 +1,83 @@
+import threading
+
+from app.services.job_scheduler import ResizableSemaphore, SchedulingPolicy
+
+NOW = 10_000.0
+
+
+def entry(job_id: str, cost: float, user_id: str = 'alice', waited: float = 0, **extra):
+    return {'job_id': job_id, 'user_id': user_id, 'cost_seconds': cost, 'audio_seconds': cost,
+            'enqueued_at': NOW - waited, **extra}
+
+
+def test_select_prefers_shortest_job():
+    policy = SchedulingPolicy(aging_factor=0, per_user_max_running=0)
+    pending = [entry('long', 600), entry('short', 60), entry('medium', 300)]
+    assert policy.select(pending, {}, NOW)['job_id'] == 'short'
+
+
+def test_aging_lets_long_waiting_job_go_first():
+    policy = SchedulingPolicy(aging_factor=1.0, per_user_max_running=0)
+    pending = [entry('long', 600, waited=1000), entry('short', 60)]
+    assert policy.select(pending, {}, NOW)['job_id'] == 'long'
+
+
+def test_select_prefers_user_with_fewer_running_jobs():
+    policy = SchedulingPolicy(aging_factor=0, per_user_max_running=0)
+    pending = [entry('alice-short', 10, 'alice'), entry('bob-long', 900, 'bob')]
+    assert policy.select(pending, {'alice': 1}, NOW)['job_id'] == 'bob-long'
+
+
+def test_select_respects_per_user_cap():
+    policy = SchedulingPolicy(aging_factor=0, per_user_max_running=2)
+    pending = [entry('a', 10, 'alice')]
+    assert policy.select(pending, {'alice': 2}, NOW) is None
+    assert policy.select(pending, {'alice': 1}, NOW)['job_id'] == 'a'
+
+
+def test_requeued_job_goes_first():
+    policy = SchedulingPolicy(aging_factor=0, per_user_max_running=0)
+    pending = [entry('short', 10), entry('retry', 900, requeued=True)]
+    assert policy.select(pending, {}, NOW)['job_id'] == 'retry'
+
+
+def test_plan_simulates_start_times():
+    policy = SchedulingPolicy(aging_factor=0, per_user_max_running=0)
+    running = [{**entry('running', 100), 'started_at': NOW - 40}]
+    pending = [entry('b', 200), entry('a', 50), entry('c', 300)]
+
+    plan = policy.plan(pending, running, concurrency=2, now=NOW)
+
+    assert plan['a'] == {'queue_position': 1, 'estimated_start_seconds': 0.0}
+    # 下一個空位在 a 完成 (50 秒) 時出現，早於 running 完成 (60 秒)
+    assert plan['b'] == {'queue_position': 2, 'estimated_start_seconds': 50.0}
+    assert plan['c'] == {'queue_position': 3, 'estimated_start_seconds': 60.0}
+
+
+def test_plan_respects_per_user_cap():
+    policy = SchedulingPolicy(aging_factor=0, per_user_max_running=1)
+    pending = [entry('a1', 100, 'alice'), entry('a2', 100, 'alice'), entry('b1', 500, 'bob')]
+
+    plan = policy.plan(pending, [], concurrency=3, now=NOW)
+
+    assert plan['a1']['estimated_start_seconds'] == 0.0
+    assert plan['b1']['estimated_start_seconds'] == 0.0
+    assert plan['a2']['estimated_start_seconds'] == 100.0
+
+
+def test_lowering_slot_capacity_blocks_new_acquirers_until_release():
+    slots = ResizableSemaphore(2)
+    assert slots.acquire() and slots.acquire()
+    slots.set_capacity(1)
+    slots.release()
+    # 已取得的名額不受影響，但使用中的名額仍等於新容量，新的取得者須等待
+    assert slots.acquire(cancel_check=lambda: True) is False
+
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: slots.acquire(poll_interval=0.05) and acquired.set())
+    waiter.start()
+    assert not acquired.wait(0.2)
+    slots.release()
+    assert acquired.wait(1)
+    waiter.join()
+    assert slots.get_stats() == {'capacity': 1, 'in_use': 1}
@@ -0,0 +1,128 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.job_store import JobStore, LocalJobStore, RedisJobStore
+from app.utils.constants import JOB_STATUS
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def store(redis_client):
+    return RedisJobStore(redis_client, ttl_seconds=3600)
+
+
+def make_job(job_id: str, created_at: datetime, status: str = JOB_STATUS['PENDING']):
+    return {'id': job_id, 'status': status, 'created_at': created_at.isoformat(), 'progress': 0}
+
+
+def test_update_moves_status_index(store):
+    store.create(make_job('a', datetime.now()))
+    store.update('a', status=JOB_STATUS['PROCESSING'])
+    counts = store.count_by_status()
+    assert counts[JOB_STATUS['PENDING']] == 0
+    assert counts[JOB_STATUS['PROCESSING']] == 1
+    assert store.job_ids([JOB_STATUS['PROCESSING']]) == ['a']
+
+
+def test_expired_jobs_are_pruned_from_counts(store, redis_client):
+    old = datetime.now() - timedelta(hours=2)
+    store.create(make_job('expired', old, JOB_STATUS['COMPLETED']))
+    store.create(make_job('old-but-alive', old, JOB_STATUS['COMPLETED']))
+    # 模擬 hash 因 TTL 過期
+    redis_client.delete(store._key('expired'))
+
+    store.create(make_job('new', datetime.now()))
+
+    counts = store.count_by_status()
+    assert counts[JOB_STATUS['COMPLETED']] == 1
+    assert counts[JOB_STATUS['PENDING']] == 1
+    assert store.job_ids([JOB_STATUS['COMPLETED']]) == ['old-but-alive']
+
+
+def test_legacy_status_sets_are_migrated(redis_client):
+    created_at = datetime.now()
+    redis_client.hset('job:legacy', mapping={'id': '"legacy"', 'status': '"pending"',
+                                             'created_at': f'"{created_at.isoformat()}"'})
+    redis_client.sadd(f"{RedisJobStore.LEGACY_STATUS_PREFIX}pending", 'legacy', 'gone')
+
+    store = RedisJobStore(redis_client, ttl_seconds=3600)
+
+    assert not redis_client.exists(f"{RedisJobStore.LEGACY_STATUS_PREFIX}pending")
+    assert store.job_ids(['pending']) == ['legacy']
+    assert redis_client.zscore(store._status_key('pending'), 'legacy') == pytest.approx(created_at.timestamp())
+
+
+def paginate(store, statuses=None, limit=3):
+    jobs, cursor = store.list_page(statuses, limit=limit)
+    pages = [[job['id'] for job in jobs]]
+    while cursor:
+        jobs, cursor = store.list_page(statuses, cursor=cursor, limit=limit)
+        pages.append([job['id'] for job in jobs])
+    return pages
+
+
+def test_list_page_orders_newest_first_across_statuses(store):
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    statuses = [JOB_STATUS['PENDING'], JOB_STATUS['COMPLETED'], JOB_STATUS['FAILED']]
+    for i in range(8):
+        # 每兩個任務同一時間建立，確認游標能正確處理相同建立時間
+        store.create(make_job(f'job-{i}', base + timedelta(seconds=i // 2), statuses[i % 3]))
+
+    pages = paginate(store)
+    assert pages == [['job-7', 'job-6', 'job-5'], ['job-4', 'job-3', 'job-2'], ['job-1', 'job-0']]
+    assert paginate(store, [JOB_STATUS['PENDING']], limit=2) == [['job-6', 'job-3'], ['job-0']]
+
+
+def test_list_page_reads_only_the_page(store):
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    for i in range(50):
+        store.create(make_job(f'job-{i:02d}', base + timedelta(seconds=i)))
+    read = []
+    get_many = store.get_many
+    store.get_many = lambda job_ids: read.extend(job_ids) or get_many(job_ids)
+
+    jobs, cursor = store.list_page(limit=5)
+    assert [job['id'] for job in jobs] == ['job-49', 'job-48', 'job-47', 'job-46', 'job-45']
+    assert len(read) == 5
+    jobs, _ = store.list_page(cursor=cursor, limit=5)
+    assert jobs[0]['id'] == 'job-44'
+
+
+def test_waiters_share_one_version_poller(redis_client):
+    store = RedisJobStore(redis_client, ttl_seconds=3600, version_poll_interval=0.05)
+    store.create(make_job('a', datetime.now()))
+    version = store.current_version()
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(store.wait_for_change(version, 5)))
+               for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    store.update('a', progress=50)
+    for waiter in waiters:
+        waiter.join()
+
+    assert results == [version + 1] * 3
+    assert sum(thread.name == 'job-version-poller' for thread in threading.enumerate()) <= 1
+
+
+def test_wait_for_change_returns_when_client_version_is_ahead():
+    store = LocalJobStore()
+    # 例如伺服器重啟後客戶端仍帶著舊的版本號，不應等到逾時
+    assert store.wait_for_change(42, timeout=5) == 0
+
+
+def test_incomplete_backend_fails_at_creation():
+    class PartialStore(JobStore):
+        def get(self, job_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
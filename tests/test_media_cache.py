@@ -0,0 +1,95 @@
+import os
+import time
+
+from app.services.media_cache import MediaCache
+
+
+def write_temp(cache: MediaCache, data: bytes) -> str:
+    tmp_path = cache.new_temp_path()
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    return tmp_path
+
+
+def age(path: str, seconds: float):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_make_key_requires_version():
+    assert MediaCache.make_key('file', None, None) is None
+    assert MediaCache.make_key('file', 'md5') == MediaCache.make_key('file', 'md5', 'other-time')
+    assert MediaCache.make_key('file', 'md5') != MediaCache.make_key('file', 'md5-2')
+
+
+def test_commit_then_materialize(tmp_path):
+    cache = MediaCache(str(tmp_path / 'cache'), max_bytes=1000)
+    cache.commit(write_temp(cache, b'audio'), 'key')
+
+    dest = str(tmp_path / 'out.m4a')
+    assert cache.materialize('key', dest)
+    with open(dest, 'rb') as f:
+        assert f.read() == b'audio'
+    assert not cache.materialize('missing', str(tmp_path / 'missing.m4a'))
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = MediaCache(str(tmp_path / 'cache'), max_bytes=250)
+    cache.commit(write_temp(cache, b'a' * 100), 'a')
+    age(cache._path('a'), 30)
+    cache.commit(write_temp(cache, b'b' * 100), 'b')
+    age(cache._path('b'), 20)
+    # 使用 a 之後，b 成為最久未使用
+    assert cache.materialize('a', str(tmp_path / 'a.m4a'))
+    cache.commit(write_temp(cache, b'c' * 100), 'c')
+
+    assert os.path.exists(cache._path('a'))
+    assert not os.path.exists(cache._path('b'))
+    assert os.path.exists(cache._path('c'))
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_commit_skips_files_larger_than_cache(tmp_path):
+    cache = MediaCache(str(tmp_path / 'cache'), max_bytes=10)
+    tmp = write_temp(cache, b'x' * 11)
+    cache.commit(tmp, 'big')
+    assert not os.path.exists(tmp)
+    assert not os.path.exists(cache._path('big'))
+
+
+def test_commit_of_missing_temp_file_does_not_raise(tmp_path):
+    cache = MediaCache(str(tmp_path / 'cache'), max_bytes=1000)
+    tmp = cache.new_temp_path()
+    os.remove(tmp)
+    cache.commit(tmp, 'key')
+    assert not cache.materialize('key', str(tmp_path / 'out.m4a'))
+
+
+def test_entries_written_by_other_process_are_shared(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    first = MediaCache(cache_dir, max_bytes=250)
+    second = MediaCache(cache_dir, max_bytes=250)
+
+    first.commit(write_temp(first, b'a' * 100), 'a')
+    assert second.materialize('a', str(tmp_path / 'a.m4a'))
+
+    age(first._path('a'), 30)
+    second.commit(write_temp(second, b'b' * 100), 'b')
+    first.commit(write_temp(first, b'c' * 100), 'c')
+    # 容量上限以整個目錄計算
+    assert not os.path.exists(first._path('a'))
+    assert first.get_stats()['total_bytes'] == 200
+
+
+def test_startup_keeps_recent_temp_files(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    cache = MediaCache(cache_dir, max_bytes=1000)
+    live = write_temp(cache, b'in progress')
+    stale = write_temp(cache, b'left over')
+    age(stale, MediaCache.TEMP_GRACE_SECONDS + 60)
+
+    MediaCache(cache_dir, max_bytes=1000)
+    assert os.path.exists(live)
+    assert not os.path.exists(stale)
@@ -0,0 +1,171 @@
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.services.ranged_downloader import RangedDownloader, partial_download_lock
+
+PART_SIZE = 1024
+CONTENT = os.urandom(PART_SIZE * 5 + 100)
+
+
+class RangeServer:
+    """本機的 HTTP Range 伺服器：記錄每個 Range 請求，並可讓指定的偏移量失敗"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.requests = []
+        self.fail_offsets = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                start, end = self.headers['Range'].split('=', 1)[1].split('-')
+                start, end = int(start), min(int(end), len(server.content) - 1)
+                server.requests.append(start)
+                if start in server.fail_offsets:
+                    self.send_error(503)
+                    return
+                body = server.content[start:end + 1]
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(server.content)}')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/file'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = RangeServer(CONTENT)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def downloader():
+    return RangedDownloader(requests.Session(), part_size=PART_SIZE, concurrency=2, max_retries=1, timeout=5)
+
+
+class ListSink:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(data)
+        return len(data)
+
+
+def test_get_size(server, downloader):
+    assert downloader.get_size(server.url) == len(CONTENT)
+
+
+def test_download_resumes_from_completed_parts(server, downloader, tmp_path):
+    dest = str(tmp_path / 'audio.m4a')
+    server.fail_offsets = {PART_SIZE * 3}
+    with pytest.raises(requests.exceptions.RequestException):
+        downloader.download(server.url, dest, len(CONTENT), version='v1')
+    assert os.path.exists(f'{dest}.parts.json')
+
+    server.fail_offsets = set()
+    server.requests = []
+    downloader.download(server.url, dest, len(CONTENT), version='v1')
+
+    with open(dest, 'rb') as f:
+        assert f.read() == CONTENT
+    # 只重新下載失敗 (與因失敗而取消) 的分段
+    assert PART_SIZE * 3 in server.requests
+    assert 0 not in server.requests
+    assert not os.path.exists(f'{dest}.parts.json')
+
+
+def test_download_discards_parts_of_other_version(server, downloader, tmp_path):
+    dest = str(tmp_path / 'audio.m4a')
+    server.fail_offsets = {PART_SIZE * 3}
+    with pytest.raises(requests.exceptions.RequestException):
+        downloader.download(server.url, dest, len(CONTENT), version='v1')
+
+    server.fail_offsets = set()
+    server.requests = []
+    downloader.download(server.url, dest, len(CONTENT), version='v2')
+
+    assert sorted(server.requests) == list(range(0, len(CONTENT), PART_SIZE))
+    with open(dest, 'rb') as f:
+        assert f.read() == CONTENT
+
+
+def test_download_to_sink_writes_parts_in_order(server, downloader):
+    sink = ListSink()
+    downloader.download_to_sink(server.url, sink, len(CONTENT))
+    assert b''.join(sink.chunks) == CONTENT
+
+
+def test_download_to_sink_resumes_from_spooled_parts(server, downloader, tmp_path):
+    resume_path = str(tmp_path / 'file-id')
+    server.fail_offsets = {PART_SIZE * 2}
+    with pytest.raises(requests.exceptions.RequestException):
+        downloader.download_to_sink(server.url, ListSink(), len(CONTENT), resume_path=resume_path, version='v1')
+    with open(f'{resume_path}.parts.json') as f:
+        assert json.load(f)['completed'] == [0, 1]
+
+    server.fail_offsets = set()
+    server.requests = []
+    sink = ListSink()
+    downloader.download_to_sink(server.url, sink, len(CONTENT), resume_path=resume_path, version='v1')
+
+    assert b''.join(sink.chunks) == CONTENT
+    assert 0 not in server.requests and PART_SIZE not in server.requests
+    assert not os.path.exists(f'{resume_path}.part')
+    assert not os.path.exists(f'{resume_path}.parts.json')
+
+
+def test_download_resumes_parts_spooled_by_stream(server, downloader, tmp_path):
+    """串流下載失敗後改用 download() 時沿用已落地的分段"""
+    resume_path = str(tmp_path / 'file-id')
+    server.fail_offsets = {PART_SIZE * 2}
+    with pytest.raises(requests.exceptions.RequestException):
+        downloader.download_to_sink(server.url, ListSink(), len(CONTENT), resume_path=resume_path, version='v1')
+
+    server.fail_offsets = set()
+    server.requests = []
+    downloader.download(server.url, resume_path, len(CONTENT), version='v1')
+
+    assert 0 not in server.requests
+    with open(resume_path, 'rb') as f:
+        assert f.read() == CONTENT
+
+
+def test_partial_download_lock_serializes_writers(tmp_path):
+    dest = str(tmp_path / 'file-id')
+    order = []
+    first_holding = threading.Event()
+
+    def second():
+        first_holding.wait()
+        with partial_download_lock(dest):
+            order.append('second')
+
+    waiter = threading.Thread(target=second)
+    waiter.start()
+    with partial_download_lock(dest) as path:
+        assert path == dest
+        first_holding.set()
+        waiter.join(0.2)
+        # 第二個下載者在第一個釋放前都在等待
+        assert waiter.is_alive()
+        order.append('first')
+    waiter.join(1)
+    assert order == ['first', 'second']
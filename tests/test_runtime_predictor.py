@@ -0,0 +1,17 @@
+from app.services.runtime_predictor import FileRuntimeBackend
+
+
+def test_file_backends_sharing_a_path_merge_samples(tmp_path):
+    path = str(tmp_path / 'runtime' / 'stats.json')
+    # 兩個程序各自建立的 backend (例如 web 程序與 queue worker)
+    web, worker = FileRuntimeBackend(path), FileRuntimeBackend(path)
+
+    web.add(['transcription|base'], 60, 30)
+    worker.add(['transcription|base'], 120, 50)
+    web.add(['download|base'], 60, 5)
+
+    stats = worker.load()
+    assert stats['transcription|base']['n'] == 2
+    assert stats['transcription|base']['sy'] == 80
+    assert stats['download|base']['n'] == 1
+    assert sorted(p.name for p in (tmp_path / 'runtime').iterdir()) == ['stats.json', 'stats.json.lock']
@@ -0,0 +1,39 @@
+import struct
+
+from app.services.stream_ingest import is_pipe_decodable
+
+
+def box(box_type: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def large_box(box_type: bytes, payload: bytes = b'') -> bytes:
+    # size 欄位為 1 時長度改以其後的 64-bit 欄位表示
+    return struct.pack('>I4sQ', 1, box_type, 16 + len(payload)) + payload
+
+
+FTYP = box(b'ftyp', b'M4A \x00\x00\x00\x00')
+
+
+def test_non_mp4_containers_are_pipe_decodable():
+    assert is_pipe_decodable(b'ID3\x04\x00' + b'\x00' * 64)
+    assert is_pipe_decodable(b'RIFF\x24\x00\x00\x00WAVEfmt ')
+    assert is_pipe_decodable(b'')
+
+
+def test_faststart_mp4_is_pipe_decodable():
+    assert is_pipe_decodable(FTYP + box(b'moov', b'\x00' * 32) + box(b'mdat', b'\x00' * 32))
+
+
+def test_mp4_with_mdat_before_moov_needs_a_file():
+    assert not is_pipe_decodable(FTYP + box(b'free') + box(b'mdat', b'\x00' * 32) + box(b'moov'))
+
+
+def test_64_bit_box_sizes_are_followed():
+    assert is_pipe_decodable(FTYP + large_box(b'free', b'\x00' * 8) + box(b'moov'))
+    assert not is_pipe_decodable(FTYP + large_box(b'free', b'\x00' * 8) + box(b'mdat'))
+
+
+def test_moov_beyond_the_head_is_treated_as_not_streamable():
+    # 只讀到檔頭的一部分：下一個 box 超出範圍，無法確認 moov 在 mdat 之前
+    assert not is_pipe_decodable(FTYP + struct.pack('>I4s', 1 << 20, b'free'))
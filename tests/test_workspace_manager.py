@@ -0,0 +1,65 @@
+import json
+import os
+
+import pytest
+
+from app.services.workspace_manager import WorkspaceManager, WorkspaceWaitCancelled
+
+
+def write_ledger(root, entries):
+    with open(os.path.join(root, WorkspaceManager.LEDGER_NAME), 'w') as f:
+        json.dump(entries, f)
+
+
+def read_ledger(root):
+    with open(os.path.join(root, WorkspaceManager.LEDGER_NAME)) as f:
+        return json.load(f)
+
+
+def test_allocate_and_release_update_shared_ledger(tmp_path):
+    manager = WorkspaceManager(root=str(tmp_path), budget_bytes=1000)
+    workspace = manager.allocate('job-1', 400)
+    assert os.path.isdir(workspace.path)
+    assert read_ledger(str(tmp_path)) == {manager.process_key: 400}
+
+    manager.release('job-1')
+    assert not os.path.exists(workspace.path)
+    assert read_ledger(str(tmp_path)) == {}
+
+
+def test_budget_counts_other_processes(tmp_path):
+    # 其他主機 (無法判斷是否仍在執行) 的程序已保留 800 bytes
+    write_ledger(str(tmp_path), {'other-host-1': 800})
+    manager = WorkspaceManager(root=str(tmp_path), budget_bytes=1000)
+
+    with pytest.raises(WorkspaceWaitCancelled):
+        manager.allocate('job-1', 400, cancel_check=lambda: True)
+
+    write_ledger(str(tmp_path), {'other-host-1': 500})
+    manager.allocate('job-1', 400)
+    assert read_ledger(str(tmp_path)) == {'other-host-1': 500, manager.process_key: 400}
+
+
+def test_ledger_drops_dead_local_processes(tmp_path):
+    manager = WorkspaceManager(root=str(tmp_path), budget_bytes=1000)
+    dead_key = f"{manager.hostname}-{2 ** 22 + 12345}"
+    write_ledger(str(tmp_path), {dead_key: 900})
+
+    manager.allocate('job-1', 400)
+    assert read_ledger(str(tmp_path)) == {manager.process_key: 400}
+
+
+def test_restart_with_reused_pid_cleans_previous_run(tmp_path):
+    hostname = WorkspaceManager(root=str(tmp_path)).hostname
+    # 重新啟動前的程序拿到相同的 PID (舊格式與不同啟動時間)，另一個程序的 PID 已被重用
+    stale_keys = [f"{hostname}-{os.getpid()}", f"{hostname}-{os.getpid()}-1",
+                  f"{hostname}-{os.getppid()}-1"]
+    for key in stale_keys:
+        os.makedirs(os.path.join(str(tmp_path), key, 'job-1'))
+    write_ledger(str(tmp_path), {key: 300 for key in stale_keys})
+
+    manager = WorkspaceManager(root=str(tmp_path), budget_bytes=1000)
+
+    assert sorted(os.listdir(str(tmp_path))) == sorted([manager.process_key, WorkspaceManager.LEDGER_NAME])
+    assert read_ledger(str(tmp_path)) == {}
+    assert manager.process_key.startswith(f"{hostname}-{os.getpid()}-")